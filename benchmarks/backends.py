@@ -0,0 +1,124 @@
+"""Run the same workload against the SQLite and PostgreSQL session repositories.
+
+Run from the repository root with ``PYTHONPATH=src python -m benchmarks.backends``.
+PostgreSQL is included when ``--postgres-dsn`` (or ``TABATA_BENCH_POSTGRES_DSN``)
+points at a throwaway server; the data goes into a temporary schema that is
+dropped afterwards.
+"""
+
+from __future__ import annotations
+
+import argparse
+import os
+import tempfile
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Callable, ContextManager, Dict, Iterator, List, Tuple
+
+from benchmarks import synthetic
+from tabata.repositories import ExerciseRepository, SessionRepository
+from tabata.storage import (
+    PostgresConnectionPool,
+    PostgresExerciseRepository,
+    PostgresSessionRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    connect_sqlite,
+    initialize_postgres,
+    initialize_sqlite,
+)
+from tabata.storage import postgres_repositories
+
+Repositories = Tuple[ExerciseRepository, SessionRepository]
+
+CASES = ("bulk load", "list_with_details", "totals per session", "history calories")
+
+
+@contextmanager
+def sqlite_backend() -> Iterator[Repositories]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        connection = connect_sqlite(Path(tmp_dir) / "bench.db")
+        initialize_sqlite(connection)
+        try:
+            yield SqliteExerciseRepository(connection), SqliteSessionRepository(connection)
+        finally:
+            connection.close()
+
+
+@contextmanager
+def postgres_backend(dsn: str, pool_size: int) -> Iterator[Repositories]:
+    schema = f"tabata_bench_{uuid.uuid4().hex[:12]}"
+    admin = postgres_repositories.psycopg.connect(dsn, autocommit=True)
+    admin.execute(f"CREATE SCHEMA {schema}")
+    pool = PostgresConnectionPool(
+        dsn,
+        max_size=pool_size,
+        configure=lambda connection: connection.execute(f"SET search_path TO {schema}"),
+    )
+    try:
+        initialize_postgres(pool)
+        yield PostgresExerciseRepository(pool), PostgresSessionRepository(pool)
+    finally:
+        pool.close()
+        admin.execute(f"DROP SCHEMA {schema} CASCADE")
+        admin.close()
+
+
+def run_workload(repositories: Repositories, args: argparse.Namespace) -> Dict[str, float]:
+    exercises, sessions = repositories
+    catalog = [exercises.create(exercise) for exercise in synthetic.exercises()]
+    workload = synthetic.sessions(args.sessions, catalog, blocks=args.blocks, rounds=args.rounds)
+    results: Dict[str, float] = {}
+
+    def timed(name: str, fn: Callable[[], object]) -> object:
+        started = time.perf_counter()
+        value = fn()
+        results[name] = time.perf_counter() - started
+        return value
+
+    created: List = timed("bulk load", lambda: sessions.create_many_with_blocks(workload))
+    ids = [session.id for session in created]
+    timed("list_with_details", lambda: sessions.list_with_details(ids))
+    sample = ids[: args.lookups]
+    timed(
+        "totals per session",
+        lambda: [(sessions.total_duration_seconds(i), sessions.estimate_calories(i)) for i in sample],
+    )
+    history = ids * args.history_factor
+    timed("history calories", lambda: sessions.estimate_calories_for_history(history))
+    return results
+
+
+def run_workload_with(backend: ContextManager[Repositories], args: argparse.Namespace) -> Dict[str, float]:
+    with backend as repositories:
+        return run_workload(repositories, args)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=8)
+    parser.add_argument("--lookups", type=int, default=500, help="sessions whose totals are read one by one")
+    parser.add_argument("--history-factor", type=int, default=10, help="history length as a multiple of sessions")
+    parser.add_argument("--postgres-dsn", default=os.environ.get("TABATA_BENCH_POSTGRES_DSN"))
+    parser.add_argument("--pool-size", type=int, default=4)
+    args = parser.parse_args()
+
+    backends = {"sqlite": run_workload_with(sqlite_backend(), args)}
+    if args.postgres_dsn and postgres_repositories.psycopg is not None:
+        backends["postgres"] = run_workload_with(postgres_backend(args.postgres_dsn, args.pool_size), args)
+    else:
+        print("PostgreSQL skipped: pass --postgres-dsn and install psycopg to compare")
+
+    intervals = args.sessions * args.blocks * args.rounds * 2
+    print(f"{args.sessions} sessions, {args.sessions * args.blocks} blocks, {intervals} intervals")
+    print(f"{'case':<22}" + "".join(f"{name:>12}" for name in backends))
+    for case in CASES:
+        print(f"{case:<22}" + "".join(f"{results[case]:>11.3f}s" for results in backends.values()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""Compare per-row and bulk session inserts.
+
+Run from the repository root with ``PYTHONPATH=src python -m benchmarks.bulk_insert``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from benchmarks import synthetic
+from tabata.models import Session
+from tabata.storage import SqliteExerciseRepository, SqliteSessionRepository, initialize_sqlite
+
+
+Insert = Callable[[SqliteSessionRepository, List[Session]], None]
+
+
+def _time_insert(insert: Insert, args: argparse.Namespace) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        connection = sqlite3.connect(Path(tmp_dir) / "bench.db")
+        try:
+            return _run_insert(connection, insert, args)
+        finally:
+            connection.close()
+
+
+def _run_insert(connection: sqlite3.Connection, insert: Insert, args: argparse.Namespace) -> float:
+    initialize_sqlite(connection)
+    exercises = SqliteExerciseRepository(connection)
+    catalog = [exercises.create(exercise) for exercise in synthetic.exercises()]
+    sessions = synthetic.sessions(args.sessions, catalog, blocks=args.blocks, rounds=args.rounds)
+    repository = SqliteSessionRepository(connection)
+    started = time.perf_counter()
+    insert(repository, sessions)
+    return time.perf_counter() - started
+
+
+def _per_row(repository: SqliteSessionRepository, sessions: List[Session]) -> None:
+    for session in sessions:
+        repository.create_with_blocks(session)
+
+
+def _bulk(repository: SqliteSessionRepository, sessions: List[Session]) -> None:
+    repository.create_many_with_blocks(sessions)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--sessions", type=int, default=2000)
+    parser.add_argument("--blocks", type=int, default=4)
+    parser.add_argument("--rounds", type=int, default=8)
+    args = parser.parse_args()
+
+    intervals = args.sessions * args.blocks * args.rounds * 2
+    print(f"{args.sessions} sessions, {args.sessions * args.blocks} blocks, {intervals} intervals")
+    per_row = _time_insert(_per_row, args)
+    bulk = _time_insert(_bulk, args)
+    print(f"create_with_blocks       {per_row:8.3f} s")
+    print(f"create_many_with_blocks  {bulk:8.3f} s  ({per_row / bulk:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
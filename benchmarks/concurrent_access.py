@@ -0,0 +1,95 @@
+"""Multi-threaded read/write throughput through SqliteConnectionPool.
+
+Runs one writer thread creating sessions and several reader threads hydrating
+them, first with the rollback journal and then in WAL mode. Run from the
+repository root with ``PYTHONPATH=src python -m benchmarks.concurrent_access``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import sqlite3
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+from benchmarks import synthetic
+from tabata.storage import (
+    SqliteConnectionPool,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    SqliteSettings,
+)
+
+TEMPLATES = 200
+
+
+def run(settings: SqliteSettings, readers: int, seconds: float) -> tuple[int, int, int]:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        with SqliteConnectionPool(Path(tmp_dir) / "bench.db", settings) as pool:
+            exercises = SqliteExerciseRepository(pool.connection())
+            catalog = [exercises.create(exercise) for exercise in synthetic.exercises()]
+            templates = synthetic.sessions(TEMPLATES, catalog, blocks=4, rounds=8)
+            SqliteSessionRepository(pool.connection()).create_many_with_blocks(templates)
+            deadline = time.perf_counter() + seconds
+            counts = {"reads": 0, "writes": 0, "busy": 0}
+            lock = threading.Lock()
+
+            def count(key: str) -> None:
+                with lock:
+                    counts[key] += 1
+
+            def writer() -> None:
+                repository = SqliteSessionRepository(pool.connection())
+                index = 0
+                while time.perf_counter() < deadline:
+                    try:
+                        repository.create_with_blocks(templates[index % TEMPLATES])
+                        count("writes")
+                    except sqlite3.OperationalError:
+                        count("busy")
+                    index += 1
+
+            def reader(offset: int) -> None:
+                repository = SqliteSessionRepository(pool.connection())
+                session_id = offset
+                while time.perf_counter() < deadline:
+                    try:
+                        repository.get_with_details(session_id % TEMPLATES + 1)
+                        count("reads")
+                    except sqlite3.OperationalError:
+                        count("busy")
+                    session_id += 1
+
+            threads = [threading.Thread(target=writer)]
+            threads += [threading.Thread(target=reader, args=(index,)) for index in range(readers)]
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+            return counts["reads"], counts["writes"], counts["busy"]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--readers", type=int, default=4)
+    parser.add_argument("--seconds", type=float, default=3.0)
+    args = parser.parse_args()
+
+    for label, settings in (
+        (
+            "rollback journal",
+            SqliteSettings(journal_mode="DELETE", synchronous="FULL", busy_timeout_seconds=0.05),
+        ),
+        ("WAL", SqliteSettings(busy_timeout_seconds=0.05)),
+    ):
+        reads, writes, busy = run(settings, args.readers, args.seconds)
+        print(
+            f"{label:17} {reads / args.seconds:9.0f} reads/s  "
+            f"{writes / args.seconds:7.0f} writes/s  {busy} busy errors"
+        )
+
+
+if __name__ == "__main__":
+    main()
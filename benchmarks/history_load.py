@@ -0,0 +1,95 @@
+"""Measure history record parsing time and memory per 100k records.
+
+Compares the former ``strptime`` + ``__dict__`` dataclass record with the current
+``fromisoformat`` + slotted ``SessionRecord``. Run from the repository root with
+``PYTHONPATH=src python -m benchmarks.history_load``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import random
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Callable, List
+
+from tabata.history import ISO_FORMAT, HistoryStore, SessionRecord
+
+
+@dataclass(frozen=True)
+class LegacySessionRecord:
+    duration_minutes: int
+    calories: int
+    completed_at: datetime
+    source_session: str
+
+    @classmethod
+    def from_dict(cls, data: dict) -> "LegacySessionRecord":
+        return cls(
+            duration_minutes=int(data["duration_minutes"]),
+            calories=int(data["calories"]),
+            completed_at=datetime.strptime(data["completed_at"], ISO_FORMAT),
+            source_session=str(data["source_session"]),
+        )
+
+
+def build_payload(count: int) -> List[dict]:
+    generator = random.Random(42)
+    start = datetime(2015, 1, 1, 6, 0, 0)
+    return [
+        {
+            "duration_minutes": generator.randint(5, 60),
+            "calories": generator.randint(40, 700),
+            "completed_at": (start + timedelta(minutes=37 * index)).strftime(ISO_FORMAT),
+            "source_session": f"session-{generator.randint(1, 40)}",
+        }
+        for index in range(count)
+    ]
+
+
+def _measure(parse: Callable[[dict], object], payload: List[dict]) -> tuple[float, float]:
+    started = time.perf_counter()
+    records = [parse(item) for item in payload]
+    elapsed = time.perf_counter() - started
+    del records
+    tracemalloc.start()
+    records = [parse(item) for item in payload]
+    allocated, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, allocated / len(records)
+
+
+def _measure_store(payload: List[dict]) -> float:
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = Path(tmp_dir) / "history.json"
+        path.write_text(
+            "".join(json.dumps(item, separators=(",", ":")) + "\n" for item in payload),
+            encoding="utf-8",
+        )
+        HistoryStore(path).list_sessions()
+        started = time.perf_counter()
+        HistoryStore(path).list_sessions()
+        return time.perf_counter() - started
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--records", type=int, default=100_000)
+    args = parser.parse_args()
+
+    payload = build_payload(args.records)
+    before_time, before_bytes = _measure(LegacySessionRecord.from_dict, payload)
+    after_time, after_bytes = _measure(SessionRecord.from_dict, payload)
+    print(f"{args.records} records")
+    print(f"strptime + dataclass       {before_time:7.3f} s  {before_bytes:6.0f} B/record")
+    print(f"fromisoformat + __slots__  {after_time:7.3f} s  {after_bytes:6.0f} B/record")
+    print(f"HistoryStore.list_sessions {_measure_store(payload):7.3f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,270 @@
+"""Benchmark suite for repositories, history storage and progress aggregation.
+
+Every case runs against deterministic synthetic data at each requested size
+and the timings are written as JSON, so two commits can be compared with
+``--compare``. Run from the repository root with
+``PYTHONPATH=src python -m benchmarks.run --sizes 1k 100k --output before.json``
+and later ``... --output after.json --compare before.json``.
+
+``size`` is the number of history records a run is built around; the
+repositories hold one stored session per hundred records. ``operations`` is
+the number of calls or records a case covers.
+"""
+
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import subprocess
+import tempfile
+import time
+from datetime import datetime, timedelta, timezone
+from itertools import islice
+from pathlib import Path
+from typing import Callable, Dict, List, Optional
+
+from tabata import columnar, progress
+from tabata.history import HistoryStore
+from tabata.segments import HistorySegment, segment_from_history
+from tabata.storage import SqliteExerciseRepository, SqliteSessionRepository, initialize_sqlite
+
+from . import synthetic
+
+SIZES = {"1k": 1_000, "10k": 10_000, "100k": 100_000, "1m": 1_000_000}
+
+# Sessions stored per history record, and caps for cases timed one call at a time.
+SESSIONS_PER_RECORD = 0.01
+SAMPLE = 500
+APPENDS = 2_000
+
+
+class Suite:
+    def __init__(self, repeat: int) -> None:
+        self.repeat = repeat
+        self.results: List[dict] = []
+
+    def time(
+        self,
+        name: str,
+        size: int,
+        operations: int,
+        function: Callable[[], object],
+        repeat: bool = True,
+    ) -> None:
+        runs = []
+        for _ in range(self.repeat if repeat else 1):
+            started = time.perf_counter()
+            function()
+            runs.append(time.perf_counter() - started)
+        seconds = min(runs)
+        self.results.append(
+            {
+                "name": name,
+                "size": size,
+                "operations": operations,
+                "seconds": seconds,
+                "operations_per_second": operations / seconds if seconds else None,
+            }
+        )
+        print(f"{name:42} {size:>9} {seconds:10.4f} s {operations / seconds if seconds else 0:14.0f} ops/s")
+
+
+def run_repositories(suite: Suite, size: int, directory: Path) -> None:
+    count = max(int(size * SESSIONS_PER_RECORD), 10)
+    connection = sqlite3.connect(directory / "repositories.db")
+    try:
+        initialize_sqlite(connection)
+        exercises = SqliteExerciseRepository(connection)
+        catalog = [exercises.create(exercise) for exercise in synthetic.exercises()]
+        connection.commit()
+        repository = SqliteSessionRepository(connection)
+        templates = synthetic.sessions(count, catalog)
+        created: List = []
+
+        def bulk() -> None:
+            created.extend(repository.create_many_with_blocks(templates))
+
+        suite.time("sessions.create_many_with_blocks", size, count, bulk, repeat=False)
+        sample = templates[: min(SAMPLE, count)]
+        suite.time(
+            "sessions.create_with_blocks",
+            size,
+            len(sample),
+            lambda: [repository.create_with_blocks(session) for session in sample],
+            repeat=False,
+        )
+        ids = [session.id for session in created]
+        generator = random.Random(7)
+        picked = generator.sample(ids, min(SAMPLE, len(ids)))
+        suite.time(
+            "sessions.get_with_details",
+            size,
+            len(picked),
+            lambda: [repository.get_with_details(session_id) for session_id in picked],
+        )
+        suite.time("sessions.list_with_details", size, len(ids), lambda: repository.list_with_details(ids))
+
+        edited = repository.list_with_details(picked)
+        for session in edited:
+            session.name += " (edited)"
+            session.blocks[0].intervals[0].duration_seconds += 5
+            del session.blocks[-1]
+
+        def update() -> None:
+            with connection:
+                for session in edited:
+                    repository.update_with_blocks(session)
+
+        suite.time("sessions.update_with_blocks", size, len(edited), update, repeat=False)
+
+        history = [generator.choice(ids) for _ in range(size)]
+        suite.time(
+            "sessions.estimate_calories_for_history",
+            size,
+            len(history),
+            lambda: repository.estimate_calories_for_history(history),
+        )
+
+        def delete() -> None:
+            with connection:
+                for session_id in picked:
+                    repository.delete(session_id)
+
+        suite.time("sessions.delete", size, len(picked), delete, repeat=False)
+    finally:
+        connection.close()
+
+
+def run_history(suite: Suite, size: int, directory: Path) -> None:
+    path = directory / "history.jsonl"
+    synthetic.write_journal(path, synthetic.history_records(size))
+    # The first query on a journal without a sidecar builds the offset index.
+    suite.time(
+        "history.build_index",
+        size,
+        size,
+        lambda: HistoryStore(path).list_sessions(end=synthetic.HISTORY_START),
+        repeat=False,
+    )
+    store = HistoryStore(path)
+    suite.time("history.list_sessions", size, size, store.list_sessions)
+    records = store.list_sessions()
+    last = records[0].completed_at
+    suite.time(
+        "history.list_sessions[last 30 days]",
+        size,
+        len(store.list_sessions(last - timedelta(days=30), last)),
+        lambda: store.list_sessions(last - timedelta(days=30), last),
+    )
+    suite.time("history.rebuild_rollups", size, size, store.rebuild_rollups, repeat=False)
+    suite.time("history.weekly_progress", size, size, store.weekly_progress)
+    suite.time("history.yearly_progress", size, size, store.yearly_progress)
+    suite.time("progress.weekly_progress", size, size, lambda: progress.weekly_progress(records))
+    suite.time("progress.yearly_progress", size, size, lambda: progress.yearly_progress(records))
+    if columnar.np is not None:
+        columns = columnar.HistoryColumns.from_records(records)
+        suite.time("columnar.weekly_progress", size, size, lambda: columnar.weekly_progress(columns))
+        suite.time("columnar.yearly_progress", size, size, lambda: columnar.yearly_progress(columns))
+    appended = list(islice(synthetic.history_records(size + APPENDS, seed=1), size, None))
+    suite.time(
+        "history.add_session",
+        size,
+        len(appended),
+        lambda: [store.add_session(record) for record in appended],
+        repeat=False,
+    )
+
+
+def run_segments(suite: Suite, size: int, directory: Path) -> None:
+    journal = directory / "history.jsonl"
+    segment_path = directory / "history.seg"
+    synthetic.write_journal(journal, synthetic.history_records(size))
+    HistoryStore(journal).list_sessions(end=synthetic.HISTORY_START)
+    suite.time(
+        "segments.segment_from_history",
+        size,
+        size,
+        lambda: segment_from_history(journal, segment_path),
+        repeat=False,
+    )
+    with HistorySegment(segment_path) as segment:
+        suite.time("segments.iter_sessions", size, size, lambda: list(segment.iter_sessions()))
+        suite.time("segments.iter_rows", size, size, lambda: sum(1 for _ in segment.iter_rows()))
+        last = synthetic.HISTORY_START + timedelta(minutes=487 * (size - 1))
+        window = len(list(segment.iter_rows(last - timedelta(days=30), last)))
+        suite.time(
+            "segments.iter_sessions[last 30 days]",
+            size,
+            window,
+            lambda: list(segment.iter_sessions(last - timedelta(days=30), last)),
+        )
+        if columnar.np is not None:
+
+            def weekly() -> None:
+                columnar.weekly_progress(segment.columns())
+
+            suite.time("segments.columns+weekly_progress", size, size, weekly)
+
+
+CASES: Dict[str, Callable[[Suite, int, Path], None]] = {
+    "repositories": run_repositories,
+    "history": run_history,
+    "segments": run_segments,
+}
+
+
+def _commit() -> Optional[str]:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def _compare(results: List[dict], baseline_path: Path) -> None:
+    baseline = {
+        (result["name"], result["size"]): result["seconds"]
+        for result in json.loads(baseline_path.read_text(encoding="utf-8"))["results"]
+    }
+    print(f"\ncompared with {baseline_path} (ratio > 1 is slower)")
+    for result in results:
+        before = baseline.get((result["name"], result["size"]))
+        if before:
+            print(f"{result['name']:42} {result['size']:>9} {result['seconds'] / before:8.2f}x")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", nargs="+", choices=list(SIZES), default=["1k", "100k"])
+    parser.add_argument("--cases", nargs="+", choices=list(CASES), default=list(CASES))
+    parser.add_argument("--repeat", type=int, default=3, help="best of N for read-only cases")
+    parser.add_argument("--output", type=Path, default=Path("benchmark-results.json"))
+    parser.add_argument("--compare", type=Path, help="earlier results file to compare against")
+    args = parser.parse_args()
+
+    suite = Suite(args.repeat)
+    for label in args.sizes:
+        for case in args.cases:
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                CASES[case](suite, SIZES[label], Path(tmp_dir))
+
+    report = {
+        "commit": _commit(),
+        "created_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "sqlite": sqlite3.sqlite_version,
+        "numpy": getattr(columnar.np, "__version__", None),
+        "results": suite.results,
+    }
+    args.output.write_text(json.dumps(report, indent=2) + "\n", encoding="utf-8")
+    print(f"\nwrote {args.output}")
+    if args.compare:
+        _compare(suite.results, args.compare)
+
+
+if __name__ == "__main__":
+    main()
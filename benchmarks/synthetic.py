@@ -0,0 +1,83 @@
+"""Deterministic synthetic data for the benchmarks."""
+
+from __future__ import annotations
+
+import random
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Iterator, List
+
+from tabata.history import SessionRecord, encode_line
+from tabata.models import Block, Exercise, Interval, Session
+
+EXERCISES = (
+    ("Burpees", "cardio", 12.0),
+    ("Squats", "strength", 6.0),
+    ("Mountain climbers", "cardio", 10.0),
+    ("Plank", "core", 4.0),
+)
+
+HISTORY_START = datetime(2015, 1, 1, 6, 0, 0)
+
+
+def exercises() -> List[Exercise]:
+    return [
+        Exercise(id=None, name=name, category=category, calories_per_minute=rate)
+        for name, category, rate in EXERCISES
+    ]
+
+
+def sessions(
+    count: int,
+    catalog: List[Exercise],
+    blocks: int = 4,
+    rounds: int = 4,
+    seed: int = 42,
+) -> List[Session]:
+    generator = random.Random(seed)
+    return [
+        Session(
+            id=None,
+            name=f"Session {index}",
+            warmup_seconds=generator.choice((60, 120, 300)),
+            recovery_seconds=generator.choice((30, 60, 120)),
+            blocks=[
+                Block(
+                    id=None,
+                    name=f"Block {position}",
+                    position=position,
+                    intervals=[
+                        Interval(
+                            id=None,
+                            position=step,
+                            duration_seconds=20 if step % 2 == 0 else 10,
+                            exercise=generator.choice(catalog) if step % 2 == 0 else None,
+                        )
+                        for step in range(rounds * 2)
+                    ],
+                )
+                for position in range(blocks)
+            ],
+        )
+        for index in range(count)
+    ]
+
+
+def history_records(count: int, seed: int = 42) -> Iterator[SessionRecord]:
+    """About three workouts a day, in completion order."""
+    generator = random.Random(seed)
+    for index in range(count):
+        yield SessionRecord(
+            duration_minutes=generator.randint(5, 60),
+            calories=generator.randint(40, 700),
+            completed_at=HISTORY_START + timedelta(minutes=487 * index),
+            source_session=f"session-{generator.randint(1, 40)}",
+        )
+
+
+def write_journal(path: Path, records: Iterator[SessionRecord]) -> None:
+    """Write records straight to a HistoryStore journal, skipping per-append rollups."""
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("wb") as journal:
+        for record in records:
+            journal.write(encode_line(record))
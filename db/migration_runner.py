@@ -1,20 +1,49 @@
 from __future__ import annotations
 
+import argparse
+import glob
+import hashlib
+import json
+import os
 import re
 import sqlite3
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import closing
 from dataclasses import dataclass
+from functools import partial
 from pathlib import Path
-from typing import Iterable, List
+from typing import Callable, Dict, Iterable, List, Optional, Sequence, Set, Tuple
 
 MIGRATION_DIR = Path(__file__).resolve().parent / "migrations"
 MIGRATION_PATTERN = re.compile(r"^(\d+)_([a-z0-9_]+)\.sql$")
 
+# Quoted strings (an unterminated one runs to the end of the file) and statement separators.
+STATEMENT_TOKEN_PATTERN = re.compile(r"'[^']*(?:'|\Z)|\"[^\"]*(?:\"|\Z)|;")
+LEADING_COMMENTS_PATTERN = re.compile(r"(?:\s*(?:--[^\n]*(?:\n|\Z)|/\*.*?\*/))*\s*", re.DOTALL)
+ADD_COLUMN_PATTERN = re.compile(
+    r"ALTER\s+TABLE\s+(?P<table>\w+)\s+ADD\s+COLUMN\s+(?P<column>\w+)",
+    re.IGNORECASE,
+)
+CREATE_INDEX_PATTERN = re.compile(
+    r"CREATE\s+INDEX\s+(IF\s+NOT\s+EXISTS\s+)?(?P<index>\w+)",
+    re.IGNORECASE,
+)
+
 
 @dataclass(frozen=True)
 class Migration:
     version: int
     name: str
     path: Path
+    checksum: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class _Statement:
+    sql: str
+    column_guard: Optional[Tuple[str, str]] = None
+    index_guard: Optional[str] = None
 
 
 class MigrationError(RuntimeError):
@@ -23,30 +52,52 @@ class MigrationError(RuntimeError):
 
 def _split_sql_statements(sql_text: str) -> List[str]:
     statements: List[str] = []
-    buffer: List[str] = []
-    in_single_quote = False
-    in_double_quote = False
-
-    for char in sql_text:
-        if char == "'" and not in_double_quote:
-            in_single_quote = not in_single_quote
-        elif char == '"' and not in_single_quote:
-            in_double_quote = not in_double_quote
-
-        if char == ";" and not in_single_quote and not in_double_quote:
-            statement = "".join(buffer).strip()
+    start = 0
+    for match in STATEMENT_TOKEN_PATTERN.finditer(sql_text):
+        if match.group() == ";":
+            statement = sql_text[start : match.start()].strip()
             if statement:
                 statements.append(statement)
-            buffer = []
-        else:
-            buffer.append(char)
-
-    trailing = "".join(buffer).strip()
+            start = match.end()
+    trailing = sql_text[start:].strip()
     if trailing:
         statements.append(trailing)
     return statements
 
 
+def _parse_statement(statement: str) -> _Statement:
+    body = statement[LEADING_COMMENTS_PATTERN.match(statement).end() :]
+    alter_match = ADD_COLUMN_PATTERN.match(body)
+    if alter_match:
+        return _Statement(statement, column_guard=(alter_match.group("table"), alter_match.group("column")))
+    index_match = CREATE_INDEX_PATTERN.match(body)
+    if index_match and not index_match.group(1):
+        return _Statement(statement, index_guard=index_match.group("index"))
+    return _Statement(statement)
+
+
+# Parsed migrations keyed by the SHA-256 of their file contents.
+_STATEMENT_CACHE: Dict[str, Tuple[_Statement, ...]] = {}
+
+
+def _file_checksum(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _migration_statements(migration: Migration) -> Tuple[str, Tuple[_Statement, ...]]:
+    data = migration.path.read_bytes()
+    checksum = hashlib.sha256(data).hexdigest()
+    if migration.checksum is not None and checksum != migration.checksum:
+        raise MigrationError(f"Migration {migration.path.name} changed after it was loaded")
+    statements = _STATEMENT_CACHE.get(checksum)
+    if statements is None:
+        statements = tuple(
+            _parse_statement(statement) for statement in _split_sql_statements(data.decode("utf-8"))
+        )
+        _STATEMENT_CACHE[checksum] = statements
+    return checksum, statements
+
+
 def _column_exists(conn: sqlite3.Connection, table: str, column: str) -> bool:
     cursor = conn.execute(f"PRAGMA table_info({table});")
     return any(row[1] == column for row in cursor.fetchall())
@@ -57,27 +108,12 @@ def _index_exists(conn: sqlite3.Connection, index: str) -> bool:
     return cursor.fetchone() is not None
 
 
-def _guarded_execute(conn: sqlite3.Connection, statement: str) -> None:
-    alter_match = re.match(
-        r"^ALTER\s+TABLE\s+(?P<table>\w+)\s+ADD\s+COLUMN\s+(?P<column>\w+)",
-        statement,
-        flags=re.IGNORECASE,
-    )
-    if alter_match:
-        table = alter_match.group("table")
-        column = alter_match.group("column")
-        if _column_exists(conn, table, column):
-            return
-
-    index_match = re.match(
-        r"^CREATE\s+INDEX\s+(IF\s+NOT\s+EXISTS\s+)?(?P<index>\w+)",
-        statement,
-        flags=re.IGNORECASE,
-    )
-    if index_match and _index_exists(conn, index_match.group("index")):
+def _guarded_execute(conn: sqlite3.Connection, statement: _Statement) -> None:
+    if statement.column_guard and _column_exists(conn, *statement.column_guard):
         return
-
-    conn.execute(statement)
+    if statement.index_guard and _index_exists(conn, statement.index_guard):
+        return
+    conn.execute(statement.sql)
 
 
 def load_migrations(directory: Path = MIGRATION_DIR) -> List[Migration]:
@@ -88,7 +124,9 @@ def load_migrations(directory: Path = MIGRATION_DIR) -> List[Migration]:
             raise MigrationError(f"Invalid migration filename: {path.name}")
         version = int(match.group(1))
         name = match.group(2)
-        migrations.append(Migration(version=version, name=name, path=path))
+        migrations.append(
+            Migration(version=version, name=name, path=path, checksum=_file_checksum(path))
+        )
     validate_migrations(migrations)
     return migrations
 
@@ -110,42 +148,231 @@ def _ensure_schema_table(conn: sqlite3.Connection) -> None:
         """
         CREATE TABLE IF NOT EXISTS schema_version (
             version INTEGER PRIMARY KEY,
-            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP,
+            checksum TEXT
         );
         """
     )
+    if not _column_exists(conn, "schema_version", "checksum"):
+        conn.execute("ALTER TABLE schema_version ADD COLUMN checksum TEXT;")
 
 
-def _applied_versions(conn: sqlite3.Connection) -> set[int]:
-    cursor = conn.execute("SELECT version FROM schema_version ORDER BY version;")
-    return {row[0] for row in cursor.fetchall()}
+def _applied_versions(conn: sqlite3.Connection) -> Optional[Dict[int, Optional[str]]]:
+    """Applied versions and their recorded checksums, or None before the current schema_version."""
+    try:
+        cursor = conn.execute("SELECT version, checksum FROM schema_version ORDER BY version;")
+    except sqlite3.OperationalError:
+        return None
+    return {row[0]: row[1] for row in cursor.fetchall()}
 
 
-def apply_migrations(conn: sqlite3.Connection, migrations: Iterable[Migration]) -> None:
-    _ensure_schema_table(conn)
+def _is_current(applied: Dict[int, Optional[str]], migrations: List[Migration]) -> bool:
+    return all(
+        migration.checksum is not None and applied.get(migration.version) == migration.checksum
+        for migration in migrations
+    )
+
+
+def apply_migrations(conn: sqlite3.Connection, migrations: Iterable[Migration]) -> List[int]:
+    migrations = list(migrations)
     applied = _applied_versions(conn)
+    # Up-to-date databases cost a single query.
+    if applied is not None and _is_current(applied, migrations):
+        return []
 
+    _ensure_schema_table(conn)
+    applied = _applied_versions(conn) or {}
+    newly_applied: List[int] = []
     for migration in migrations:
+        checksum, statements = _migration_statements(migration)
         if migration.version in applied:
+            recorded = applied[migration.version]
+            if recorded is None:
+                conn.execute(
+                    "UPDATE schema_version SET checksum = ? WHERE version = ?;",
+                    (checksum, migration.version),
+                )
+            elif recorded != checksum:
+                raise MigrationError(
+                    f"Migration {migration.version} ({migration.name}) was modified after it was applied"
+                )
             continue
-        sql_text = migration.path.read_text(encoding="utf-8")
-        statements = _split_sql_statements(sql_text)
+        _apply_migration(conn, migration, checksum, statements)
+        newly_applied.append(migration.version)
+    return newly_applied
+
+
+def _apply_migration(
+    conn: sqlite3.Connection,
+    migration: Migration,
+    checksum: str,
+    statements: Tuple[_Statement, ...],
+) -> None:
+    # A savepoint is its own transaction outside one and nests inside the caller's.
+    conn.execute("SAVEPOINT apply_migration;")
+    try:
         for statement in statements:
             _guarded_execute(conn, statement)
-        conn.execute("INSERT INTO schema_version (version) VALUES (?);", (migration.version,))
+        conn.execute(
+            "INSERT INTO schema_version (version, checksum) VALUES (?, ?);",
+            (migration.version, checksum),
+        )
+    except sqlite3.Error as error:
+        conn.execute("ROLLBACK TO apply_migration;")
+        conn.execute("RELEASE apply_migration;")
+        raise MigrationError(
+            f"Migration {migration.version} ({migration.name}) failed: {error}"
+        ) from error
+    conn.execute("RELEASE apply_migration;")
+
+
+def migrate(db_path: Path, migrations: Optional[List[Migration]] = None) -> List[int]:
+    if migrations is None:
+        migrations = load_migrations()
+    with closing(sqlite3.connect(db_path)) as conn:
+        applied = apply_migrations(conn, migrations)
+        conn.commit()
+    return applied
 
 
-def migrate(db_path: Path) -> None:
+@dataclass(frozen=True)
+class FleetResult:
+    path: Path
+    seconds: float
+    applied: Tuple[int, ...] = ()
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+
+def _migrate_one(path: Path, migrations: List[Migration]) -> FleetResult:
+    started = time.perf_counter()
+    # sqlite3.connect would create a mistyped path as a new, empty database.
+    if not path.is_file():
+        error = f"FileNotFoundError: no database at {path}"
+        return FleetResult(path, time.perf_counter() - started, error=error)
+    try:
+        applied = migrate(path, migrations)
+    except Exception as error:
+        return FleetResult(path, time.perf_counter() - started, error=f"{type(error).__name__}: {error}")
+    return FleetResult(path, time.perf_counter() - started, tuple(applied))
+
+
+def _fingerprint(migrations: Iterable[Migration]) -> str:
+    payload = "\n".join(f"{migration.version}:{migration.checksum}" for migration in migrations)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def _completed_paths(state_path: Optional[Path], fingerprint: str) -> Set[str]:
+    if state_path is None or not state_path.exists():
+        return set()
+    completed: Set[str] = set()
+    for line in state_path.read_text(encoding="utf-8").splitlines():
+        try:
+            entry = json.loads(line)
+        except json.JSONDecodeError:
+            continue  # a line cut short by an interrupted run
+        if entry.get("migrations") == fingerprint:
+            completed.add(entry["path"])
+    return completed
+
+
+def expand_targets(targets: Iterable[str], pattern: str = "*.db") -> List[Path]:
+    """Database files named by paths, directories (searched recursively) or glob patterns."""
+    paths: Dict[Path, None] = {}
+    for target in targets:
+        path = Path(target)
+        if path.is_dir():
+            matches = sorted(path.rglob(pattern))
+        elif glob.has_magic(target):
+            matches = sorted(Path(match) for match in glob.glob(target, recursive=True))
+        else:
+            matches = [path]
+        paths.update(dict.fromkeys(matches))
+    return list(paths)
+
+
+def migrate_fleet(
+    paths: Iterable[Path],
+    workers: Optional[int] = None,
+    state_path: Optional[Path] = None,
+    on_result: Optional[Callable[[FleetResult], None]] = None,
+) -> List[FleetResult]:
+    """Migrate many databases with a process pool.
+
+    Databases brought up to date are appended to ``state_path`` together
+    with a fingerprint of the migration set, so a rerun after an interruption
+    or failures only visits the rest. Changing any migration invalidates the
+    recorded progress.
+    """
     migrations = load_migrations()
-    with sqlite3.connect(db_path) as conn:
-        apply_migrations(conn, migrations)
-        conn.commit()
-
+    fingerprint = _fingerprint(migrations)
+    completed = _completed_paths(state_path, fingerprint)
+    pending = [path for path in paths if str(path) not in completed]
+    results: List[FleetResult] = []
+    if not pending:
+        return results
+    state = state_path.open("a", encoding="utf-8") if state_path is not None else None
+    try:
+        workers = workers or os.cpu_count() or 1
+        # Hand out work in chunks so thousands of fast-path databases don't cost one IPC each.
+        chunksize = max(1, len(pending) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(
+                partial(_migrate_one, migrations=migrations),
+                pending,
+                chunksize=chunksize,
+            ):
+                results.append(result)
+                if state is not None and result.ok:
+                    state.write(json.dumps({"path": str(result.path), "migrations": fingerprint}) + "\n")
+                    state.flush()
+                if on_result is not None:
+                    on_result(result)
+    finally:
+        if state is not None:
+            state.close()
+    return results
+
+
+def _print_result(result: FleetResult) -> None:
+    if result.ok:
+        applied = ", ".join(str(version) for version in result.applied) or "none"
+        print(f"ok      {result.path} ({result.seconds * 1000:.1f} ms, applied: {applied})")
+    else:
+        print(f"FAILED  {result.path} ({result.seconds * 1000:.1f} ms): {result.error}")
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Apply pending migrations to one or many SQLite databases.")
+    parser.add_argument(
+        "targets",
+        nargs="*",
+        help="database files, directories or glob patterns (default: var/app.db)",
+    )
+    parser.add_argument("--pattern", default="*.db", help="file pattern used inside directories")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--state", type=Path, help="progress file that makes fleet runs resumable")
+    args = parser.parse_args(argv)
+
+    if not args.targets:
+        db_path = Path("var/app.db")
+        db_path.parent.mkdir(parents=True, exist_ok=True)
+        migrate(db_path)
+        return
 
-def main() -> None:
-    db_path = Path("var/app.db")
-    db_path.parent.mkdir(parents=True, exist_ok=True)
-    migrate(db_path)
+    paths = expand_targets(args.targets, args.pattern)
+    started = time.perf_counter()
+    results = migrate_fleet(paths, args.workers, args.state, _print_result)
+    failed = sum(1 for result in results if not result.ok)
+    print(
+        f"{len(results)} of {len(paths)} databases processed in {time.perf_counter() - started:.1f} s, "
+        f"{failed} failed, {len(paths) - len(results)} already done"
+    )
+    if failed:
+        raise SystemExit(1)
 
 
 if __name__ == "__main__":
@@ -1,16 +1,13 @@
+from tabata.async_history import AsyncHistoryStore
+from tabata.async_repositories import (
+    AsyncBlockRepository,
+    AsyncExerciseRepository,
+    AsyncSessionRepository,
+)
+from tabata.history import HistoryStore, SessionRecord
 from tabata.models import Block, Exercise, Interval, Session
-from tabata.repositories import BlockRepository, ExerciseRepository, SessionRepository
-
-__all__ = [
-    "Block",
-    "Exercise",
-    "Interval",
-    "Session",
-    "BlockRepository",
-    "ExerciseRepository",
-    "SessionRepository",
-from .history import HistoryStore, SessionRecord
-from .progress import (
+from tabata.progress import (
+    ProgressBuckets,
     WeeklyProgress,
     YearlyProgress,
     total_calories,
@@ -19,10 +16,24 @@ from .progress import (
     weekly_progress,
     yearly_progress,
 )
+from tabata.repositories import BlockRepository, ExerciseRepository, SessionRepository
+from tabata.timeline import Timeline, TimelineScheduler, Transition, compile_session
 
 __all__ = [
+    "Block",
+    "Exercise",
+    "Interval",
+    "Session",
+    "BlockRepository",
+    "ExerciseRepository",
+    "SessionRepository",
+    "AsyncBlockRepository",
+    "AsyncExerciseRepository",
+    "AsyncSessionRepository",
     "HistoryStore",
+    "AsyncHistoryStore",
     "SessionRecord",
+    "ProgressBuckets",
     "WeeklyProgress",
     "YearlyProgress",
     "total_calories",
@@ -30,4 +41,8 @@ __all__ = [
     "weekly_frequency",
     "weekly_progress",
     "yearly_progress",
+    "Timeline",
+    "TimelineScheduler",
+    "Transition",
+    "compile_session",
 ]
@@ -0,0 +1,73 @@
+from __future__ import annotations
+
+import asyncio
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from itertools import islice
+from pathlib import Path
+from typing import AsyncIterator, Callable, Optional, TypeVar
+
+from .history import HistoryStore, SessionRecord
+from .progress import WeeklyProgress, YearlyProgress
+
+T = TypeVar("T")
+
+
+class AsyncHistoryStore:
+    """HistoryStore whose file I/O runs on a dedicated worker thread.
+
+    A single worker serializes appends and index reloads, so the wrapped
+    store is never used from two threads at once.
+    """
+
+    def __init__(self, path: Path, chunk_size: int = 256) -> None:
+        self._store = HistoryStore(path)
+        self._chunk_size = chunk_size
+        self._worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="tabata-history")
+
+    async def add_session(self, record: SessionRecord) -> None:
+        await self._run(self._store.add_session, record)
+
+    async def list_sessions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> list[SessionRecord]:
+        return await self._run(self._store.list_sessions, start, end)
+
+    async def iter_sessions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        order: str = "asc",
+    ) -> AsyncIterator[SessionRecord]:
+        sessions = await self._run(self._store.iter_sessions, start, end, order)
+        try:
+            while True:
+                chunk = await self._run(list, islice(sessions, self._chunk_size))
+                for session in chunk:
+                    yield session
+                if len(chunk) < self._chunk_size:
+                    break
+        finally:
+            await self._run(sessions.close)
+
+    async def weekly_progress(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> list[WeeklyProgress]:
+        return await self._run(self._store.weekly_progress, start, end)
+
+    async def yearly_progress(self) -> list[YearlyProgress]:
+        return await self._run(self._store.yearly_progress)
+
+    async def rebuild_rollups(self) -> None:
+        await self._run(self._store.rebuild_rollups)
+
+    async def close(self) -> None:
+        await self._run(self._store.close)
+        await asyncio.get_running_loop().run_in_executor(None, self._worker.shutdown)
+
+    async def _run(self, function: Callable[..., T], *args: object) -> T:
+        return await asyncio.get_running_loop().run_in_executor(self._worker, function, *args)
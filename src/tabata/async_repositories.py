@@ -0,0 +1,120 @@
+from __future__ import annotations
+
+from abc import ABC, abstractmethod
+from typing import Dict, Iterable, List, Optional
+
+from tabata.models import Block, Exercise, Session
+
+
+class AsyncExerciseRepository(ABC):
+    @abstractmethod
+    async def create(self, exercise: Exercise) -> Exercise:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, exercise_id: int) -> Optional[Exercise]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list(self) -> List[Exercise]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_by_category(self, category: str) -> List[Exercise]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update(self, exercise: Exercise) -> Exercise:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, exercise_id: int) -> None:
+        raise NotImplementedError
+
+
+class AsyncBlockRepository(ABC):
+    @abstractmethod
+    async def create(self, block: Block, session_id: int) -> Block:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, block_id: int) -> Optional[Block]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_by_session(self, session_id: int) -> List[Block]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_with_intervals(self, block_id: int) -> Optional[Block]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_with_intervals(self, session_id: int) -> List[Block]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update(self, block: Block) -> Block:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, block_id: int) -> None:
+        raise NotImplementedError
+
+
+class AsyncSessionRepository(ABC):
+    @abstractmethod
+    async def create(self, session: Session) -> Session:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_with_blocks(self, session: Session) -> Session:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def create_many_with_blocks(self, sessions: Iterable[Session]) -> List[Session]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get(self, session_id: int) -> Optional[Session]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def get_with_details(self, session_id: int) -> Optional[Session]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list_with_details(self, session_ids: Iterable[int]) -> List[Session]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def list(self) -> List[Session]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update(self, session: Session) -> Session:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def update_with_blocks(self, session: Session) -> Session:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def delete(self, session_id: int) -> None:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def total_duration_seconds(self, session_id: int) -> int:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def estimate_calories(self, session_id: int) -> float:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def estimate_calories_by_session(self, session_ids: Iterable[int]) -> Dict[int, float]:
+        raise NotImplementedError
+
+    @abstractmethod
+    async def estimate_calories_for_history(self, session_ids: Iterable[int]) -> float:
+        raise NotImplementedError
@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, List, Optional, Sequence, TextIO
+
+from .history import read_journal
+from .progress import ProgressBuckets, WeeklyProgress, YearlyProgress
+from .segments import SEGMENT_MAGIC, HistorySegment
+
+
+@dataclass
+class UserProgress:
+    path: Path
+    buckets: ProgressBuckets
+    seconds: float
+    error: Optional[str] = None
+
+    @property
+    def ok(self) -> bool:
+        return self.error is None
+
+    @property
+    def sessions_completed(self) -> int:
+        return sum(totals.sessions_completed for totals in self.buckets.years.values())
+
+    @property
+    def total_minutes(self) -> int:
+        return sum(totals.total_minutes for totals in self.buckets.years.values())
+
+    @property
+    def total_calories(self) -> int:
+        return sum(totals.total_calories for totals in self.buckets.years.values())
+
+    def weekly(self) -> List[WeeklyProgress]:
+        return self.buckets.weekly()
+
+    def yearly(self) -> List[YearlyProgress]:
+        return self.buckets.yearly()
+
+    def to_dict(self) -> dict:
+        if not self.ok:
+            return {"path": str(self.path), "error": self.error}
+        return {
+            "path": str(self.path),
+            "sessions_completed": self.sessions_completed,
+            "total_minutes": self.total_minutes,
+            "total_calories": self.total_calories,
+            "weekly": [
+                [week.week_start.date().isoformat(), week.total_minutes, week.total_calories, week.sessions_completed]
+                for week in self.weekly()
+            ],
+            "yearly": [
+                [year.year, year.total_minutes, year.total_calories, year.sessions_completed]
+                for year in self.yearly()
+            ],
+        }
+
+
+@dataclass
+class BatchReport:
+    """Outcome of a batch run; ``buckets`` holds the totals merged across every user."""
+
+    buckets: ProgressBuckets = field(default_factory=ProgressBuckets)
+    files: int = 0
+    failed: List[Path] = field(default_factory=list)
+    sessions: int = 0
+    seconds: float = 0.0
+
+    @property
+    def files_per_second(self) -> float:
+        return self.files / self.seconds if self.seconds else 0.0
+
+    @property
+    def sessions_per_second(self) -> float:
+        return self.sessions / self.seconds if self.seconds else 0.0
+
+
+def aggregate_file(path: Path) -> UserProgress:
+    """Progress buckets for one user's history, a journal or a binary segment.
+
+    The file is only read: no index or rollup sidecar is written next to it.
+    """
+    started = time.perf_counter()
+    try:
+        if _is_segment(path):
+            with HistorySegment(path) as segment:
+                buckets = ProgressBuckets.from_records(segment.iter_sessions())
+        else:
+            buckets = ProgressBuckets.from_records(read_journal(path))
+    except Exception as error:
+        return UserProgress(path, ProgressBuckets(), time.perf_counter() - started, f"{type(error).__name__}: {error}")
+    return UserProgress(path, buckets, time.perf_counter() - started)
+
+
+def aggregate_histories(
+    paths: Iterable[Path],
+    sink: Optional[Callable[[UserProgress], None]] = None,
+    workers: Optional[int] = None,
+) -> BatchReport:
+    """Aggregate many users' histories with a process pool, one file per task.
+
+    Each user's result is handed to ``sink`` as soon as it arrives and its
+    buckets are merged into the report; merging is associative, so the
+    fleet-wide totals do not depend on how files are spread across workers.
+    """
+    pending = list(paths)
+    report = BatchReport()
+    started = time.perf_counter()
+    if pending:
+        workers = workers or os.cpu_count() or 1
+        chunksize = max(1, len(pending) // (4 * workers))
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            for result in pool.map(aggregate_file, pending, chunksize=chunksize):
+                report.files += 1
+                if result.ok:
+                    report.buckets.merge(result.buckets)
+                    report.sessions += result.sessions_completed
+                else:
+                    report.failed.append(result.path)
+                if sink is not None:
+                    sink(result)
+    report.seconds = time.perf_counter() - started
+    return report
+
+
+def json_lines_sink(stream: TextIO) -> Callable[[UserProgress], None]:
+    def write(result: UserProgress) -> None:
+        stream.write(json.dumps(result.to_dict(), separators=(",", ":")) + "\n")
+
+    return write
+
+
+def _is_segment(path: Path) -> bool:
+    with path.open("rb") as handle:
+        return handle.read(len(SEGMENT_MAGIC)) == SEGMENT_MAGIC
+
+
+def _expand(targets: Iterable[Path], pattern: str) -> List[Path]:
+    paths: List[Path] = []
+    for target in targets:
+        paths.extend(sorted(target.rglob(pattern)) if target.is_dir() else [target])
+    return paths
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Aggregate weekly and yearly progress for many users.")
+    parser.add_argument("histories", nargs="+", type=Path, help="history files or directories of them")
+    parser.add_argument("--pattern", default="*.json", help="file pattern used inside directories")
+    parser.add_argument("--workers", type=int, help="worker processes (default: CPU count)")
+    parser.add_argument("--output", type=Path, help="JSON Lines file for per-user results (default: stdout)")
+    args = parser.parse_args(argv)
+
+    paths = _expand(args.histories, args.pattern)
+    output = args.output.open("w", encoding="utf-8") if args.output else sys.stdout
+    try:
+        report = aggregate_histories(paths, json_lines_sink(output), args.workers)
+    finally:
+        if args.output:
+            output.close()
+    print(
+        f"{report.files} histories, {report.sessions} sessions in {report.seconds:.2f} s "
+        f"({report.files_per_second:.0f} files/s, {report.sessions_per_second:.0f} sessions/s), "
+        f"{len(report.failed)} failed",
+        file=sys.stderr,
+    )
+    if report.failed:
+        raise SystemExit(1)
+
+
+if __name__ == "__main__":
+    main()
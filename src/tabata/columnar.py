@@ -0,0 +1,130 @@
+from __future__ import annotations
+
+from datetime import datetime
+from typing import TYPE_CHECKING, Iterable, List, Union
+
+from . import progress
+from .progress import WeeklyProgress, YearlyProgress
+
+try:
+    import numpy as np
+except ImportError:  # NumPy is optional; aggregations fall back to tabata.progress.
+    np = None
+
+if TYPE_CHECKING:
+    from .history import SessionRecord
+
+
+class HistoryColumns:
+    """Column-oriented copy of a history for vectorized aggregations.
+
+    Timestamps are ``datetime64[s]``, minutes and calories ``int32`` and
+    ``source_session`` is stored as ``int32`` codes into ``source_names``.
+    """
+
+    def __init__(self, completed_at, duration_minutes, calories, source_codes, source_names) -> None:
+        self.completed_at = completed_at
+        self.duration_minutes = duration_minutes
+        self.calories = calories
+        self.source_codes = source_codes
+        self.source_names: List[str] = source_names
+
+    @classmethod
+    def from_records(cls, sessions: Iterable[SessionRecord]) -> HistoryColumns:
+        if np is None:
+            raise RuntimeError("NumPy is required for columnar history analytics")
+        completed_at: List[datetime] = []
+        duration_minutes: List[int] = []
+        calories: List[int] = []
+        source_codes: List[int] = []
+        codes: dict[str, int] = {}
+        for session in sessions:
+            completed_at.append(session.completed_at)
+            duration_minutes.append(session.duration_minutes)
+            calories.append(session.calories)
+            source_codes.append(codes.setdefault(session.source_session, len(codes)))
+        return cls(
+            completed_at=np.array(completed_at, dtype="datetime64[s]"),
+            duration_minutes=np.array(duration_minutes, dtype=np.int32),
+            calories=np.array(calories, dtype=np.int32),
+            source_codes=np.array(source_codes, dtype=np.int32),
+            source_names=list(codes),
+        )
+
+    def __len__(self) -> int:
+        return len(self.completed_at)
+
+    def week_starts(self):
+        days = self.completed_at.astype("datetime64[D]")
+        # 1970-01-01 was a Thursday, so day 0 has weekday 3 (Monday == 0).
+        weekday = (days.astype(np.int64) + 3) % 7
+        return days - weekday.astype("timedelta64[D]")
+
+    def years(self):
+        return self.completed_at.astype("datetime64[Y]").astype(np.int64) + 1970
+
+    def sessions_per_source(self) -> dict[str, int]:
+        counts = np.bincount(self.source_codes, minlength=len(self.source_names))
+        return {name: int(count) for name, count in zip(self.source_names, counts)}
+
+
+History = Union[HistoryColumns, Iterable["SessionRecord"]]
+
+
+def weekly_progress(sessions: History) -> list[WeeklyProgress]:
+    if np is None:
+        return progress.weekly_progress(sessions)
+    columns = _columns(sessions)
+    keys, minutes, calories, counts = _group(columns, columns.week_starts())
+    return [
+        WeeklyProgress(
+            week_start=week_start,
+            total_minutes=int(total_minutes),
+            total_calories=int(total_calories),
+            sessions_completed=int(count),
+        )
+        for week_start, total_minutes, total_calories, count in zip(
+            keys.astype("datetime64[s]").tolist(), minutes, calories, counts
+        )
+    ]
+
+
+def yearly_progress(sessions: History) -> list[YearlyProgress]:
+    if np is None:
+        return progress.yearly_progress(sessions)
+    columns = _columns(sessions)
+    keys, minutes, calories, counts = _group(columns, columns.years())
+    return [
+        YearlyProgress(
+            year=int(year),
+            total_minutes=int(total_minutes),
+            total_calories=int(total_calories),
+            sessions_completed=int(count),
+        )
+        for year, total_minutes, total_calories, count in zip(keys, minutes, calories, counts)
+    ]
+
+
+def weekly_frequency(sessions: History) -> dict[datetime, int]:
+    if np is None:
+        return progress.weekly_frequency(sessions)
+    columns = _columns(sessions)
+    keys, counts = np.unique(columns.week_starts(), return_counts=True)
+    return dict(zip(keys.astype("datetime64[s]").tolist(), counts.tolist()))
+
+
+def _columns(sessions: History) -> HistoryColumns:
+    if isinstance(sessions, HistoryColumns):
+        return sessions
+    return HistoryColumns.from_records(sessions)
+
+
+def _group(columns: HistoryColumns, keys):
+    unique, inverse = np.unique(keys, return_inverse=True)
+    inverse = inverse.reshape(-1)
+    size = len(unique)
+    # Weighted bincount sums in float64, which is exact for integer totals below 2**53.
+    minutes = np.bincount(inverse, weights=columns.duration_minutes, minlength=size)
+    calories = np.bincount(inverse, weights=columns.calories, minlength=size)
+    counts = np.bincount(inverse, minlength=size)
+    return unique, minutes.astype(np.int64), calories.astype(np.int64), counts
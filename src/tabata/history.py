@@ -1,66 +1,350 @@
 from __future__ import annotations
 
+import calendar
 import json
-from dataclasses import asdict, dataclass
-from datetime import datetime
+import os
+import struct
+from array import array
+from bisect import bisect_left, bisect_right
+from dataclasses import dataclass
+from datetime import datetime, timedelta
 from pathlib import Path
-from typing import Iterable, Optional
+from typing import Iterable, Iterator, Optional, Tuple
+
+from .progress import WeeklyProgress, YearlyProgress, _week_start, weekly_progress
+from .rollups import ProgressRollupStore
 
 
 ISO_FORMAT = "%Y-%m-%dT%H:%M:%S"
 
+# (completed_at as epoch seconds, byte offset in the journal, byte length)
+INDEX_ENTRY = struct.Struct("<qQI")
+
+IndexEntry = Tuple[int, int, int]
+
+ORDERS = ("asc", "desc")
+
+_decode_json = json.JSONDecoder().decode
+
 
 @dataclass(frozen=True)
 class SessionRecord:
+    __slots__ = ("duration_minutes", "calories", "completed_at", "source_session")
+
     duration_minutes: int
     calories: int
     completed_at: datetime
     source_session: str
 
+    def __reduce__(self) -> tuple:
+        return (
+            type(self),
+            (self.duration_minutes, self.calories, self.completed_at, self.source_session),
+        )
+
     def to_dict(self) -> dict:
-        data = asdict(self)
-        data["completed_at"] = self.completed_at.strftime(ISO_FORMAT)
-        return data
+        return {
+            "duration_minutes": self.duration_minutes,
+            "calories": self.calories,
+            "completed_at": self.completed_at.strftime(ISO_FORMAT),
+            "source_session": self.source_session,
+        }
 
     @classmethod
     def from_dict(cls, data: dict) -> "SessionRecord":
+        # fromisoformat parses ISO_FORMAT timestamps several times faster than strptime.
         return cls(
             duration_minutes=int(data["duration_minutes"]),
             calories=int(data["calories"]),
-            completed_at=datetime.strptime(data["completed_at"], ISO_FORMAT),
+            completed_at=datetime.fromisoformat(data["completed_at"]),
             source_session=str(data["source_session"]),
         )
 
 
+class JournalIndex:
+    """Journal line locations sorted by completion time, stored as flat arrays."""
+
+    __slots__ = ("epochs", "offsets", "lengths", "journal_end")
+
+    def __init__(self) -> None:
+        self.epochs = array("q")
+        self.offsets = array("Q")
+        self.lengths = array("I")
+        self.journal_end = 0
+
+    @classmethod
+    def from_entries(cls, entries: Iterable[IndexEntry]) -> JournalIndex:
+        index = cls()
+        for epoch, offset, length in entries:
+            index.epochs.append(epoch)
+            index.offsets.append(offset)
+            index.lengths.append(length)
+            index.journal_end = max(index.journal_end, offset + length)
+        epochs = index.epochs
+        if any(epochs[position] > epochs[position + 1] for position in range(len(epochs) - 1)):
+            order = sorted(
+                range(len(epochs)),
+                key=lambda position: (epochs[position], index.offsets[position]),
+            )
+            index.epochs = array("q", (epochs[position] for position in order))
+            index.offsets = array("Q", (index.offsets[position] for position in order))
+            index.lengths = array("I", (index.lengths[position] for position in order))
+        return index
+
+    def __len__(self) -> int:
+        return len(self.epochs)
+
+    def insert(self, epoch: int, offset: int, length: int) -> None:
+        position = bisect_right(self.epochs, epoch)
+        if position == len(self.epochs):
+            self.epochs.append(epoch)
+            self.offsets.append(offset)
+            self.lengths.append(length)
+        else:
+            self.epochs.insert(position, epoch)
+            self.offsets.insert(position, offset)
+            self.lengths.insert(position, length)
+        self.journal_end = max(self.journal_end, offset + length)
+
+    def bounds(self, start: Optional[datetime], end: Optional[datetime]) -> Tuple[int, int]:
+        low = 0
+        high = len(self.epochs)
+        if start:
+            low = bisect_left(self.epochs, _epoch_seconds(start) + (1 if start.microsecond else 0))
+        if end:
+            high = bisect_right(self.epochs, _epoch_seconds(end))
+        return low, max(low, high)
+
+
 class HistoryStore:
+    """Append-only JSON Lines journal with a sidecar offset index.
+
+    Each record is one line of the journal at ``path``. The ``<path>.idx``
+    sidecar holds one fixed-width entry per line so that range queries only
+    read the lines they return, and ``<path>.rollup.sqlite`` keeps weekly and
+    yearly totals up to date on every append. Files written by the former
+    JSON array format are converted in place on first access. A last line
+    without its newline, left by a crash during an append, is cut off when
+    the index is rebuilt.
+    """
+
     def __init__(self, path: Path) -> None:
         self._path = path
+        self._index_path = path.with_name(path.name + ".idx")
+        self._rollups = ProgressRollupStore(path.with_name(path.name + ".rollup.sqlite"))
+        self._index: Optional[JournalIndex] = None
+        self._journal_size = 0
 
     def add_session(self, record: SessionRecord) -> None:
-        sessions = list(self._load())
-        sessions.append(record)
-        sessions.sort(key=lambda item: item.completed_at)
-        self._save(sessions)
+        index = self._load_index()
+        line = encode_line(record)
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        with self._path.open("ab") as journal:
+            offset = journal.tell()
+            journal.write(line)
+        entry = (_epoch_seconds(record.completed_at), offset, len(line))
+        with self._index_path.open("ab") as index_file:
+            index_file.write(INDEX_ENTRY.pack(*entry))
+        index.insert(*entry)
+        self._journal_size = offset + len(line)
+        self._rollups.add(record, offset, self._journal_size)
 
     def list_sessions(
         self,
         start: Optional[datetime] = None,
         end: Optional[datetime] = None,
     ) -> list[SessionRecord]:
-        sessions = self._load()
-        if start:
-            sessions = [item for item in sessions if item.completed_at >= start]
-        if end:
-            sessions = [item for item in sessions if item.completed_at <= end]
-        return sorted(sessions, key=lambda item: item.completed_at, reverse=True)
+        return list(self.iter_sessions(start, end, order="desc"))
+
+    def iter_sessions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+        order: str = "asc",
+    ) -> Iterator[SessionRecord]:
+        if order not in ORDERS:
+            raise ValueError(f"order must be one of {ORDERS}, got {order!r}")
+        index = self._load_index()
+        low, high = index.bounds(start, end)
+        offsets = index.offsets[low:high]
+        lengths = index.lengths[low:high]
+        if order == "desc":
+            offsets.reverse()
+            lengths.reverse()
+        return self._read_lines(offsets, lengths)
+
+    def weekly_progress(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> list[WeeklyProgress]:
+        """Weekly totals of the sessions ``list_sessions(start, end)`` returns.
+
+        Weeks the range covers entirely come from the rollups; the weeks it
+        cuts are totalled from their sessions inside the range.
+        """
+        self._ensure_rollups()
+        if start is None and end is None:
+            return self._rollups.weekly_progress()
+        # [first_full, after_full) are the whole weeks inside the range; None is unbounded.
+        first_full = None
+        if start is not None:
+            first_full = _week_start(start)
+            if first_full != start:
+                first_full += timedelta(days=7)
+        after_full = None
+        if end is not None:
+            after_full = _week_start(end)
+            # Completion times have whole seconds, so the last second closes the week.
+            if end >= after_full + timedelta(days=7, seconds=-1):
+                after_full += timedelta(days=7)
+        if first_full is not None and after_full is not None and first_full >= after_full:
+            return weekly_progress(self.iter_sessions(start, end))
+        partial: list[SessionRecord] = []
+        if first_full is not None:
+            partial.extend(self.iter_sessions(start, first_full - timedelta(seconds=1)))
+        if after_full is not None:
+            partial.extend(self.iter_sessions(after_full, end))
+        whole = self._rollups.weekly_progress(
+            first_full,
+            None if after_full is None else after_full - timedelta(days=7),
+        )
+        return sorted(weekly_progress(partial) + whole, key=lambda week: week.week_start)
+
+    def yearly_progress(self) -> list[YearlyProgress]:
+        self._ensure_rollups()
+        return self._rollups.yearly_progress()
+
+    def rebuild_rollups(self) -> None:
+        sessions = self.iter_sessions()
+        self._rollups.rebuild(sessions, self._journal_size)
+
+    def close(self) -> None:
+        self._rollups.close()
+
+    def __enter__(self) -> HistoryStore:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _ensure_rollups(self) -> None:
+        self._load_index()
+        if self._rollups.journal_size() != self._journal_size:
+            self.rebuild_rollups()
+
+    def _read_lines(self, offsets: array, lengths: array) -> Iterator[SessionRecord]:
+        if not offsets:
+            return
+        with self._path.open("rb") as journal:
+            for offset, length in zip(offsets, lengths):
+                journal.seek(offset)
+                yield decode_line(journal.read(length))
+
+    def _load_index(self) -> JournalIndex:
+        journal_size = self._current_journal_size()
+        if self._index is not None and journal_size == self._journal_size:
+            return self._index
+        index = JournalIndex.from_entries(self._read_index_file())
+        if index.journal_end != journal_size:
+            index = JournalIndex.from_entries(self._rebuild_index_file())
+            journal_size = self._current_journal_size()
+        self._index = index
+        self._journal_size = journal_size
+        return index
+
+    def _current_journal_size(self) -> int:
+        try:
+            size = self._path.stat().st_size
+        except FileNotFoundError:
+            return 0
+        if size and self._index is None and _is_legacy_json(self._path):
+            self._convert_legacy_file()
+            size = self._path.stat().st_size
+        return size
+
+    def _read_index_file(self) -> Iterator[IndexEntry]:
+        try:
+            data = self._index_path.read_bytes()
+        except FileNotFoundError:
+            return iter(())
+        usable = len(data) - len(data) % INDEX_ENTRY.size
+        return INDEX_ENTRY.iter_unpack(data[:usable])
 
-    def _load(self) -> list[SessionRecord]:
+    def _rebuild_index_file(self) -> list[IndexEntry]:
+        entries: list[IndexEntry] = []
+        if self._path.exists():
+            offset = 0
+            with self._path.open("rb") as journal:
+                for line in journal:
+                    if not line.endswith(b"\n"):
+                        break
+                    if line.strip():
+                        record = decode_line(line)
+                        entries.append((_epoch_seconds(record.completed_at), offset, len(line)))
+                    offset += len(line)
+            # The append was torn before its index entry was written; dropping it
+            # lets the next append start on a fresh line.
+            if offset != self._path.stat().st_size:
+                os.truncate(self._path, offset)
+        self._write_index(entries)
+        return entries
+
+    def _write_index(self, entries: list[IndexEntry]) -> None:
         if not self._path.exists():
-            return []
+            self._index_path.unlink(missing_ok=True)
+            return
+        payload = b"".join(INDEX_ENTRY.pack(*entry) for entry in entries)
+        temporary = self._index_path.with_name(self._index_path.name + ".tmp")
+        temporary.write_bytes(payload)
+        os.replace(temporary, self._index_path)
+
+    def _convert_legacy_file(self) -> None:
         data = json.loads(self._path.read_text(encoding="utf-8"))
-        return [SessionRecord.from_dict(item) for item in data]
+        records = sorted(
+            (SessionRecord.from_dict(item) for item in data),
+            key=lambda item: item.completed_at,
+        )
+        temporary = self._path.with_name(self._path.name + ".tmp")
+        temporary.write_bytes(b"".join(encode_line(record) for record in records))
+        os.replace(temporary, self._path)
+        self._index_path.unlink(missing_ok=True)
 
-    def _save(self, sessions: Iterable[SessionRecord]) -> None:
-        self._path.parent.mkdir(parents=True, exist_ok=True)
-        payload = [item.to_dict() for item in sessions]
-        self._path.write_text(json.dumps(payload, indent=2), encoding="utf-8")
+
+def encode_line(record: SessionRecord) -> bytes:
+    """One journal line, newline included, as ``HistoryStore.add_session`` writes it."""
+    return (json.dumps(record.to_dict(), separators=(",", ":")) + "\n").encode("utf-8")
+
+
+def decode_line(line: bytes) -> SessionRecord:
+    """Parse one journal line written by ``encode_line``."""
+    return SessionRecord.from_dict(_decode_json(line.decode("utf-8")))
+
+
+def read_journal(path: Path) -> Iterator[SessionRecord]:
+    """Stream the records of a history file in file order, without touching it.
+
+    Unlike ``HistoryStore``, this writes no index or rollups and reads the
+    former JSON array format as it is instead of converting it.
+    """
+    if _is_legacy_json(path):
+        for item in json.loads(path.read_text(encoding="utf-8")):
+            yield SessionRecord.from_dict(item)
+        return
+    with path.open("rb") as journal:
+        for line in journal:
+            # A last line without its newline is a torn append, which HistoryStore drops.
+            if not line.endswith(b"\n"):
+                break
+            if line.strip():
+                yield decode_line(line)
+
+
+def _epoch_seconds(timestamp: datetime) -> int:
+    return calendar.timegm(timestamp.timetuple())
+
+
+def _is_legacy_json(path: Path) -> bool:
+    with path.open("rb") as handle:
+        head = handle.read(64).lstrip()
+    return head.startswith(b"[")
@@ -1,43 +1,277 @@
 from __future__ import annotations
 
+import weakref
 from dataclasses import dataclass, field
-from typing import Iterable, List, Optional
+from typing import Any, Callable, Iterable, List, Optional, TypeVar
+
+T = TypeVar("T")
+
+
+class _ChildList(list):
+    """A model's own child list; changing it invalidates the owner's derived values."""
+
+    __slots__ = ("_owner",)
+
+    def __init__(self, owner: _Model, items: Iterable[Any] = ()) -> None:
+        list.__init__(self, items)
+        self._owner = owner
+
+
+def _invalidating(method: Callable[..., Any]) -> Callable[..., Any]:
+    def mutate(self: _ChildList, *args: Any, **kwargs: Any) -> Any:
+        result = method(self, *args, **kwargs)
+        # Unpickling fills the list before it restores the owner.
+        owner = getattr(self, "_owner", None)
+        if owner is not None:
+            owner._invalidate()
+        return result
+
+    mutate.__name__ = method.__name__
+    return mutate
+
+
+for _name in (
+    "append",
+    "extend",
+    "insert",
+    "remove",
+    "pop",
+    "clear",
+    "sort",
+    "reverse",
+    "__setitem__",
+    "__delitem__",
+    "__iadd__",
+    "__imul__",
+):
+    setattr(_ChildList, _name, _invalidating(getattr(list, _name)))
+del _name
+
+
+class _Model:
+    """Caches derived values per object.
+
+    A cached value registers its object with the models it was computed from,
+    through weak references, and a change to any of them clears the caches of
+    its registered dependents in turn. Unrelated models are never touched, so
+    repeated reads stay O(1) whatever else changes.
+
+    Child lists built by the constructor report their own changes. A list
+    assigned afterwards is kept as it is, so the caller can go on using it, but
+    its changes cannot be observed: derived values of that model, and of the
+    models containing it, are then computed on every call.
+    """
+
+    # The models define their own __init__ (kept by @dataclass) that fills
+    # __dict__ directly: nothing can depend on a model that is still being
+    # built, and hydration creates them by the thousand.
+    def __setattr__(self, name: str, value: Any) -> None:
+        object.__setattr__(self, name, value)
+        self._invalidate()
+
+    def __getstate__(self) -> dict:
+        # Caches and dependents only make sense for this object in this process.
+        state = dict(self.__dict__)
+        state.pop("_cache", None)
+        state.pop("_dependents", None)
+        return state
+
+    def _sources(self) -> Iterable[_Model]:
+        return ()
+
+    def _observable(self) -> bool:
+        return True
+
+    def _owns(self, children: List[Any]) -> bool:
+        return isinstance(children, _ChildList) and children._owner is self
+
+    def _invalidate(self) -> None:
+        attributes = self.__dict__
+        attributes.pop("_cache", None)
+        dependents = attributes.pop("_dependents", None)
+        if dependents is None:
+            return
+        for reference in dependents.values() if type(dependents) is dict else (dependents,):
+            dependent = reference()
+            if dependent is not None:
+                dependent._invalidate()
+
+    def _cached(self, key: str, compute: Callable[[], T]) -> T:
+        attributes = self.__dict__
+        cache = attributes.get("_cache")
+        if cache is not None and key in cache:
+            return cache[key]
+        value = compute()
+        if cache is None:
+            # Anything that makes a model unobservable also clears its cache.
+            if not self._observable():
+                return value
+            cache = attributes["_cache"] = {}
+            reference = weakref.ref(self)
+            for source in self._sources():
+                _depend(source.__dict__, reference)
+        cache[key] = value
+        return value
+
+
+def _depend(attributes: dict, reference: weakref.ref) -> None:
+    # Most models have a single dependent, kept as a bare weak reference to spare
+    # allocating a dict for each of the thousands of intervals in a hydrated tree.
+    dependents = attributes.get("_dependents")
+    if dependents is None or dependents is reference:
+        attributes["_dependents"] = reference
+    elif type(dependents) is dict:
+        dependents[id(reference())] = reference
+    elif dependents() is None:
+        attributes["_dependents"] = reference
+    else:
+        attributes["_dependents"] = {id(dependents()): dependents, id(reference()): reference}
 
 
 @dataclass
-class Exercise:
+class Exercise(_Model):
     id: Optional[int]
     name: str
     category: str
     calories_per_minute: float
 
+    def __init__(self, id: Optional[int], name: str, category: str, calories_per_minute: float) -> None:
+        attributes = self.__dict__
+        attributes["id"] = id
+        attributes["name"] = name
+        attributes["category"] = category
+        attributes["calories_per_minute"] = calories_per_minute
+
 
 @dataclass
-class Interval:
+class Interval(_Model):
     id: Optional[int]
     position: int
     duration_seconds: int
     exercise: Optional[Exercise] = None
 
+    def __init__(
+        self,
+        id: Optional[int],
+        position: int,
+        duration_seconds: int,
+        exercise: Optional[Exercise] = None,
+    ) -> None:
+        attributes = self.__dict__
+        attributes["id"] = id
+        attributes["position"] = position
+        attributes["duration_seconds"] = duration_seconds
+        attributes["exercise"] = exercise
+
+    @property
+    def estimated_calories(self) -> float:
+        if self.exercise is None:
+            return 0.0
+        return self.duration_seconds * self.exercise.calories_per_minute / 60.0
+
 
 @dataclass
-class Block:
+class Block(_Model):
     id: Optional[int]
     name: str
     position: int
     intervals: List[Interval] = field(default_factory=list)
+    # The intervals make up one round, run ``repetitions`` times in a row.
+    repetitions: int = 1
+
+    def __init__(
+        self,
+        id: Optional[int],
+        name: str,
+        position: int,
+        intervals: Optional[Iterable[Interval]] = None,
+        repetitions: int = 1,
+    ) -> None:
+        attributes = self.__dict__
+        attributes["id"] = id
+        attributes["name"] = name
+        attributes["position"] = position
+        attributes["intervals"] = _ChildList(self, intervals or ())
+        attributes["repetitions"] = repetitions
+
+    def _observable(self) -> bool:
+        return self._owns(self.intervals)
+
+    def _sources(self) -> Iterable[_Model]:
+        exercises = {id(interval.exercise): interval.exercise for interval in self.intervals}
+        exercises.pop(id(None), None)
+        return [*self.intervals, *exercises.values()]
 
     def ordered_intervals(self) -> Iterable[Interval]:
-        return sorted(self.intervals, key=lambda interval: interval.position)
+        return self._cached(
+            "ordered_intervals",
+            lambda: tuple(sorted(self.intervals, key=lambda interval: interval.position)),
+        )
+
+    @property
+    def total_duration_seconds(self) -> int:
+        return self._cached(
+            "total_duration_seconds",
+            lambda: self.repetitions * sum(interval.duration_seconds for interval in self.intervals),
+        )
+
+    @property
+    def estimated_calories(self) -> float:
+        return self._cached(
+            "estimated_calories",
+            lambda: self.repetitions * sum((interval.estimated_calories for interval in self.intervals), 0.0),
+        )
 
 
 @dataclass
-class Session:
+class Session(_Model):
     id: Optional[int]
     name: str
     warmup_seconds: int
     recovery_seconds: int
     blocks: List[Block] = field(default_factory=list)
 
+    def __init__(
+        self,
+        id: Optional[int],
+        name: str,
+        warmup_seconds: int,
+        recovery_seconds: int,
+        blocks: Optional[Iterable[Block]] = None,
+    ) -> None:
+        attributes = self.__dict__
+        attributes["id"] = id
+        attributes["name"] = name
+        attributes["warmup_seconds"] = warmup_seconds
+        attributes["recovery_seconds"] = recovery_seconds
+        attributes["blocks"] = _ChildList(self, blocks or ())
+
+    def _observable(self) -> bool:
+        return self._owns(self.blocks) and all(block._observable() for block in self.blocks)
+
+    def _sources(self) -> Iterable[_Model]:
+        return self.blocks
+
     def ordered_blocks(self) -> Iterable[Block]:
-        return sorted(self.blocks, key=lambda block: block.position)
+        return self._cached(
+            "ordered_blocks",
+            lambda: tuple(sorted(self.blocks, key=lambda block: block.position)),
+        )
+
+    @property
+    def total_duration_seconds(self) -> int:
+        """Matches ``sessions.total_duration_seconds`` once blocks are loaded."""
+        return self._cached(
+            "total_duration_seconds",
+            lambda: self.warmup_seconds
+            + self.recovery_seconds
+            + sum(block.total_duration_seconds for block in self.blocks),
+        )
+
+    @property
+    def estimated_calories(self) -> float:
+        """Matches ``sessions.estimated_calories`` once blocks are loaded."""
+        return self._cached(
+            "estimated_calories",
+            lambda: sum((block.estimated_calories for block in self.blocks), 0.0),
+        )
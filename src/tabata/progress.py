@@ -1,10 +1,11 @@
 from __future__ import annotations
 
 from dataclasses import dataclass
-from datetime import datetime
-from typing import Iterable
+from datetime import datetime, timedelta
+from typing import TYPE_CHECKING, Iterable
 
-from .history import SessionRecord
+if TYPE_CHECKING:
+    from .history import SessionRecord
 
 
 @dataclass(frozen=True)
@@ -23,35 +24,84 @@ class YearlyProgress:
     sessions_completed: int
 
 
+@dataclass
+class ProgressTotals:
+    total_minutes: int = 0
+    total_calories: int = 0
+    sessions_completed: int = 0
+
+    def add(self, session: SessionRecord) -> None:
+        self.total_minutes += session.duration_minutes
+        self.total_calories += session.calories
+        self.sessions_completed += 1
+
+    def merge(self, other: ProgressTotals) -> None:
+        self.total_minutes += other.total_minutes
+        self.total_calories += other.total_calories
+        self.sessions_completed += other.sessions_completed
+
+
+class ProgressBuckets:
+    """Running weekly and yearly totals that can be fed record by record."""
+
+    def __init__(self) -> None:
+        self.weeks: dict[datetime, ProgressTotals] = {}
+        self.years: dict[int, ProgressTotals] = {}
+
+    @classmethod
+    def from_records(cls, sessions: Iterable[SessionRecord]) -> ProgressBuckets:
+        buckets = cls()
+        for session in sessions:
+            buckets.add(session)
+        return buckets
+
+    def add(self, session: SessionRecord) -> None:
+        week_start = _week_start(session.completed_at)
+        _totals(self.weeks, week_start).add(session)
+        _totals(self.years, session.completed_at.year).add(session)
+
+    def merge(self, other: ProgressBuckets) -> ProgressBuckets:
+        for week_start, totals in other.weeks.items():
+            _totals(self.weeks, week_start).merge(totals)
+        for year, totals in other.years.items():
+            _totals(self.years, year).merge(totals)
+        return self
+
+    def weekly(self) -> list[WeeklyProgress]:
+        return [
+            WeeklyProgress(
+                week_start=week_start,
+                total_minutes=totals.total_minutes,
+                total_calories=totals.total_calories,
+                sessions_completed=totals.sessions_completed,
+            )
+            for week_start, totals in sorted(self.weeks.items())
+        ]
+
+    def yearly(self) -> list[YearlyProgress]:
+        return [
+            YearlyProgress(
+                year=year,
+                total_minutes=totals.total_minutes,
+                total_calories=totals.total_calories,
+                sessions_completed=totals.sessions_completed,
+            )
+            for year, totals in sorted(self.years.items())
+        ]
+
+
 def weekly_progress(sessions: Iterable[SessionRecord]) -> list[WeeklyProgress]:
-    buckets: dict[datetime, list[SessionRecord]] = {}
+    buckets = ProgressBuckets()
     for session in sessions:
-        week_start = _week_start(session.completed_at)
-        buckets.setdefault(week_start, []).append(session)
-    return [
-        WeeklyProgress(
-            week_start=week_start,
-            total_minutes=sum(item.duration_minutes for item in items),
-            total_calories=sum(item.calories for item in items),
-            sessions_completed=len(items),
-        )
-        for week_start, items in sorted(buckets.items())
-    ]
+        _totals(buckets.weeks, _week_start(session.completed_at)).add(session)
+    return buckets.weekly()
 
 
 def yearly_progress(sessions: Iterable[SessionRecord]) -> list[YearlyProgress]:
-    buckets: dict[int, list[SessionRecord]] = {}
+    buckets = ProgressBuckets()
     for session in sessions:
-        buckets.setdefault(session.completed_at.year, []).append(session)
-    return [
-        YearlyProgress(
-            year=year,
-            total_minutes=sum(item.duration_minutes for item in items),
-            total_calories=sum(item.calories for item in items),
-            sessions_completed=len(items),
-        )
-        for year, items in sorted(buckets.items())
-    ]
+        _totals(buckets.years, session.completed_at.year).add(session)
+    return buckets.yearly()
 
 
 def total_minutes(sessions: Iterable[SessionRecord]) -> int:
@@ -70,6 +120,13 @@ def weekly_frequency(sessions: Iterable[SessionRecord]) -> dict[datetime, int]:
     return dict(sorted(frequency.items()))
 
 
+def _totals(buckets: dict, key: object) -> ProgressTotals:
+    totals = buckets.get(key)
+    if totals is None:
+        totals = buckets[key] = ProgressTotals()
+    return totals
+
+
 def _week_start(timestamp: datetime) -> datetime:
-    monday = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
-    return monday.replace(day=monday.day - monday.weekday())
+    midnight = timestamp.replace(hour=0, minute=0, second=0, microsecond=0)
+    return midnight - timedelta(days=midnight.weekday())
@@ -1,7 +1,7 @@
 from __future__ import annotations
 
 from abc import ABC, abstractmethod
-from typing import Iterable, List, Optional
+from typing import Dict, Iterable, List, Optional
 
 from tabata.models import Block, Exercise, Session
 
@@ -71,6 +71,10 @@ class SessionRepository(ABC):
     def create_with_blocks(self, session: Session) -> Session:
         raise NotImplementedError
 
+    @abstractmethod
+    def create_many_with_blocks(self, sessions: Iterable[Session]) -> List[Session]:
+        raise NotImplementedError
+
     @abstractmethod
     def get(self, session_id: int) -> Optional[Session]:
         raise NotImplementedError
@@ -79,6 +83,10 @@ class SessionRepository(ABC):
     def get_with_details(self, session_id: int) -> Optional[Session]:
         raise NotImplementedError
 
+    @abstractmethod
+    def list_with_details(self, session_ids: Iterable[int]) -> List[Session]:
+        raise NotImplementedError
+
     @abstractmethod
     def list(self) -> List[Session]:
         raise NotImplementedError
@@ -103,6 +111,10 @@ class SessionRepository(ABC):
     def estimate_calories(self, session_id: int) -> float:
         raise NotImplementedError
 
+    @abstractmethod
+    def estimate_calories_by_session(self, session_ids: Iterable[int]) -> Dict[int, float]:
+        raise NotImplementedError
+
     @abstractmethod
     def estimate_calories_for_history(self, session_ids: Iterable[int]) -> float:
         raise NotImplementedError
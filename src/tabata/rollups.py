@@ -0,0 +1,208 @@
+from __future__ import annotations
+
+import argparse
+import sqlite3
+from datetime import datetime
+from pathlib import Path
+from typing import TYPE_CHECKING, Iterable, Optional, Sequence
+
+from .progress import ProgressBuckets, ProgressTotals, WeeklyProgress, YearlyProgress, _week_start
+
+if TYPE_CHECKING:
+    from .history import SessionRecord
+
+
+ROLLUP_SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS weekly_rollups (
+        week_start TEXT PRIMARY KEY,
+        total_minutes INTEGER NOT NULL,
+        total_calories INTEGER NOT NULL,
+        sessions_completed INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS yearly_rollups (
+        year INTEGER PRIMARY KEY,
+        total_minutes INTEGER NOT NULL,
+        total_calories INTEGER NOT NULL,
+        sessions_completed INTEGER NOT NULL
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS rollup_state (
+        id INTEGER PRIMARY KEY CHECK (id = 1),
+        journal_size INTEGER NOT NULL
+    )
+    """,
+)
+
+WEEK_FORMAT = "%Y-%m-%d"
+
+
+class ProgressRollupStore:
+    """Per-week and per-year totals persisted next to a history journal.
+
+    ``journal_size`` records how many journal bytes the rollups cover so the
+    owner can tell when they are stale and must be rebuilt. One connection is
+    opened on first use and kept until ``close()``. It runs in WAL mode with
+    ``synchronous=NORMAL``, so commits do not wait for an fsync: a crash can at
+    worst lose recent updates, which the size check then rebuilds.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self._path = path
+        self._connection: Optional[sqlite3.Connection] = None
+
+    def journal_size(self) -> Optional[int]:
+        if self._connection is None and not self._path.exists():
+            return None
+        row = self._connect().execute("SELECT journal_size FROM rollup_state WHERE id = 1").fetchone()
+        return None if row is None else int(row[0])
+
+    def add(self, session: SessionRecord, previous_size: int, journal_size: int) -> bool:
+        week_start = _week_start(session.completed_at).strftime(WEEK_FORMAT)
+        with self._connect() as connection:
+            row = connection.execute("SELECT journal_size FROM rollup_state WHERE id = 1").fetchone()
+            if (row[0] if row else 0) != previous_size:
+                return False
+            _upsert(connection, "weekly_rollups", "week_start", week_start, session)
+            _upsert(connection, "yearly_rollups", "year", session.completed_at.year, session)
+            _set_journal_size(connection, journal_size)
+        return True
+
+    def rebuild(self, sessions: Iterable[SessionRecord], journal_size: int) -> ProgressBuckets:
+        buckets = ProgressBuckets.from_records(sessions)
+        with self._connect() as connection:
+            connection.execute("DELETE FROM weekly_rollups")
+            connection.execute("DELETE FROM yearly_rollups")
+            connection.executemany(
+                "INSERT INTO weekly_rollups VALUES (?, ?, ?, ?)",
+                [
+                    (week_start.strftime(WEEK_FORMAT), *_columns(totals))
+                    for week_start, totals in buckets.weeks.items()
+                ],
+            )
+            connection.executemany(
+                "INSERT INTO yearly_rollups VALUES (?, ?, ?, ?)",
+                [(year, *_columns(totals)) for year, totals in buckets.years.items()],
+            )
+            _set_journal_size(connection, journal_size)
+        return buckets
+
+    def weekly_progress(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> list[WeeklyProgress]:
+        """Totals of the whole weeks from the one containing ``start`` to the one containing ``end``.
+
+        The weeks are not cut at ``start`` and ``end``; ``HistoryStore.weekly_progress``
+        is exact for ranges that end mid-week.
+        """
+        low = _week_start(start).strftime(WEEK_FORMAT) if start else ""
+        high = _week_start(end).strftime(WEEK_FORMAT) if end else "9999-12-31"
+        rows = self._connect().execute(
+            """
+            SELECT week_start, total_minutes, total_calories, sessions_completed
+            FROM weekly_rollups
+            WHERE week_start BETWEEN ? AND ?
+            ORDER BY week_start
+            """,
+            (low, high),
+        ).fetchall()
+        return [
+            WeeklyProgress(
+                week_start=datetime.strptime(row[0], WEEK_FORMAT),
+                total_minutes=row[1],
+                total_calories=row[2],
+                sessions_completed=row[3],
+            )
+            for row in rows
+        ]
+
+    def yearly_progress(self) -> list[YearlyProgress]:
+        rows = self._connect().execute(
+            """
+            SELECT year, total_minutes, total_calories, sessions_completed
+            FROM yearly_rollups
+            ORDER BY year
+            """
+        ).fetchall()
+        return [
+            YearlyProgress(
+                year=row[0],
+                total_minutes=row[1],
+                total_calories=row[2],
+                sessions_completed=row[3],
+            )
+            for row in rows
+        ]
+
+    def close(self) -> None:
+        if self._connection is not None:
+            self._connection.close()
+            self._connection = None
+
+    def _connect(self) -> sqlite3.Connection:
+        if self._connection is None:
+            self._path.parent.mkdir(parents=True, exist_ok=True)
+            # The owning store may be driven from a worker thread, one call at a time.
+            connection = sqlite3.connect(self._path, check_same_thread=False)
+            connection.execute("PRAGMA journal_mode = WAL")
+            connection.execute("PRAGMA synchronous = NORMAL")
+            with connection:
+                for statement in ROLLUP_SCHEMA:
+                    connection.execute(statement)
+            self._connection = connection
+        return self._connection
+
+
+def _upsert(
+    connection: sqlite3.Connection,
+    table: str,
+    key_column: str,
+    key: object,
+    session: SessionRecord,
+) -> None:
+    connection.execute(
+        f"""
+        INSERT INTO {table} ({key_column}, total_minutes, total_calories, sessions_completed)
+        VALUES (?, ?, ?, 1)
+        ON CONFLICT ({key_column}) DO UPDATE SET
+            total_minutes = total_minutes + excluded.total_minutes,
+            total_calories = total_calories + excluded.total_calories,
+            sessions_completed = sessions_completed + 1
+        """,
+        (key, session.duration_minutes, session.calories),
+    )
+
+
+def _set_journal_size(connection: sqlite3.Connection, journal_size: int) -> None:
+    connection.execute(
+        """
+        INSERT INTO rollup_state (id, journal_size) VALUES (1, ?)
+        ON CONFLICT (id) DO UPDATE SET journal_size = excluded.journal_size
+        """,
+        (journal_size,),
+    )
+
+
+def _columns(totals: ProgressTotals) -> tuple[int, int, int]:
+    return totals.total_minutes, totals.total_calories, totals.sessions_completed
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    from .history import HistoryStore
+
+    parser = argparse.ArgumentParser(description="Rebuild progress rollups from raw history.")
+    parser.add_argument("history", nargs="+", type=Path, help="history journal file(s)")
+    args = parser.parse_args(argv)
+    for path in args.history:
+        with HistoryStore(path) as store:
+            store.rebuild_rollups()
+        print(f"rebuilt rollups for {path}")
+
+
+if __name__ == "__main__":
+    main()
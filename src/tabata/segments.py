@@ -0,0 +1,213 @@
+from __future__ import annotations
+
+import argparse
+import mmap
+import os
+import struct
+from bisect import bisect_left, bisect_right
+from datetime import datetime, timedelta
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from . import columnar
+from .history import HistoryStore, SessionRecord, encode_line, _epoch_seconds
+
+SEGMENT_MAGIC = b"TBSG"
+SEGMENT_VERSION = 1
+
+# magic, format version, reserved, record count, string table entries
+SEGMENT_HEADER = struct.Struct("<4sHHQI")
+# completed_at as epoch seconds, duration_minutes, calories, source_session string id
+SEGMENT_RECORD = struct.Struct("<qiiI")
+STRING_LENGTH = struct.Struct("<I")
+EPOCH_FIELD = struct.Struct("<q")
+
+EPOCH = datetime(1970, 1, 1)
+
+# numpy dtype matching SEGMENT_RECORD, for zero-copy column views.
+RECORD_DTYPE = [("epoch", "<i8"), ("minutes", "<i4"), ("calories", "<i4"), ("source", "<u4")]
+
+
+class _Epochs(Sequence[int]):
+    """Sequence view of the timestamp column, so bisect can search the mapping in place."""
+
+    def __init__(self, buffer: mmap.mmap, count: int) -> None:
+        self._buffer = buffer
+        self._count = count
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __getitem__(self, position: int) -> int:
+        return EPOCH_FIELD.unpack_from(self._buffer, SEGMENT_HEADER.size + position * SEGMENT_RECORD.size)[0]
+
+
+class HistorySegment:
+    """Read-only history segment mapped into memory.
+
+    Layout: a header, then fixed-width records sorted by completion time,
+    then the string table of ``source_session`` names the records point into.
+    """
+
+    def __init__(self, path: Path) -> None:
+        self.path = path
+        with path.open("rb") as handle:
+            self._buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        try:
+            self._count, self.sources = self._read_layout()
+        except ValueError:
+            self._buffer.close()
+            raise
+        self._epochs = _Epochs(self._buffer, self._count)
+
+    def _read_layout(self) -> Tuple[int, List[str]]:
+        if len(self._buffer) < SEGMENT_HEADER.size:
+            raise ValueError(f"{self.path} is not a history segment")
+        magic, version, _, count, string_count = SEGMENT_HEADER.unpack_from(self._buffer)
+        if magic != SEGMENT_MAGIC:
+            raise ValueError(f"{self.path} is not a history segment")
+        if version != SEGMENT_VERSION:
+            raise ValueError(f"Unsupported history segment version {version}")
+        offset = SEGMENT_HEADER.size + count * SEGMENT_RECORD.size
+        if offset > len(self._buffer):
+            raise ValueError(f"{self.path} is truncated")
+        sources: List[str] = []
+        for _ in range(string_count):
+            if offset + STRING_LENGTH.size > len(self._buffer):
+                raise ValueError(f"{self.path} is truncated")
+            (length,) = STRING_LENGTH.unpack_from(self._buffer, offset)
+            offset += STRING_LENGTH.size
+            if offset + length > len(self._buffer):
+                raise ValueError(f"{self.path} is truncated")
+            sources.append(self._buffer[offset : offset + length].decode("utf-8"))
+            offset += length
+        return count, sources
+
+    def __len__(self) -> int:
+        return self._count
+
+    def __enter__(self) -> HistorySegment:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self._buffer.close()
+
+    def bounds(self, start: Optional[datetime] = None, end: Optional[datetime] = None) -> Tuple[int, int]:
+        low = 0
+        high = self._count
+        if start:
+            low = bisect_left(self._epochs, _epoch_seconds(start) + (1 if start.microsecond else 0))
+        if end:
+            high = bisect_right(self._epochs, _epoch_seconds(end))
+        return low, max(low, high)
+
+    def iter_rows(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[Tuple[int, int, int, int]]:
+        """Raw ``(epoch, minutes, calories, source id)`` tuples, unpacked straight from the mapping."""
+        low, high = self.bounds(start, end)
+        view = memoryview(self._buffer)[
+            SEGMENT_HEADER.size + low * SEGMENT_RECORD.size : SEGMENT_HEADER.size + high * SEGMENT_RECORD.size
+        ]
+        try:
+            yield from SEGMENT_RECORD.iter_unpack(view)
+        finally:
+            view.release()
+
+    def iter_sessions(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> Iterator[SessionRecord]:
+        sources = self.sources
+        for epoch, minutes, calories, source in self.iter_rows(start, end):
+            yield SessionRecord(minutes, calories, EPOCH + timedelta(seconds=epoch), sources[source])
+
+    def columns(
+        self,
+        start: Optional[datetime] = None,
+        end: Optional[datetime] = None,
+    ) -> columnar.HistoryColumns:
+        """The records in range as ``HistoryColumns``.
+
+        Minutes and calories are views into the mapping, so they must be
+        dropped before the segment is closed.
+        """
+        np = columnar.np
+        if np is None:
+            raise RuntimeError("NumPy is required for columnar history analytics")
+        low, high = self.bounds(start, end)
+        rows = np.frombuffer(
+            self._buffer,
+            dtype=np.dtype(RECORD_DTYPE),
+            count=high - low,
+            offset=SEGMENT_HEADER.size + low * SEGMENT_RECORD.size,
+        )
+        return columnar.HistoryColumns(
+            completed_at=rows["epoch"].astype("datetime64[s]"),
+            duration_minutes=rows["minutes"],
+            calories=rows["calories"],
+            source_codes=rows["source"].astype(np.int32),
+            source_names=self.sources,
+        )
+
+
+def write_segment(path: Path, records: Iterable[SessionRecord]) -> int:
+    rows: List[Tuple[int, int, int, int]] = []
+    codes: Dict[str, int] = {}
+    for record in records:
+        code = codes.setdefault(record.source_session, len(codes))
+        rows.append((_epoch_seconds(record.completed_at), record.duration_minutes, record.calories, code))
+    rows.sort(key=lambda row: row[0])
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = path.with_name(path.name + ".tmp")
+    with temporary.open("wb") as handle:
+        handle.write(SEGMENT_HEADER.pack(SEGMENT_MAGIC, SEGMENT_VERSION, 0, len(rows), len(codes)))
+        handle.write(b"".join(SEGMENT_RECORD.pack(*row) for row in rows))
+        for source in codes:
+            encoded = source.encode("utf-8")
+            handle.write(STRING_LENGTH.pack(len(encoded)))
+            handle.write(encoded)
+    os.replace(temporary, path)
+    return len(rows)
+
+
+def segment_from_history(history_path: Path, segment_path: Path) -> int:
+    return write_segment(segment_path, HistoryStore(history_path).iter_sessions())
+
+
+def history_from_segment(segment_path: Path, history_path: Path) -> int:
+    """Write the segment's records as a HistoryStore journal, replacing ``history_path``."""
+    history_path.parent.mkdir(parents=True, exist_ok=True)
+    temporary = history_path.with_name(history_path.name + ".tmp")
+    count = 0
+    with HistorySegment(segment_path) as segment, temporary.open("wb") as journal:
+        for record in segment.iter_sessions():
+            journal.write(encode_line(record))
+            count += 1
+    os.replace(temporary, history_path)
+    # The sidecar index describes the previous journal; HistoryStore rebuilds it and the rollups.
+    history_path.with_name(history_path.name + ".idx").unlink(missing_ok=True)
+    return count
+
+
+def main(argv: Optional[Sequence[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="Convert between history journals and binary segments.")
+    parser.add_argument("direction", choices=("to-segment", "to-history"))
+    parser.add_argument("source", type=Path)
+    parser.add_argument("destination", type=Path)
+    args = parser.parse_args(argv)
+    if args.direction == "to-segment":
+        count = segment_from_history(args.source, args.destination)
+    else:
+        count = history_from_segment(args.source, args.destination)
+    print(f"wrote {count} records to {args.destination}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,21 @@
+from tabata.storage.async_sqlite import (
+    AsyncSqliteBlockRepository,
+    AsyncSqliteExerciseRepository,
+    AsyncSqliteSessionRepository,
+    SqliteAsyncExecutor,
+)
+from tabata.storage.exercise_cache import ExerciseCache
+from tabata.storage.instrumentation import InstrumentedConnection, QueryMetrics
+from tabata.storage.postgres_repositories import (
+    PostgresBlockRepository,
+    PostgresConnectionPool,
+    PostgresExerciseRepository,
+    PostgresSessionRepository,
+    initialize_postgres,
+)
+from tabata.storage.query_cache import QueryCache
 from tabata.storage.sqlite_db import initialize_sqlite
+from tabata.storage.sqlite_pool import SqliteConnectionPool, SqliteSettings, connect_sqlite
 from tabata.storage.sqlite_repositories import (
     SqliteBlockRepository,
     SqliteExerciseRepository,
@@ -6,8 +23,24 @@ from tabata.storage.sqlite_repositories import (
 )
 
 __all__ = [
+    "ExerciseCache",
     "initialize_sqlite",
+    "InstrumentedConnection",
+    "QueryMetrics",
+    "QueryCache",
+    "connect_sqlite",
+    "SqliteConnectionPool",
+    "SqliteSettings",
     "SqliteBlockRepository",
     "SqliteExerciseRepository",
     "SqliteSessionRepository",
+    "SqliteAsyncExecutor",
+    "AsyncSqliteBlockRepository",
+    "AsyncSqliteExerciseRepository",
+    "AsyncSqliteSessionRepository",
+    "initialize_postgres",
+    "PostgresConnectionPool",
+    "PostgresBlockRepository",
+    "PostgresExerciseRepository",
+    "PostgresSessionRepository",
 ]
@@ -0,0 +1,358 @@
+from __future__ import annotations
+
+import asyncio
+import queue
+import sqlite3
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
+
+from tabata.async_repositories import (
+    AsyncBlockRepository,
+    AsyncExerciseRepository,
+    AsyncSessionRepository,
+)
+from tabata.models import Block, Exercise, Session
+from tabata.storage.exercise_cache import ExerciseCache
+from tabata.storage.sqlite_pool import SqliteConnectionPool
+from tabata.storage.sqlite_repositories import (
+    SqliteBlockRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+)
+
+T = TypeVar("T")
+Operation = Callable[[sqlite3.Connection], T]
+
+_STOP = object()
+
+
+class _BatchConnection:
+    """Connection seen by repositories on the writer thread.
+
+    The batch owns the transaction, so ``with connection:`` and ``commit()``
+    inside a repository method must not end it early.
+    """
+
+    def __init__(self, connection: sqlite3.Connection) -> None:
+        self._connection = connection
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    def __enter__(self) -> _BatchConnection:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        return None
+
+    def commit(self) -> None:
+        return None
+
+
+class SqliteAsyncExecutor:
+    """Runs repository calls off the event loop against a connection pool.
+
+    Reads go to a small thread pool, each worker using its own pooled
+    connection. Writes are queued to one writer thread which commits up to
+    ``max_batch`` queued requests per transaction, each request inside its
+    own savepoint so a failing request does not undo the others. Once the
+    executor is closed, or the writer thread has stopped on an error, writes
+    raise ``RuntimeError`` instead of waiting for a thread that is gone.
+    """
+
+    def __init__(self, pool: SqliteConnectionPool, readers: int = 4, max_batch: int = 64) -> None:
+        self._pool = pool
+        self._max_batch = max_batch
+        self._readers = ThreadPoolExecutor(max_workers=readers, thread_name_prefix="tabata-sqlite-read")
+        self._writes: queue.Queue = queue.Queue()
+        # Guards the queue against writes after close() or after the writer stopped.
+        self._lock = threading.Lock()
+        self._closed = False
+        self._failure: Optional[BaseException] = None
+        self._writer = threading.Thread(target=self._write_loop, name="tabata-sqlite-write", daemon=True)
+        self._writer.start()
+        self.batches_committed = 0
+        self.writes_committed = 0
+
+    async def read(self, operation: Operation[T]) -> T:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._readers, self._run_read, operation)
+
+    async def write(self, operation: Operation[T]) -> T:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Executor is closed")
+            if self._failure is not None:
+                raise RuntimeError("Writer thread has stopped") from self._failure
+            self._writes.put((operation, loop, future))
+        return await future
+
+    async def close(self) -> None:
+        with self._lock:
+            if not self._closed:
+                self._closed = True
+                self._writes.put(_STOP)
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._writer.join)
+        self._readers.shutdown(wait=True)
+
+    def _run_read(self, operation: Operation[T]) -> T:
+        return operation(self._pool.connection())
+
+    def _write_loop(self) -> None:
+        try:
+            connection = self._pool.connection()
+            batch_connection = _BatchConnection(connection)
+            stopping = False
+            while not stopping:
+                item = self._writes.get()
+                if item is _STOP:
+                    break
+                batch = [item]
+                while len(batch) < self._max_batch:
+                    try:
+                        item = self._writes.get_nowait()
+                    except queue.Empty:
+                        break
+                    if item is _STOP:
+                        stopping = True
+                        break
+                    batch.append(item)
+                self._run_batch(connection, batch_connection, batch)
+        except BaseException as error:
+            with self._lock:
+                self._failure = error
+            # Nothing is queued once _failure is set, so this drains every waiting write.
+            failure = _as_failure(error)
+            while True:
+                try:
+                    item = self._writes.get_nowait()
+                except queue.Empty:
+                    break
+                if item is not _STOP:
+                    _notify(item[1], item[2], False, failure)
+            if not isinstance(error, Exception):
+                raise
+
+    def _run_batch(
+        self,
+        connection: sqlite3.Connection,
+        batch_connection: _BatchConnection,
+        batch: List[Tuple[Operation[Any], asyncio.AbstractEventLoop, asyncio.Future]],
+    ) -> None:
+        outcomes: List[Tuple[bool, Any]] = []
+        try:
+            connection.execute("BEGIN IMMEDIATE")
+            for operation, _, _ in batch:
+                connection.execute("SAVEPOINT request")
+                try:
+                    result = operation(batch_connection)
+                except Exception as error:
+                    connection.execute("ROLLBACK TO request")
+                    connection.execute("RELEASE request")
+                    outcomes.append((False, error))
+                else:
+                    connection.execute("RELEASE request")
+                    outcomes.append((True, result))
+            connection.commit()
+            self.batches_committed += 1
+            self.writes_committed += sum(1 for succeeded, _ in outcomes if succeeded)
+        except BaseException as error:
+            outcomes = [(False, _as_failure(error))] * len(batch)
+            if connection.in_transaction:
+                connection.rollback()
+            if not isinstance(error, Exception):
+                raise
+        finally:
+            # Resolved even when the rollback fails and the writer thread stops.
+            for (_, loop, future), (succeeded, value) in zip(batch, outcomes):
+                _notify(loop, future, succeeded, value)
+
+
+def _as_failure(error: BaseException) -> Exception:
+    # Futures awaited on the event loop must not re-raise KeyboardInterrupt or SystemExit there.
+    if isinstance(error, Exception):
+        return error
+    failure = RuntimeError("Writer thread has stopped")
+    failure.__cause__ = error
+    return failure
+
+
+def _notify(loop: asyncio.AbstractEventLoop, future: asyncio.Future, succeeded: bool, value: Any) -> None:
+    try:
+        loop.call_soon_threadsafe(_resolve, future, succeeded, value)
+    except RuntimeError:
+        # The loop is closed, so nobody is awaiting the future any more.
+        pass
+
+
+def _resolve(future: asyncio.Future, succeeded: bool, value: Any) -> None:
+    if future.cancelled():
+        return
+    if succeeded:
+        future.set_result(value)
+    else:
+        future.set_exception(value)
+
+
+class AsyncSqliteExerciseRepository(AsyncExerciseRepository):
+    def __init__(
+        self,
+        executor: SqliteAsyncExecutor,
+        exercise_cache: Optional[ExerciseCache] = None,
+    ) -> None:
+        self._executor = executor
+        self._exercise_cache = exercise_cache
+
+    def _repository(self, connection: sqlite3.Connection) -> SqliteExerciseRepository:
+        return SqliteExerciseRepository(connection, self._exercise_cache)
+
+    async def create(self, exercise: Exercise) -> Exercise:
+        return await self._executor.write(lambda connection: self._repository(connection).create(exercise))
+
+    async def get(self, exercise_id: int) -> Optional[Exercise]:
+        return await self._executor.read(lambda connection: self._repository(connection).get(exercise_id))
+
+    async def list(self) -> List[Exercise]:
+        return await self._executor.read(lambda connection: self._repository(connection).list())
+
+    async def list_by_category(self, category: str) -> List[Exercise]:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).list_by_category(category)
+        )
+
+    async def update(self, exercise: Exercise) -> Exercise:
+        updated = await self._executor.write(
+            lambda connection: self._repository(connection).update(exercise)
+        )
+        # A reader may have cached the old row between the invalidation and the commit.
+        if self._exercise_cache is not None:
+            self._exercise_cache.invalidate(updated.id)
+        return updated
+
+    async def delete(self, exercise_id: int) -> None:
+        await self._executor.write(lambda connection: self._repository(connection).delete(exercise_id))
+        if self._exercise_cache is not None:
+            self._exercise_cache.invalidate(exercise_id)
+
+
+class AsyncSqliteBlockRepository(AsyncBlockRepository):
+    def __init__(
+        self,
+        executor: SqliteAsyncExecutor,
+        exercise_cache: Optional[ExerciseCache] = None,
+    ) -> None:
+        self._executor = executor
+        self._exercise_cache = exercise_cache
+
+    def _repository(self, connection: sqlite3.Connection) -> SqliteBlockRepository:
+        return SqliteBlockRepository(connection, self._exercise_cache)
+
+    async def create(self, block: Block, session_id: int) -> Block:
+        return await self._executor.write(
+            lambda connection: self._repository(connection).create(block, session_id)
+        )
+
+    async def get(self, block_id: int) -> Optional[Block]:
+        return await self._executor.read(lambda connection: self._repository(connection).get(block_id))
+
+    async def list_by_session(self, session_id: int) -> List[Block]:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).list_by_session(session_id)
+        )
+
+    async def get_with_intervals(self, block_id: int) -> Optional[Block]:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).get_with_intervals(block_id)
+        )
+
+    async def list_with_intervals(self, session_id: int) -> List[Block]:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).list_with_intervals(session_id)
+        )
+
+    async def update(self, block: Block) -> Block:
+        return await self._executor.write(lambda connection: self._repository(connection).update(block))
+
+    async def delete(self, block_id: int) -> None:
+        await self._executor.write(lambda connection: self._repository(connection).delete(block_id))
+
+
+class AsyncSqliteSessionRepository(AsyncSessionRepository):
+    def __init__(
+        self,
+        executor: SqliteAsyncExecutor,
+        exercise_cache: Optional[ExerciseCache] = None,
+    ) -> None:
+        self._executor = executor
+        self._exercise_cache = exercise_cache
+
+    def _repository(self, connection: sqlite3.Connection) -> SqliteSessionRepository:
+        return SqliteSessionRepository(connection, self._exercise_cache)
+
+    async def create(self, session: Session) -> Session:
+        return await self._executor.write(lambda connection: self._repository(connection).create(session))
+
+    async def create_with_blocks(self, session: Session) -> Session:
+        return await self._executor.write(
+            lambda connection: self._repository(connection).create_with_blocks(session)
+        )
+
+    async def create_many_with_blocks(self, sessions: Iterable[Session]) -> List[Session]:
+        pending = list(sessions)
+        return await self._executor.write(
+            lambda connection: self._repository(connection).create_many_with_blocks(pending)
+        )
+
+    async def get(self, session_id: int) -> Optional[Session]:
+        return await self._executor.read(lambda connection: self._repository(connection).get(session_id))
+
+    async def get_with_details(self, session_id: int) -> Optional[Session]:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).get_with_details(session_id)
+        )
+
+    async def list_with_details(self, session_ids: Iterable[int]) -> List[Session]:
+        ids = list(session_ids)
+        return await self._executor.read(
+            lambda connection: self._repository(connection).list_with_details(ids)
+        )
+
+    async def list(self) -> List[Session]:
+        return await self._executor.read(lambda connection: self._repository(connection).list())
+
+    async def update(self, session: Session) -> Session:
+        return await self._executor.write(lambda connection: self._repository(connection).update(session))
+
+    async def update_with_blocks(self, session: Session) -> Session:
+        return await self._executor.write(
+            lambda connection: self._repository(connection).update_with_blocks(session)
+        )
+
+    async def delete(self, session_id: int) -> None:
+        await self._executor.write(lambda connection: self._repository(connection).delete(session_id))
+
+    async def total_duration_seconds(self, session_id: int) -> int:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).total_duration_seconds(session_id)
+        )
+
+    async def estimate_calories(self, session_id: int) -> float:
+        return await self._executor.read(
+            lambda connection: self._repository(connection).estimate_calories(session_id)
+        )
+
+    async def estimate_calories_by_session(self, session_ids: Iterable[int]) -> Dict[int, float]:
+        ids = list(session_ids)
+        return await self._executor.read(
+            lambda connection: self._repository(connection).estimate_calories_by_session(ids)
+        )
+
+    async def estimate_calories_for_history(self, session_ids: Iterable[int]) -> float:
+        ids = list(session_ids)
+        return await self._executor.read(
+            lambda connection: self._repository(connection).estimate_calories_for_history(ids)
+        )
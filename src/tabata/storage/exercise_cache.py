@@ -0,0 +1,107 @@
+from __future__ import annotations
+
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+from tabata.models import Exercise
+
+
+class ExerciseCache:
+    """LRU-bounded identity map of exercises keyed by id.
+
+    Repositories sharing one cache hand out a single ``Exercise`` instance per
+    id, so hydrating a session whose intervals reuse an exercise hundreds of
+    times only builds it once. Cached entries are not checked against the
+    database, so only share a cache between repositories that see every write
+    to the exercises; repositories without one always query.
+    """
+
+    def __init__(self, max_size: int = 1024) -> None:
+        if max_size < 1:
+            raise ValueError("Cache size must be positive")
+        self._max_size = max_size
+        self._entries: OrderedDict[int, Exercise] = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+    def get(self, exercise_id: int) -> Optional[Exercise]:
+        with self._lock:
+            exercise = self._entries.get(exercise_id)
+            if exercise is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(exercise_id)
+            self.hits += 1
+            return exercise
+
+    def put(self, exercise: Exercise) -> Exercise:
+        if exercise.id is None:
+            return exercise
+        with self._lock:
+            self._store(exercise)
+        return exercise
+
+    def resolve(
+        self,
+        exercise_id: int,
+        name: str,
+        category: str,
+        calories_per_minute: float,
+        count: bool = True,
+    ) -> Exercise:
+        """Return the cached exercise for a database row, refreshed from it, or cache a new one.
+
+        Pass ``count=False`` when ``get`` already counted this lookup.
+        """
+        with self._lock:
+            exercise = self._entries.get(exercise_id)
+            if exercise is None:
+                if count:
+                    self.misses += 1
+                return self._store(
+                    Exercise(
+                        id=exercise_id,
+                        name=name,
+                        category=category,
+                        calories_per_minute=calories_per_minute,
+                    )
+                )
+            if count:
+                self.hits += 1
+            self._entries.move_to_end(exercise_id)
+            if (exercise.name, exercise.category, exercise.calories_per_minute) != (
+                name,
+                category,
+                calories_per_minute,
+            ):
+                exercise.name = name
+                exercise.category = category
+                exercise.calories_per_minute = calories_per_minute
+            return exercise
+
+    def invalidate(self, exercise_id: int) -> None:
+        with self._lock:
+            self._entries.pop(exercise_id, None)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def _store(self, exercise: Exercise) -> Exercise:
+        self._entries[exercise.id] = exercise
+        self._entries.move_to_end(exercise.id)
+        while len(self._entries) > self._max_size:
+            self._entries.popitem(last=False)
+        return exercise
@@ -0,0 +1,281 @@
+from __future__ import annotations
+
+import inspect
+import logging
+import sqlite3
+import sys
+import threading
+import time
+from collections import Counter, deque
+from dataclasses import dataclass, field
+from typing import Any, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+from tabata.storage.sqlite_repositories import (
+    SqliteBlockRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+)
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds of the latency histogram buckets, in seconds.
+LATENCY_BUCKETS: Tuple[float, ...] = (0.0005, 0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, float("inf"))
+
+UNATTRIBUTED = "<unattributed>"
+
+TRANSACTION_CONTROL = ("BEGIN", "COMMIT", "END", "ROLLBACK", "SAVEPOINT", "RELEASE")
+
+# Name of the local the outermost repository frame is tagged with. Frame ids are
+# reused by the next call, and holding the frame would keep its locals alive after
+# it returns; the tag goes away with the frame instead.
+_INVOCATION_TAG = "__query_metrics_invocation__"
+
+
+@dataclass
+class QueryStats:
+    queries: int = 0
+    rows: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
+    histogram: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+
+    def record(self, seconds: float, rows: int) -> None:
+        self.queries += 1
+        self.rows += rows
+        self.total_seconds += seconds
+        self.max_seconds = max(self.max_seconds, seconds)
+        for position, bound in enumerate(LATENCY_BUCKETS):
+            if seconds <= bound:
+                self.histogram[position] += 1
+                break
+
+    def to_dict(self) -> dict:
+        return {
+            "queries": self.queries,
+            "rows": self.rows,
+            "total_seconds": self.total_seconds,
+            "max_seconds": self.max_seconds,
+            "histogram": {
+                ("+Inf" if bound == float("inf") else str(bound)): count
+                for bound, count in zip(LATENCY_BUCKETS, self.histogram)
+            },
+        }
+
+
+class _Invocation(threading.local):
+    def __init__(self) -> None:
+        # The tag of the outermost repository method currently issuing queries.
+        self.tag: Optional[object] = None
+        self.statements: Counter = Counter()
+
+
+class QueryMetrics:
+    """Thread-safe query statistics shared by instrumented connections.
+
+    Queries are attributed to the outermost repository method on the stack,
+    so the block lookups made by ``get_with_details`` count towards the
+    session method that was called. A statement run ``n_plus_one_threshold``
+    times within one method invocation is reported as an N+1 pattern, and
+    queries slower than ``slow_query_seconds`` are logged with their plan.
+    """
+
+    def __init__(
+        self,
+        slow_query_seconds: float = 0.1,
+        n_plus_one_threshold: int = 10,
+        repositories: Iterable[type] = (
+            SqliteExerciseRepository,
+            SqliteBlockRepository,
+            SqliteSessionRepository,
+        ),
+        max_slow_queries: int = 100,
+    ) -> None:
+        self.slow_query_seconds = slow_query_seconds
+        self.n_plus_one_threshold = n_plus_one_threshold
+        # Cached reads and invalidating writes are wrapped; the frames to look for are the methods'.
+        self._methods = {
+            inspect.unwrap(function).__code__: function.__qualname__
+            for repository in repositories
+            for _, function in inspect.getmembers(repository, inspect.isfunction)
+        }
+        self._max_slow_queries = max_slow_queries
+        self._lock = threading.Lock()
+        self._invocation = _Invocation()
+        self.reset()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._by_method: Dict[str, QueryStats] = {}
+            self._by_statement: Dict[str, QueryStats] = {}
+            self._invocations: Counter = Counter()
+            self._n_plus_one: Counter = Counter()
+            self._slow_queries: Deque[dict] = deque(maxlen=self._max_slow_queries)
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return {
+                "queries": sum(stats.queries for stats in self._by_method.values()),
+                "methods": {
+                    method: {"invocations": self._invocations[method], **stats.to_dict()}
+                    for method, stats in sorted(self._by_method.items())
+                },
+                "statements": {
+                    statement: stats.to_dict() for statement, stats in sorted(self._by_statement.items())
+                },
+                "n_plus_one": [
+                    {"method": method, "statement": statement, "invocations": count}
+                    for (method, statement), count in self._n_plus_one.most_common()
+                ],
+                "slow_queries": list(self._slow_queries),
+            }
+
+    def _attribute(self) -> str:
+        frame = sys._getframe(1)
+        outermost = None
+        while frame is not None:
+            if frame.f_code in self._methods:
+                outermost = frame
+            frame = frame.f_back
+        invocation = self._invocation
+        if outermost is None:
+            if invocation.tag is not None:
+                invocation.tag = None
+                invocation.statements = Counter()
+            return UNATTRIBUTED
+        method = self._methods[outermost.f_code]
+        locals_ = outermost.f_locals
+        tag = locals_.get(_INVOCATION_TAG)
+        if tag is None or tag is not invocation.tag:
+            tag = invocation.tag = object()
+            locals_[_INVOCATION_TAG] = tag
+            invocation.statements = Counter()
+            with self._lock:
+                self._invocations[method] += 1
+        return method
+
+    def _record(self, method: str, statement: str, seconds: float, rows: int) -> bool:
+        invocation = self._invocation
+        invocation.statements[statement] += 1
+        with self._lock:
+            self._by_method.setdefault(method, QueryStats()).record(seconds, rows)
+            self._by_statement.setdefault(statement, QueryStats()).record(seconds, rows)
+            repeated = (
+                method != UNATTRIBUTED and invocation.statements[statement] == self.n_plus_one_threshold
+            )
+            if repeated:
+                self._n_plus_one[(method, statement)] += 1
+        if repeated:
+            logger.warning(
+                "%s ran %d or more times in one %s call (N+1)",
+                statement,
+                self.n_plus_one_threshold,
+                method,
+            )
+        return seconds >= self.slow_query_seconds
+
+    def _record_slow(self, method: str, statement: str, seconds: float, plan: List[str]) -> None:
+        with self._lock:
+            self._slow_queries.append(
+                {"method": method, "statement": statement, "seconds": seconds, "plan": plan}
+            )
+        logger.warning(
+            "slow query (%.1f ms) in %s: %s\nplan: %s",
+            seconds * 1000,
+            method,
+            statement,
+            "; ".join(plan) or "n/a",
+        )
+
+
+class _Rows:
+    """Fully fetched result of an instrumented query, read like a cursor."""
+
+    def __init__(self, cursor: sqlite3.Cursor, rows: List[tuple]) -> None:
+        self.lastrowid = cursor.lastrowid
+        self.rowcount = cursor.rowcount
+        self.description = cursor.description
+        self._rows = rows
+        self._position = 0
+
+    def fetchone(self) -> Optional[tuple]:
+        if self._position >= len(self._rows):
+            return None
+        row = self._rows[self._position]
+        self._position += 1
+        return row
+
+    def fetchmany(self, size: int = 1) -> List[tuple]:
+        rows = self._rows[self._position : self._position + size]
+        self._position += len(rows)
+        return rows
+
+    def fetchall(self) -> List[tuple]:
+        rows = self._rows[self._position :]
+        self._position = len(self._rows)
+        return rows
+
+    def __iter__(self) -> Iterator[tuple]:
+        while True:
+            row = self.fetchone()
+            if row is None:
+                return
+            yield row
+
+
+class InstrumentedConnection:
+    """Drop-in stand-in for the connection passed to the SQLite repositories.
+
+    Results are fetched eagerly so latency and row counts cover the whole
+    query; everything other than ``execute``/``executemany`` is delegated.
+    """
+
+    def __init__(self, connection: sqlite3.Connection, metrics: Optional[QueryMetrics] = None) -> None:
+        self._connection = connection
+        self.metrics = metrics if metrics is not None else QueryMetrics()
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self._connection, name)
+
+    def __enter__(self) -> InstrumentedConnection:
+        self._connection.__enter__()
+        return self
+
+    def __exit__(self, *exc_info: Any) -> Any:
+        return self._connection.__exit__(*exc_info)
+
+    def execute(self, sql: str, parameters: Sequence[Any] = ()) -> _Rows:
+        method = self.metrics._attribute()
+        started = time.perf_counter()
+        cursor = self._connection.execute(sql, parameters)
+        rows = cursor.fetchall() if cursor.description is not None else []
+        seconds = time.perf_counter() - started
+        self._finish(method, sql, seconds, len(rows), parameters)
+        return _Rows(cursor, rows)
+
+    def executemany(self, sql: str, parameters: Iterable[Sequence[Any]]) -> sqlite3.Cursor:
+        method = self.metrics._attribute()
+        started = time.perf_counter()
+        cursor = self._connection.executemany(sql, parameters)
+        seconds = time.perf_counter() - started
+        self._finish(method, sql, seconds, 0, None)
+        return cursor
+
+    def _finish(
+        self,
+        method: str,
+        sql: str,
+        seconds: float,
+        rows: int,
+        parameters: Optional[Sequence[Any]],
+    ) -> None:
+        statement = " ".join(sql.split())
+        if self.metrics._record(method, statement, seconds, rows):
+            self.metrics._record_slow(method, statement, seconds, self._plan(sql, parameters))
+
+    def _plan(self, sql: str, parameters: Optional[Sequence[Any]]) -> List[str]:
+        if parameters is None or sql.lstrip().upper().startswith(TRANSACTION_CONTROL):
+            return []
+        try:
+            return [row[3] for row in self._connection.execute(f"EXPLAIN QUERY PLAN {sql}", parameters)]
+        except sqlite3.Error:
+            return []
@@ -0,0 +1,915 @@
+"""Repositories backed by the PostgreSQL schema in ``schema.sql``.
+
+The models map onto that schema as follows:
+
+- exercise: ``exercice`` rows. The calorie rate is stored as a reference of
+  ``calories_reference`` calories per ``duree_reference`` seconds.
+- interval: ``intervalle`` rows. An interval is ``EXERCICE`` when it has an
+  exercise and ``RECUP`` otherwise.
+- block: ``bloc`` rows, linked to sessions by ``seance_blocs``.
+- interval order within a block: ``bloc_intervalles``.
+- session warmup and recovery: intervals that ``seance`` points to.
+
+Positions are stored as the 1-based ``ordre`` of the link tables, so they read
+back as ranks. Whole sessions only use positions to order their blocks and
+intervals; a block written on its own takes ``position`` as its rank.
+
+Durations are aggregated by the server through the ``seance_duree_calculee``
+view. Calories use the ``seance_calories_estimees`` formula in a query of
+their own: the view prices every interval in the database before filtering
+by session, which costs hundreds of milliseconds per lookup on a large table.
+"""
+
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, Union
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.repositories import BlockRepository, ExerciseRepository, SessionRepository
+from tabata.storage.exercise_cache import ExerciseCache
+
+try:
+    import psycopg
+except ImportError:  # psycopg is optional; only the PostgreSQL backend needs it.
+    psycopg = None
+
+SCHEMA_PATH = Path(__file__).resolve().parents[3] / "schema.sql"
+
+# Calorie rates are stored per hour, so ``calories_reference`` keeps 1/60 kcal/min.
+REFERENCE_SECONDS = 3600
+
+EXERCISE_INTERVAL = "EXERCICE"
+RECOVERY_INTERVAL = "RECUP"
+
+
+class PostgresConnectionPool:
+    """Bounded pool of PostgreSQL connections.
+
+    At most ``max_size`` connections are open at once; callers wait up to
+    ``timeout`` seconds for one to be returned. ``connection()`` is re-entrant
+    within a thread, so repository methods that call each other share one
+    transaction, committed when the outermost block exits.
+    """
+
+    def __init__(
+        self,
+        conninfo: str,
+        max_size: int = 10,
+        timeout: float = 30.0,
+        configure: Optional[Callable[[Any], None]] = None,
+    ) -> None:
+        if psycopg is None:
+            raise RuntimeError("psycopg is required for the PostgreSQL backend")
+        if max_size < 1:
+            raise ValueError("Pool size must be positive")
+        self._conninfo = conninfo
+        self._max_size = max_size
+        self._timeout = timeout
+        self._configure = configure
+        self._idle: List[Any] = []
+        self._size = 0
+        self._condition = threading.Condition()
+        self._local = threading.local()
+        self._closed = False
+
+    @property
+    def max_size(self) -> int:
+        return self._max_size
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        current = getattr(self._local, "connection", None)
+        if current is not None:
+            yield current
+            return
+        connection = self._acquire()
+        self._local.connection = connection
+        try:
+            yield connection
+        except BaseException:
+            self._local.connection = None
+            self._release(connection, commit=False)
+            raise
+        self._local.connection = None
+        self._release(connection, commit=True)
+
+    def close(self) -> None:
+        with self._condition:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+            self._condition.notify_all()
+        for connection in idle:
+            connection.close()
+
+    def __enter__(self) -> PostgresConnectionPool:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def _acquire(self) -> Any:
+        deadline = time.monotonic() + self._timeout
+        with self._condition:
+            while True:
+                if self._closed:
+                    raise RuntimeError("Connection pool is closed")
+                while self._idle:
+                    connection = self._idle.pop()
+                    if not connection.closed:
+                        return connection
+                    self._size -= 1
+                if self._size < self._max_size:
+                    self._size += 1
+                    break
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    raise TimeoutError(f"No PostgreSQL connection available within {self._timeout} s")
+                self._condition.wait(remaining)
+        try:
+            connection = psycopg.connect(self._conninfo)
+            if self._configure is not None:
+                self._configure(connection)
+                connection.commit()
+        except BaseException:
+            with self._condition:
+                self._size -= 1
+                self._condition.notify()
+            raise
+        return connection
+
+    def _release(self, connection: Any, commit: bool) -> None:
+        try:
+            if commit:
+                connection.commit()
+            else:
+                connection.rollback()
+        except BaseException:
+            connection.close()
+            raise
+        finally:
+            with self._condition:
+                if self._closed or connection.closed:
+                    self._size -= 1
+                    reusable = False
+                else:
+                    self._idle.append(connection)
+                    reusable = True
+                self._condition.notify()
+            if not reusable:
+                connection.close()
+
+
+def initialize_postgres(
+    pool: PostgresConnectionPool,
+    schema_path: Union[str, Path] = SCHEMA_PATH,
+) -> None:
+    """Create the ``schema.sql`` objects unless the database already has them."""
+    with pool.connection() as connection:
+        if connection.execute("SELECT to_regclass('seance')").fetchone()[0] is None:
+            connection.execute(Path(schema_path).read_text(encoding="utf-8"))
+
+
+class PostgresExerciseRepository(ExerciseRepository):
+    def __init__(self, pool: PostgresConnectionPool, exercise_cache: Optional[ExerciseCache] = None) -> None:
+        self._pool = pool
+        self._exercise_cache = exercise_cache
+
+    def create(self, exercise: Exercise) -> Exercise:
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                """
+                INSERT INTO exercice (nom, categorie, duree_reference, calories_reference)
+                VALUES (%s, %s, %s, %s)
+                RETURNING id
+                """,
+                (exercise.name, exercise.category, REFERENCE_SECONDS, _calories_reference(exercise)),
+            ).fetchone()
+        created = Exercise(
+            id=row[0],
+            name=exercise.name,
+            category=exercise.category,
+            calories_per_minute=exercise.calories_per_minute,
+        )
+        if self._exercise_cache is not None:
+            self._exercise_cache.put(created)
+        return created
+
+    def get(self, exercise_id: int) -> Optional[Exercise]:
+        if self._exercise_cache is not None:
+            cached = self._exercise_cache.get(exercise_id)
+            if cached is not None:
+                return cached
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                "SELECT id, nom, categorie, duree_reference, calories_reference FROM exercice WHERE id = %s",
+                (exercise_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        # The lookup above already counted the miss.
+        return _exercise_from_row(row, _identity_map(self._exercise_cache), count=False)
+
+    def list(self) -> List[Exercise]:
+        with self._pool.connection() as connection:
+            rows = connection.execute(
+                "SELECT id, nom, categorie, duree_reference, calories_reference FROM exercice ORDER BY nom"
+            ).fetchall()
+        exercises = _identity_map(self._exercise_cache)
+        return [_exercise_from_row(row, exercises) for row in rows]
+
+    def list_by_category(self, category: str) -> List[Exercise]:
+        with self._pool.connection() as connection:
+            rows = connection.execute(
+                """
+                SELECT id, nom, categorie, duree_reference, calories_reference
+                FROM exercice
+                WHERE categorie = %s
+                ORDER BY nom
+                """,
+                (category,),
+            ).fetchall()
+        exercises = _identity_map(self._exercise_cache)
+        return [_exercise_from_row(row, exercises) for row in rows]
+
+    def update(self, exercise: Exercise) -> Exercise:
+        if exercise.id is None:
+            raise ValueError("Exercise id is required for update")
+        with self._pool.connection() as connection:
+            connection.execute(
+                """
+                UPDATE exercice
+                SET nom = %s, categorie = %s, duree_reference = %s, calories_reference = %s
+                WHERE id = %s
+                """,
+                (
+                    exercise.name,
+                    exercise.category,
+                    REFERENCE_SECONDS,
+                    _calories_reference(exercise),
+                    exercise.id,
+                ),
+            )
+        if self._exercise_cache is not None:
+            self._exercise_cache.invalidate(exercise.id)
+        return exercise
+
+    def delete(self, exercise_id: int) -> None:
+        with self._pool.connection() as connection:
+            connection.execute("DELETE FROM exercice WHERE id = %s", (exercise_id,))
+        if self._exercise_cache is not None:
+            self._exercise_cache.invalidate(exercise_id)
+
+
+class PostgresBlockRepository(BlockRepository):
+    def __init__(self, pool: PostgresConnectionPool, exercise_cache: Optional[ExerciseCache] = None) -> None:
+        self._pool = pool
+        self._exercise_cache = exercise_cache
+
+    def create(self, block: Block, session_id: int) -> Block:
+        """Insert ``block`` at rank ``block.position`` among the session's blocks.
+
+        Later blocks move down one rank; a position past the last block appends.
+        """
+        _check_rank(block.position)
+        intervals = list(block.ordered_intervals())
+        for interval in intervals:
+            _check_duration(interval)
+        with self._pool.connection() as connection:
+            interval_ids = _reserve_ids(connection, "intervalle", len(intervals))
+            block_id = connection.execute(
+                "INSERT INTO bloc (nom, repetitions) VALUES (%s, %s) RETURNING id",
+                (block.name, block.repetitions),
+            ).fetchone()[0]
+            rank = _place_block(connection, session_id, block_id, block.position)
+            created = Block(id=block_id, name=block.name, position=rank, repetitions=block.repetitions)
+            with connection.cursor() as cursor:
+                cursor.executemany(
+                    "INSERT INTO intervalle (id, type, duree, exercice_id) VALUES (%s, %s, %s, %s)",
+                    [_interval_row(*pair) for pair in zip(interval_ids, intervals)],
+                )
+                cursor.executemany(
+                    "INSERT INTO bloc_intervalles (bloc_id, intervalle_id, ordre) VALUES (%s, %s, %s)",
+                    [(block_id, interval_id, rank) for rank, interval_id in enumerate(interval_ids, 1)],
+                )
+        for rank, (interval_id, interval) in enumerate(zip(interval_ids, intervals), 1):
+            created.intervals.append(_stored_interval(interval_id, rank, interval))
+        return created
+
+    def get(self, block_id: int) -> Optional[Block]:
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                """
+                SELECT bloc.id, bloc.nom, COALESCE(seance_blocs.ordre, 0), bloc.repetitions
+                FROM bloc
+                LEFT JOIN seance_blocs ON seance_blocs.bloc_id = bloc.id
+                WHERE bloc.id = %s
+                LIMIT 1
+                """,
+                (block_id,),
+            ).fetchone()
+        if row is None:
+            return None
+        return Block(id=row[0], name=row[1], position=row[2], repetitions=row[3])
+
+    def list_by_session(self, session_id: int) -> List[Block]:
+        with self._pool.connection() as connection:
+            rows = connection.execute(
+                """
+                SELECT bloc.id, bloc.nom, seance_blocs.ordre, bloc.repetitions
+                FROM seance_blocs
+                JOIN bloc ON bloc.id = seance_blocs.bloc_id
+                WHERE seance_blocs.seance_id = %s
+                ORDER BY seance_blocs.ordre
+                """,
+                (session_id,),
+            ).fetchall()
+        return [Block(id=row[0], name=row[1], position=row[2], repetitions=row[3]) for row in rows]
+
+    def get_with_intervals(self, block_id: int) -> Optional[Block]:
+        with self._pool.connection() as connection:
+            block = self.get(block_id)
+            if block is None:
+                return None
+            rows = connection.execute(
+                f"""
+                SELECT {_INTERVAL_COLUMNS}
+                FROM bloc_intervalles
+                JOIN intervalle ON intervalle.id = bloc_intervalles.intervalle_id
+                LEFT JOIN exercice ON exercice.id = intervalle.exercice_id
+                WHERE bloc_intervalles.bloc_id = %s
+                ORDER BY bloc_intervalles.ordre
+                """,
+                (block_id,),
+            ).fetchall()
+        exercises = _identity_map(self._exercise_cache)
+        block.intervals.extend(_interval_from_row(row[1:], exercises) for row in rows)
+        return block
+
+    def list_with_intervals(self, session_id: int) -> List[Block]:
+        return self.list_with_intervals_by_sessions([session_id]).get(session_id, [])
+
+    def list_with_intervals_by_sessions(self, session_ids: Iterable[int]) -> Dict[int, List[Block]]:
+        ids = list(session_ids)
+        if not ids:
+            return {}
+        with self._pool.connection() as connection:
+            block_rows = connection.execute(
+                """
+                SELECT seance_blocs.seance_id, bloc.id, bloc.nom, seance_blocs.ordre, bloc.repetitions
+                FROM seance_blocs
+                JOIN bloc ON bloc.id = seance_blocs.bloc_id
+                WHERE seance_blocs.seance_id = ANY(%s)
+                ORDER BY seance_blocs.seance_id, seance_blocs.ordre
+                """,
+                (ids,),
+            ).fetchall()
+            interval_rows = connection.execute(
+                f"""
+                SELECT {_INTERVAL_COLUMNS}
+                FROM seance_blocs
+                JOIN bloc_intervalles ON bloc_intervalles.bloc_id = seance_blocs.bloc_id
+                JOIN intervalle ON intervalle.id = bloc_intervalles.intervalle_id
+                LEFT JOIN exercice ON exercice.id = intervalle.exercice_id
+                WHERE seance_blocs.seance_id = ANY(%s)
+                ORDER BY bloc_intervalles.bloc_id, bloc_intervalles.ordre
+                """,
+                (ids,),
+            ).fetchall()
+        blocks_by_session: Dict[int, List[Block]] = {}
+        blocks_by_id: Dict[int, Block] = {}
+        for row in block_rows:
+            block = Block(id=row[1], name=row[2], position=row[3], repetitions=row[4])
+            blocks_by_session.setdefault(row[0], []).append(block)
+            blocks_by_id[block.id] = block
+        exercises = _identity_map(self._exercise_cache)
+        intervals_by_block: Dict[int, List[Interval]] = {}
+        for row in interval_rows:
+            intervals_by_block.setdefault(row[0], []).append(_interval_from_row(row[1:], exercises))
+        for block_id, intervals in intervals_by_block.items():
+            blocks_by_id[block_id].intervals.extend(intervals)
+        return blocks_by_session
+
+    def update(self, block: Block) -> Block:
+        """Store the block's name and repetitions and move it to rank ``block.position``.
+
+        Ranks are assigned as in ``create``; ``block.position`` is set to the rank stored.
+        """
+        if block.id is None:
+            raise ValueError("Block id is required for update")
+        _check_rank(block.position)
+        with self._pool.connection() as connection:
+            connection.execute(
+                "UPDATE bloc SET nom = %s, repetitions = %s WHERE id = %s",
+                (block.name, block.repetitions, block.id),
+            )
+            row = connection.execute(
+                "SELECT seance_id FROM seance_blocs WHERE bloc_id = %s",
+                (block.id,),
+            ).fetchone()
+            if row is not None:
+                block.position = _place_block(connection, row[0], block.id, block.position)
+        return block
+
+    def delete(self, block_id: int) -> None:
+        with self._pool.connection() as connection:
+            _delete_blocks(connection, [block_id])
+
+
+class PostgresSessionRepository(SessionRepository):
+    def __init__(
+        self,
+        pool: PostgresConnectionPool,
+        exercise_cache: Optional[ExerciseCache] = None,
+        batch_size: int = 1000,
+    ) -> None:
+        self._pool = pool
+        self._exercise_cache = exercise_cache
+        self._block_repo = PostgresBlockRepository(pool, self._exercise_cache)
+        self._batch_size = batch_size
+
+    def create(self, session: Session) -> Session:
+        with self._pool.connection() as connection:
+            warmup_id = _insert_phase(connection, session.warmup_seconds)
+            recovery_id = _insert_phase(connection, session.recovery_seconds)
+            row = connection.execute(
+                """
+                INSERT INTO seance (nom, echauffement_id, recuperation_id)
+                VALUES (%s, %s, %s)
+                RETURNING id
+                """,
+                (session.name, warmup_id, recovery_id),
+            ).fetchone()
+        return Session(
+            id=row[0],
+            name=session.name,
+            warmup_seconds=session.warmup_seconds,
+            recovery_seconds=session.recovery_seconds,
+            blocks=[],
+        )
+
+    def create_with_blocks(self, session: Session) -> Session:
+        with self._pool.connection() as connection:
+            return _copy_sessions(connection, [session])[0]
+
+    def create_many_with_blocks(self, sessions: Iterable[Session]) -> List[Session]:
+        """Load sessions with ``COPY``, ``batch_size`` sessions at a time, in one transaction."""
+        pending = list(sessions)
+        created: List[Session] = []
+        with self._pool.connection() as connection:
+            for start in range(0, len(pending), self._batch_size):
+                created.extend(_copy_sessions(connection, pending[start : start + self._batch_size]))
+        return created
+
+    def get(self, session_id: int) -> Optional[Session]:
+        with self._pool.connection() as connection:
+            row = connection.execute(f"{_SESSION_QUERY} WHERE seance.id = %s", (session_id,)).fetchone()
+        if row is None:
+            return None
+        return Session(id=row[0], name=row[1], warmup_seconds=row[2], recovery_seconds=row[3])
+
+    def get_with_details(self, session_id: int) -> Optional[Session]:
+        with self._pool.connection():
+            session = self.get(session_id)
+            if session is None:
+                return None
+            session.blocks.extend(self._block_repo.list_with_intervals(session_id))
+        return session
+
+    def list_with_details(self, session_ids: Iterable[int]) -> List[Session]:
+        ids = list(dict.fromkeys(session_ids))
+        if not ids:
+            return []
+        with self._pool.connection() as connection:
+            rows = connection.execute(f"{_SESSION_QUERY} WHERE seance.id = ANY(%s)", (ids,)).fetchall()
+            sessions = {
+                row[0]: Session(id=row[0], name=row[1], warmup_seconds=row[2], recovery_seconds=row[3])
+                for row in rows
+            }
+            blocks = self._block_repo.list_with_intervals_by_sessions(list(sessions))
+        for session_id, session in sessions.items():
+            session.blocks.extend(blocks.get(session_id, ()))
+        return [sessions[session_id] for session_id in ids if session_id in sessions]
+
+    def list(self) -> List[Session]:
+        with self._pool.connection() as connection:
+            rows = connection.execute(f"{_SESSION_QUERY} ORDER BY seance.id").fetchall()
+        return [Session(id=row[0], name=row[1], warmup_seconds=row[2], recovery_seconds=row[3]) for row in rows]
+
+    def update(self, session: Session) -> Session:
+        if session.id is None:
+            raise ValueError("Session id is required for update")
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                "SELECT echauffement_id, recuperation_id FROM seance WHERE id = %s FOR UPDATE",
+                (session.id,),
+            ).fetchone()
+            if row is None:
+                return session
+            warmup_id = _update_phase(connection, row[0], session.warmup_seconds)
+            recovery_id = _update_phase(connection, row[1], session.recovery_seconds)
+            connection.execute(
+                "UPDATE seance SET nom = %s, echauffement_id = %s, recuperation_id = %s WHERE id = %s",
+                (session.name, warmup_id, recovery_id, session.id),
+            )
+            # Dropped phases can only go once the session no longer points to them.
+            _delete_ids(
+                connection,
+                "intervalle",
+                [stored for stored, kept in zip(row, (warmup_id, recovery_id)) if stored and stored != kept],
+            )
+        return session
+
+    def update_with_blocks(self, session: Session) -> Session:
+        """Store the session's blocks, keeping the ids of blocks and intervals that still exist.
+
+        Kept intervals may move between the session's blocks.
+        """
+        if session.id is None:
+            raise ValueError("Session id is required for update")
+        with self._pool.connection() as connection:
+            self.update(session)
+            stored_blocks = {
+                row[0]
+                for row in connection.execute(
+                    "SELECT bloc_id FROM seance_blocs WHERE seance_id = %s",
+                    (session.id,),
+                )
+            }
+            stored_intervals = set(_block_intervals(connection, list(stored_blocks)))
+            # Decide which rows are kept before reserving ids for the new ones. A block or
+            # interval listed twice is kept the first time and copied the second.
+            kept_blocks: set = set()
+            kept_intervals: set = set()
+            plan = []
+            for block in session.ordered_blocks():
+                keep_block = block.id in stored_blocks and block.id not in kept_blocks
+                if keep_block:
+                    kept_blocks.add(block.id)
+                intervals = []
+                for interval in block.ordered_intervals():
+                    keep = interval.id in stored_intervals and interval.id not in kept_intervals
+                    if keep:
+                        kept_intervals.add(interval.id)
+                    intervals.append((interval, keep))
+                plan.append((block, keep_block, intervals))
+            new_blocks = iter(_reserve_ids(connection, "bloc", len(plan) - len(kept_blocks)))
+            new_intervals = iter(
+                _reserve_ids(
+                    connection,
+                    "intervalle",
+                    sum(len(intervals) for _, _, intervals in plan) - len(kept_intervals),
+                )
+            )
+
+            block_inserts, block_updates, interval_inserts, interval_updates = [], [], [], []
+            block_links, interval_links = [], []
+            blocks: List[Block] = []
+            for block_rank, (block, keep_block, intervals) in enumerate(plan, 1):
+                if keep_block:
+                    block_id = block.id
+                    block_updates.append((block.name, block.repetitions, block_id))
+                else:
+                    block_id = next(new_blocks)
+                    block_inserts.append((block_id, block.name, block.repetitions))
+                block_links.append((session.id, block_id, block_rank))
+                updated = Block(
+                    id=block_id,
+                    name=block.name,
+                    position=block_rank,
+                    repetitions=block.repetitions,
+                )
+                for rank, (interval, keep) in enumerate(intervals, 1):
+                    if keep:
+                        interval_id = interval.id
+                        interval_updates.append((*_interval_row(interval_id, interval)[1:], interval_id))
+                    else:
+                        interval_id = next(new_intervals)
+                        interval_inserts.append(_interval_row(interval_id, interval))
+                    interval_links.append((block_id, interval_id, rank))
+                    updated.intervals.append(_stored_interval(interval_id, rank, interval))
+                blocks.append(updated)
+
+            # The order lives in the link tables, which are rewritten rather than
+            # shuffled around their unique (parent, ordre) constraints.
+            connection.execute("DELETE FROM seance_blocs WHERE seance_id = %s", (session.id,))
+            if stored_blocks:
+                connection.execute(
+                    "DELETE FROM bloc_intervalles WHERE bloc_id = ANY(%s)",
+                    (list(stored_blocks),),
+                )
+            with connection.cursor() as cursor:
+                cursor.executemany("INSERT INTO bloc (id, nom, repetitions) VALUES (%s, %s, %s)", block_inserts)
+                cursor.executemany("UPDATE bloc SET nom = %s, repetitions = %s WHERE id = %s", block_updates)
+                cursor.executemany(
+                    "INSERT INTO intervalle (id, type, duree, exercice_id) VALUES (%s, %s, %s, %s)",
+                    interval_inserts,
+                )
+                cursor.executemany(
+                    "UPDATE intervalle SET type = %s, duree = %s, exercice_id = %s WHERE id = %s",
+                    interval_updates,
+                )
+                cursor.executemany(
+                    "INSERT INTO seance_blocs (seance_id, bloc_id, ordre) VALUES (%s, %s, %s)",
+                    block_links,
+                )
+                cursor.executemany(
+                    "INSERT INTO bloc_intervalles (bloc_id, intervalle_id, ordre) VALUES (%s, %s, %s)",
+                    interval_links,
+                )
+            _delete_ids(connection, "bloc", list(stored_blocks - kept_blocks))
+            _delete_ids(connection, "intervalle", list(stored_intervals - kept_intervals))
+        session.blocks[:] = blocks
+        return session
+
+    def delete(self, session_id: int) -> None:
+        # The session's blocks, intervals and phases belong to it alone in this backend.
+        with self._pool.connection() as connection:
+            _delete_blocks(
+                connection,
+                [
+                    row[0]
+                    for row in connection.execute(
+                        "SELECT bloc_id FROM seance_blocs WHERE seance_id = %s",
+                        (session_id,),
+                    )
+                ],
+            )
+            row = connection.execute(
+                "DELETE FROM seance WHERE id = %s RETURNING echauffement_id, recuperation_id",
+                (session_id,),
+            ).fetchone()
+            if row is not None:
+                _delete_ids(connection, "intervalle", [phase for phase in row if phase is not None])
+
+    def total_duration_seconds(self, session_id: int) -> int:
+        with self._pool.connection() as connection:
+            row = connection.execute(
+                "SELECT duree_totale_calculee FROM seance_duree_calculee WHERE seance_id = %s",
+                (session_id,),
+            ).fetchone()
+        if row is None or row[0] is None:
+            return 0
+        return int(row[0])
+
+    def estimate_calories(self, session_id: int) -> float:
+        with self._pool.connection() as connection:
+            row = connection.execute(_CALORIES_QUERY, {"ids": [session_id]}).fetchone()
+        if row is None or row[1] is None:
+            return 0.0
+        return float(row[1])
+
+    def estimate_calories_by_session(self, session_ids: Iterable[int]) -> Dict[int, float]:
+        occurrences = Counter(session_ids)
+        if not occurrences:
+            return {}
+        with self._pool.connection() as connection:
+            rows = connection.execute(_CALORIES_QUERY, {"ids": list(occurrences)}).fetchall()
+        return {row[0]: float(row[1] or 0) * occurrences[row[0]] for row in rows}
+
+    def estimate_calories_for_history(self, session_ids: Iterable[int]) -> float:
+        return float(sum(self.estimate_calories_by_session(session_ids).values()))
+
+
+_SESSION_QUERY = """
+    SELECT seance.id, seance.nom, COALESCE(warmup.duree, 0), COALESCE(recovery.duree, 0)
+    FROM seance
+    LEFT JOIN intervalle AS warmup ON warmup.id = seance.echauffement_id
+    LEFT JOIN intervalle AS recovery ON recovery.id = seance.recuperation_id
+"""
+
+# The seance_calories_estimees formula, restricted to the requested sessions
+# before any interval is priced. Phases count once and block intervals once per
+# repetition.
+_CALORIES_QUERY = """
+    WITH parts AS (
+        SELECT seance_blocs.seance_id, bloc_intervalles.intervalle_id, bloc.repetitions
+        FROM seance_blocs
+        JOIN bloc ON bloc.id = seance_blocs.bloc_id
+        JOIN bloc_intervalles ON bloc_intervalles.bloc_id = bloc.id
+        WHERE seance_blocs.seance_id = ANY(%(ids)s)
+        UNION ALL
+        SELECT seance.id, phase.intervalle_id, 1
+        FROM seance
+        CROSS JOIN LATERAL (VALUES (echauffement_id), (recuperation_id)) AS phase (intervalle_id)
+        WHERE seance.id = ANY(%(ids)s) AND phase.intervalle_id IS NOT NULL
+    )
+    SELECT seance.id, COALESCE(SUM(
+        CASE
+            WHEN intervalle.type = 'EXERCICE' THEN
+                (intervalle.duree::NUMERIC / exercice.duree_reference) * exercice.calories_reference
+                * parts.repetitions
+            ELSE 0
+        END
+    ), 0)
+    FROM seance
+    LEFT JOIN parts ON parts.seance_id = seance.id
+    LEFT JOIN intervalle ON intervalle.id = parts.intervalle_id
+    LEFT JOIN exercice ON exercice.id = intervalle.exercice_id
+    WHERE seance.id = ANY(%(ids)s)
+    GROUP BY seance.id
+"""
+
+_INTERVAL_COLUMNS = """
+    bloc_intervalles.bloc_id,
+    intervalle.id, bloc_intervalles.ordre, intervalle.duree,
+    exercice.id, exercice.nom, exercice.categorie, exercice.duree_reference, exercice.calories_reference
+"""
+
+
+def _calories_reference(exercise: Exercise) -> int:
+    return round(exercise.calories_per_minute * REFERENCE_SECONDS / 60)
+
+
+def _identity_map(exercise_cache: Optional[ExerciseCache]) -> ExerciseCache:
+    # Without a shared cache, a map scoped to the call still builds one Exercise per id.
+    return exercise_cache if exercise_cache is not None else ExerciseCache()
+
+
+def _exercise_from_row(row: Sequence[Any], exercise_cache: ExerciseCache, count: bool = True) -> Exercise:
+    return exercise_cache.resolve(row[0], row[1], row[2], row[4] * 60 / row[3], count=count)
+
+
+def _interval_from_row(row: Sequence[Any], exercise_cache: ExerciseCache) -> Interval:
+    exercise = None
+    if row[3] is not None:
+        exercise = _exercise_from_row(row[3:], exercise_cache)
+    return Interval(id=row[0], position=row[1], duration_seconds=row[2], exercise=exercise)
+
+
+def _check_rank(position: int) -> None:
+    if position < 1:
+        raise ValueError(f"Block positions are 1-based ranks in the PostgreSQL backend, got {position}")
+
+
+def _check_duration(interval: Interval) -> None:
+    # intervalle.duree is CHECKed positive; failing here names the interval instead.
+    if interval.duration_seconds <= 0:
+        raise ValueError(f"Interval durations must be positive, got {interval.duration_seconds} s")
+
+
+def _interval_row(interval_id: int, interval: Interval) -> Tuple[int, str, int, Optional[int]]:
+    _check_duration(interval)
+    if interval.exercise is None:
+        return (interval_id, RECOVERY_INTERVAL, interval.duration_seconds, None)
+    return (interval_id, EXERCISE_INTERVAL, interval.duration_seconds, interval.exercise.id)
+
+
+def _stored_interval(interval_id: int, rank: int, interval: Interval) -> Interval:
+    return Interval(
+        id=interval_id,
+        position=rank,
+        duration_seconds=interval.duration_seconds,
+        exercise=interval.exercise,
+    )
+
+
+def _reserve_ids(connection: Any, table: str, count: int) -> List[int]:
+    if count <= 0:
+        return []
+    rows = connection.execute(
+        "SELECT nextval(pg_get_serial_sequence(%s, 'id')) FROM generate_series(1, %s)",
+        (table, count),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _insert_phase(connection: Any, seconds: int) -> Optional[int]:
+    if seconds <= 0:
+        return None
+    row = connection.execute(
+        "INSERT INTO intervalle (type, duree) VALUES (%s, %s) RETURNING id",
+        (RECOVERY_INTERVAL, seconds),
+    ).fetchone()
+    return row[0]
+
+
+def _update_phase(connection: Any, phase_id: Optional[int], seconds: int) -> Optional[int]:
+    if phase_id is None:
+        return _insert_phase(connection, seconds)
+    if seconds <= 0:
+        return None
+    connection.execute("UPDATE intervalle SET duree = %s WHERE id = %s", (seconds, phase_id))
+    return phase_id
+
+
+def _block_intervals(connection: Any, block_ids: List[int]) -> List[int]:
+    if not block_ids:
+        return []
+    rows = connection.execute(
+        "SELECT intervalle_id FROM bloc_intervalles WHERE bloc_id = ANY(%s)",
+        (block_ids,),
+    ).fetchall()
+    return [row[0] for row in rows]
+
+
+def _delete_ids(connection: Any, table: str, ids: List[int]) -> None:
+    # An empty list has no element type for ANY() to compare with.
+    if ids:
+        connection.execute(f"DELETE FROM {table} WHERE id = ANY(%s)", (ids,))
+
+
+def _place_block(connection: Any, session_id: int, block_id: int, position: int) -> int:
+    """Link ``block_id`` to the session at rank ``position``, capped at the end, and return the rank."""
+    order = [
+        row[0]
+        for row in connection.execute(
+            "SELECT bloc_id FROM seance_blocs WHERE seance_id = %s AND bloc_id <> %s ORDER BY ordre",
+            (session_id, block_id),
+        )
+    ]
+    rank = min(position, len(order) + 1)
+    order.insert(rank - 1, block_id)
+    # As in update_with_blocks, the links are rewritten rather than shuffled around
+    # the unique (seance_id, ordre) constraint.
+    connection.execute("DELETE FROM seance_blocs WHERE seance_id = %s", (session_id,))
+    with connection.cursor() as cursor:
+        cursor.executemany(
+            "INSERT INTO seance_blocs (seance_id, bloc_id, ordre) VALUES (%s, %s, %s)",
+            [(session_id, linked, linked_rank) for linked_rank, linked in enumerate(order, 1)],
+        )
+    return rank
+
+
+def _delete_blocks(connection: Any, block_ids: List[int]) -> None:
+    # seance_blocs and bloc_intervalles restrict deletes of the rows they link,
+    # so links go first and the intervals once their block is gone.
+    if not block_ids:
+        return
+    intervals = _block_intervals(connection, block_ids)
+    connection.execute("DELETE FROM seance_blocs WHERE bloc_id = ANY(%s)", (block_ids,))
+    _delete_ids(connection, "bloc", block_ids)
+    _delete_ids(connection, "intervalle", intervals)
+
+
+def _copy_sessions(connection: Any, sessions: List[Session]) -> List[Session]:
+    ordered = [
+        (session, [(block, list(block.ordered_intervals())) for block in session.ordered_blocks()])
+        for session in sessions
+    ]
+    session_ids = iter(_reserve_ids(connection, "seance", len(ordered)))
+    block_ids = iter(_reserve_ids(connection, "bloc", sum(len(blocks) for _, blocks in ordered)))
+    interval_ids = iter(
+        _reserve_ids(
+            connection,
+            "intervalle",
+            sum(
+                (session.warmup_seconds > 0)
+                + (session.recovery_seconds > 0)
+                + sum(len(intervals) for _, intervals in blocks)
+                for session, blocks in ordered
+            ),
+        )
+    )
+    session_rows, block_rows, interval_rows, block_links, interval_links = [], [], [], [], []
+    created_sessions: List[Session] = []
+    for session, blocks in ordered:
+        phases = []
+        for seconds in (session.warmup_seconds, session.recovery_seconds):
+            phase_id = None
+            if seconds > 0:
+                phase_id = next(interval_ids)
+                interval_rows.append((phase_id, RECOVERY_INTERVAL, seconds, None))
+            phases.append(phase_id)
+        created = Session(
+            id=next(session_ids),
+            name=session.name,
+            warmup_seconds=session.warmup_seconds,
+            recovery_seconds=session.recovery_seconds,
+            blocks=[],
+        )
+        session_rows.append((created.id, created.name, *phases))
+        for block_rank, (block, intervals) in enumerate(blocks, 1):
+            created_block = Block(
+                id=next(block_ids),
+                name=block.name,
+                position=block_rank,
+                repetitions=block.repetitions,
+            )
+            block_rows.append((created_block.id, block.name, block.repetitions))
+            block_links.append((created.id, created_block.id, block_rank))
+            for rank, interval in enumerate(intervals, 1):
+                interval_id = next(interval_ids)
+                interval_rows.append(_interval_row(interval_id, interval))
+                interval_links.append((created_block.id, interval_id, rank))
+                created_block.intervals.append(_stored_interval(interval_id, rank, interval))
+            created.blocks.append(created_block)
+        created_sessions.append(created)
+    # Referenced rows are loaded before the rows that reference them.
+    with connection.cursor() as cursor:
+        for statement, rows in (
+            ("COPY intervalle (id, type, duree, exercice_id) FROM STDIN", interval_rows),
+            ("COPY bloc (id, nom, repetitions) FROM STDIN", block_rows),
+            ("COPY bloc_intervalles (bloc_id, intervalle_id, ordre) FROM STDIN", interval_links),
+            ("COPY seance (id, nom, echauffement_id, recuperation_id) FROM STDIN", session_rows),
+            ("COPY seance_blocs (seance_id, bloc_id, ordre) FROM STDIN", block_links),
+        ):
+            with cursor.copy(statement) as copy:
+                for row in rows:
+                    copy.write_row(row)
+    return created_sessions
@@ -0,0 +1,154 @@
+from __future__ import annotations
+
+import threading
+import time
+from collections import Counter, OrderedDict
+from typing import Any, Callable, Hashable, Optional, Tuple, TypeVar
+
+from tabata.models import Block, Interval, Session
+
+T = TypeVar("T")
+
+
+class QueryCache:
+    """LRU- and TTL-bounded cache of repository read results.
+
+    Entries are stamped with the cache version when their query starts, and
+    every repository write bumps that version, so a result is never served
+    once a write has gone through a repository sharing this cache. Writes made
+    on other connections are picked up by the repositories through
+    ``PRAGMA data_version``, and reads inside an open transaction bypass the
+    cache. Callers get copies of the cached models, so mutating a result does
+    not leak into the next hit.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl_seconds: Optional[float] = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_size < 1:
+            raise ValueError("Cache size must be positive")
+        self._max_size = max_size
+        self._ttl_seconds = ttl_seconds
+        self._clock = clock
+        self._entries: OrderedDict[Hashable, Tuple[int, float, Any]] = OrderedDict()
+        self._lock = threading.Lock()
+        self._version = 0
+        self.clear()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    @property
+    def hits(self) -> int:
+        return sum(self._hits.values())
+
+    @property
+    def misses(self) -> int:
+        return sum(self._misses.values())
+
+    @property
+    def hit_ratio(self) -> float:
+        hits = self.hits
+        lookups = hits + self.misses
+        return hits / lookups if lookups else 0.0
+
+    def load(self, key: Tuple[Hashable, ...], compute: Callable[[], T]) -> T:
+        """Return the cached result for ``key`` or run ``compute`` and remember it.
+
+        ``key`` starts with the method name, which the hit statistics are kept by.
+        """
+        with self._lock:
+            version = self._version
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] == version and (entry[1] is None or entry[1] > self._clock()):
+                    self._entries.move_to_end(key)
+                    self._hits[key[0]] += 1
+                    return _copy(entry[2])
+                del self._entries[key]
+                if entry[0] == version:
+                    self.expirations += 1
+            self._misses[key[0]] += 1
+        value = compute()
+        with self._lock:
+            # A write that landed while the query ran leaves the result stale at once.
+            if version == self._version:
+                expires = None if self._ttl_seconds is None else self._clock() + self._ttl_seconds
+                self._entries[key] = (version, expires, _copy(value))
+                self._entries.move_to_end(key)
+                while len(self._entries) > self._max_size:
+                    self._entries.popitem(last=False)
+                    self.evictions += 1
+        return value
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._version += 1
+            self._entries.clear()
+            self.invalidations += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._hits: Counter = Counter()
+            self._misses: Counter = Counter()
+            self.evictions = 0
+            self.expirations = 0
+            self.invalidations = 0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            methods = sorted(set(self._hits) | set(self._misses))
+            return {
+                "size": len(self._entries),
+                "hits": sum(self._hits.values()),
+                "misses": sum(self._misses.values()),
+                "evictions": self.evictions,
+                "expirations": self.expirations,
+                "invalidations": self.invalidations,
+                "methods": {
+                    method: {
+                        "hits": self._hits[method],
+                        "misses": self._misses[method],
+                        "hit_ratio": self._hits[method] / (self._hits[method] + self._misses[method]),
+                    }
+                    for method in methods
+                },
+            }
+
+
+def _copy(value: Any) -> Any:
+    # Exercises are shared as they are by the ExerciseCache identity map.
+    if isinstance(value, list):
+        return [_copy(item) for item in value]
+    if isinstance(value, Session):
+        return Session(
+            id=value.id,
+            name=value.name,
+            warmup_seconds=value.warmup_seconds,
+            recovery_seconds=value.recovery_seconds,
+            blocks=[_copy(block) for block in value.blocks],
+        )
+    if isinstance(value, Block):
+        return Block(
+            id=value.id,
+            name=value.name,
+            position=value.position,
+            intervals=[_copy(interval) for interval in value.intervals],
+            repetitions=value.repetitions,
+        )
+    if isinstance(value, Interval):
+        return Interval(
+            id=value.id,
+            position=value.position,
+            duration_seconds=value.duration_seconds,
+            exercise=value.exercise,
+        )
+    return value
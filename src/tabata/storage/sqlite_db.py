@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import re
 import sqlite3
 from typing import Iterable
 
@@ -17,7 +18,9 @@ SCHEMA_STATEMENTS: Iterable[str] = (
         id INTEGER PRIMARY KEY AUTOINCREMENT,
         name TEXT NOT NULL,
         warmup_seconds INTEGER NOT NULL,
-        recovery_seconds INTEGER NOT NULL
+        recovery_seconds INTEGER NOT NULL,
+        total_duration_seconds INTEGER NOT NULL DEFAULT 0,
+        estimated_calories REAL NOT NULL DEFAULT 0
     )
     """,
     """
@@ -26,6 +29,7 @@ SCHEMA_STATEMENTS: Iterable[str] = (
         session_id INTEGER NOT NULL,
         name TEXT NOT NULL,
         position INTEGER NOT NULL,
+        repetitions INTEGER NOT NULL DEFAULT 1 CHECK (repetitions >= 1),
         FOREIGN KEY(session_id) REFERENCES sessions(id) ON DELETE CASCADE
     )
     """,
@@ -42,9 +46,169 @@ SCHEMA_STATEMENTS: Iterable[str] = (
     """,
 )
 
+# Created with IF NOT EXISTS, so existing databases pick them up on the next
+# initialize_sqlite call.
+INDEX_STATEMENTS: Iterable[str] = (
+    "CREATE INDEX IF NOT EXISTS idx_blocks_session_position ON blocks(session_id, position)",
+    "CREATE INDEX IF NOT EXISTS idx_intervals_block_position ON intervals(block_id, position)",
+    "CREATE INDEX IF NOT EXISTS idx_intervals_exercise ON intervals(exercise_id)",
+    "CREATE INDEX IF NOT EXISTS idx_exercises_category_name ON exercises(category, name)",
+)
+
+# Columns added to tables created before they existed, as (table, column, definition).
+UPGRADE_COLUMNS: Iterable[tuple[str, str, str]] = (
+    ("sessions", "total_duration_seconds", "INTEGER NOT NULL DEFAULT 0"),
+    ("sessions", "estimated_calories", "REAL NOT NULL DEFAULT 0"),
+    ("blocks", "repetitions", "INTEGER NOT NULL DEFAULT 1 CHECK (repetitions >= 1)"),
+)
+
+# An interval counts once per repetition of its block.
+_INTERVAL_SECONDS = "{row}.duration_seconds * (SELECT repetitions FROM blocks WHERE id = {row}.block_id)"
+
+_INTERVAL_CALORIES = (
+    "{seconds} * COALESCE("
+    "(SELECT calories_per_minute FROM exercises WHERE id = {row}.exercise_id), 0) / 60.0"
+)
+
+_RECOMPUTE_SESSION_TOTALS = """
+    UPDATE sessions
+    SET total_duration_seconds = warmup_seconds + recovery_seconds + COALESCE((
+            SELECT SUM(intervals.duration_seconds * blocks.repetitions)
+            FROM blocks
+            JOIN intervals ON intervals.block_id = blocks.id
+            WHERE blocks.session_id = sessions.id
+        ), 0),
+        estimated_calories = COALESCE((
+            SELECT SUM(intervals.duration_seconds * blocks.repetitions * exercises.calories_per_minute / 60.0)
+            FROM blocks
+            JOIN intervals ON intervals.block_id = blocks.id
+            JOIN exercises ON intervals.exercise_id = exercises.id
+            WHERE blocks.session_id = sessions.id
+        ), 0)
+    WHERE {condition}
+"""
+
+
+def _adjust_session_totals(row: str, sign: str) -> str:
+    seconds = _INTERVAL_SECONDS.format(row=row)
+    calories = _INTERVAL_CALORIES.format(seconds=seconds, row=row)
+    return f"""
+        UPDATE sessions
+        SET total_duration_seconds = total_duration_seconds {sign} {seconds},
+            estimated_calories = estimated_calories {sign} {calories}
+        WHERE id = (SELECT session_id FROM blocks WHERE id = {row}.block_id);
+    """
+
+
+# Keep sessions.total_duration_seconds and sessions.estimated_calories in step with
+# every write. Interval changes apply a delta; rarer structural changes recompute.
+TRIGGER_STATEMENTS: Iterable[str] = (
+    """
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_session_insert
+    AFTER INSERT ON sessions
+    BEGIN
+        UPDATE sessions
+        SET total_duration_seconds = NEW.warmup_seconds + NEW.recovery_seconds,
+            estimated_calories = 0
+        WHERE id = NEW.id;
+    END
+    """,
+    """
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_session_update
+    AFTER UPDATE OF warmup_seconds, recovery_seconds ON sessions
+    BEGIN
+        UPDATE sessions
+        SET total_duration_seconds = total_duration_seconds
+            + NEW.warmup_seconds + NEW.recovery_seconds
+            - OLD.warmup_seconds - OLD.recovery_seconds
+        WHERE id = NEW.id;
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_interval_insert
+    AFTER INSERT ON intervals
+    BEGIN
+        {_adjust_session_totals("NEW", "+")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_interval_delete
+    AFTER DELETE ON intervals
+    BEGIN
+        {_adjust_session_totals("OLD", "-")}
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_interval_update
+    AFTER UPDATE OF block_id, duration_seconds, exercise_id ON intervals
+    BEGIN
+        {_adjust_session_totals("OLD", "-")}
+        {_adjust_session_totals("NEW", "+")}
+    END
+    """,
+    # Intervals removed by ON DELETE CASCADE no longer find their block, so the
+    # session is recomputed once the block itself is gone.
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_block_delete
+    AFTER DELETE ON blocks
+    BEGIN
+        {_RECOMPUTE_SESSION_TOTALS.format(condition="id = OLD.session_id")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_block_move
+    AFTER UPDATE OF session_id ON blocks
+    BEGIN
+        {_RECOMPUTE_SESSION_TOTALS.format(condition="id IN (OLD.session_id, NEW.session_id)")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_block_repetitions_update
+    AFTER UPDATE OF repetitions ON blocks
+    BEGIN
+        {_RECOMPUTE_SESSION_TOTALS.format(condition="id = NEW.session_id")};
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS sessions_totals_after_exercise_update
+    AFTER UPDATE OF calories_per_minute ON exercises
+    BEGIN
+        {_RECOMPUTE_SESSION_TOTALS.format(condition='''id IN (
+            SELECT blocks.session_id
+            FROM intervals
+            JOIN blocks ON intervals.block_id = blocks.id
+            WHERE intervals.exercise_id = NEW.id
+        )''')};
+    END
+    """,
+)
+
+
+_TRIGGER_NAME = re.compile(r"CREATE TRIGGER IF NOT EXISTS (\w+)")
+
 
 def initialize_sqlite(connection: sqlite3.Connection) -> None:
     connection.execute("PRAGMA foreign_keys = ON")
     for statement in SCHEMA_STATEMENTS:
         connection.execute(statement)
+    added = _add_missing_columns(connection)
+    for statement in INDEX_STATEMENTS:
+        connection.execute(statement)
+    for statement in TRIGGER_STATEMENTS:
+        if added:
+            # Trigger bodies can read the new columns, so triggers from before them are replaced.
+            connection.execute(f"DROP TRIGGER IF EXISTS {_TRIGGER_NAME.search(statement).group(1)}")
+        connection.execute(statement)
+    if added:
+        connection.execute(_RECOMPUTE_SESSION_TOTALS.format(condition="1"))
     connection.commit()
+
+
+def _add_missing_columns(connection: sqlite3.Connection) -> set[tuple[str, str]]:
+    added: set[tuple[str, str]] = set()
+    for table, column, definition in UPGRADE_COLUMNS:
+        existing = {row[1] for row in connection.execute(f"PRAGMA table_info({table})")}
+        if column not in existing:
+            connection.execute(f"ALTER TABLE {table} ADD COLUMN {column} {definition}")
+            added.add((table, column))
+    return added
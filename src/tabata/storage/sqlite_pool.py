@@ -0,0 +1,97 @@
+from __future__ import annotations
+
+import sqlite3
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import List, Optional, Tuple, Union
+
+from tabata.storage.sqlite_db import initialize_sqlite
+
+
+@dataclass(frozen=True)
+class SqliteSettings:
+    journal_mode: str = "WAL"
+    synchronous: str = "NORMAL"
+    busy_timeout_seconds: float = 5.0
+    cache_size_kib: int = 16 * 1024
+    mmap_size_bytes: int = 256 * 1024 * 1024
+    temp_store: str = "MEMORY"
+
+
+def connect_sqlite(
+    path: Union[str, Path],
+    settings: Optional[SqliteSettings] = None,
+    check_same_thread: bool = True,
+) -> sqlite3.Connection:
+    settings = settings or SqliteSettings()
+    connection = sqlite3.connect(
+        path,
+        timeout=settings.busy_timeout_seconds,
+        check_same_thread=check_same_thread,
+    )
+    connection.execute(f"PRAGMA journal_mode = {settings.journal_mode}")
+    connection.execute(f"PRAGMA synchronous = {settings.synchronous}")
+    # A negative cache_size is expressed in KiB rather than pages.
+    connection.execute(f"PRAGMA cache_size = {-settings.cache_size_kib}")
+    connection.execute(f"PRAGMA mmap_size = {settings.mmap_size_bytes}")
+    connection.execute(f"PRAGMA temp_store = {settings.temp_store}")
+    connection.execute(f"PRAGMA busy_timeout = {int(settings.busy_timeout_seconds * 1000)}")
+    connection.execute("PRAGMA foreign_keys = ON")
+    return connection
+
+
+class SqliteConnectionPool:
+    """Hands out one tuned connection per thread for a database file.
+
+    In WAL mode readers on other threads keep working while one thread
+    writes. The schema is initialized once, by the first connection.
+    A connection belongs to the thread it was handed to. Once that thread
+    has exited, the pool drops its reference the next time a thread opens
+    a connection, and the connection closes when nothing else holds it;
+    ``close()`` closes the connections of threads still running.
+    """
+
+    def __init__(self, path: Union[str, Path], settings: Optional[SqliteSettings] = None) -> None:
+        self._path = path
+        self._settings = settings or SqliteSettings()
+        self._local = threading.local()
+        self._lock = threading.Lock()
+        self._connections: List[Tuple[threading.Thread, sqlite3.Connection]] = []
+        self._initialized = False
+        self._closed = False
+
+    def connection(self) -> sqlite3.Connection:
+        if self._closed:
+            raise RuntimeError("Connection pool is closed")
+        local = self._local
+        connection = getattr(local, "connection", None)
+        if connection is not None:
+            return connection
+        with self._lock:
+            if self._closed:
+                raise RuntimeError("Connection pool is closed")
+            # Dropped rather than closed: a thread may have passed its connection on.
+            self._connections = [entry for entry in self._connections if entry[0].is_alive()]
+            connection = connect_sqlite(self._path, self._settings, check_same_thread=False)
+            if not self._initialized:
+                initialize_sqlite(connection)
+                self._initialized = True
+            self._connections.append((threading.current_thread(), connection))
+        local.connection = connection
+        return connection
+
+    def close(self) -> None:
+        with self._lock:
+            self._closed = True
+            connections, self._connections = self._connections, []
+            # Dropping the thread-local releases every thread's reference at once.
+            self._local = threading.local()
+        for _, connection in connections:
+            connection.close()
+
+    def __enter__(self) -> SqliteConnectionPool:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
@@ -1,16 +1,85 @@
 from __future__ import annotations
 
+import functools
+import json
 import sqlite3
-from typing import Iterable, List, Optional
+import threading
+from collections import Counter
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple, TypeVar
 
 from tabata.models import Block, Exercise, Interval, Session
 from tabata.repositories import BlockRepository, ExerciseRepository, SessionRepository
+from tabata.storage.exercise_cache import ExerciseCache
+from tabata.storage.query_cache import QueryCache
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+
+# Set while a cached read runs, so the reads it makes itself are not cached again.
+_loading = threading.local()
+
+
+def _read_through(method: F) -> F:
+    """Serve the method from the repository's query cache, when it has one.
+
+    Reads inside an open transaction bypass the cache: they may see writes
+    that a rollback undoes without changing ``data_version``.
+    """
+    name = method.__qualname__
+
+    def load(self: Any, args: tuple, kwargs: dict) -> Any:
+        _loading.active = True
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            _loading.active = False
+
+    @functools.wraps(method)
+    def read(self: Any, *args: Any, **kwargs: Any) -> Any:
+        cache = self._query_cache
+        if cache is None or self._connection.in_transaction or getattr(_loading, "active", False):
+            return method(self, *args, **kwargs)
+        # Commits from other connections bump data_version. This connection's own
+        # writes do not, and they invalidate the cache before the caller commits,
+        # so another connection sharing the cache may have re-cached the old rows
+        # meanwhile; total_changes tells this connection that it wrote since.
+        seen = (
+            self._connection.execute("PRAGMA data_version").fetchone()[0],
+            self._connection.total_changes,
+        )
+        if seen != self._seen:
+            if self._seen is not None:
+                cache.invalidate()
+            self._seen = seen
+        return cache.load((name, *args, *sorted(kwargs.items())), lambda: load(self, args, kwargs))
+
+    return read  # type: ignore[return-value]
+
+
+def _invalidates(method: F) -> F:
+    @functools.wraps(method)
+    def write(self: Any, *args: Any, **kwargs: Any) -> Any:
+        try:
+            return method(self, *args, **kwargs)
+        finally:
+            if self._query_cache is not None:
+                self._query_cache.invalidate()
+
+    return write  # type: ignore[return-value]
 
 
 class SqliteExerciseRepository(ExerciseRepository):
-    def __init__(self, connection: sqlite3.Connection) -> None:
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        exercise_cache: Optional[ExerciseCache] = None,
+        query_cache: Optional[QueryCache] = None,
+    ) -> None:
         self._connection = connection
+        self._exercise_cache = exercise_cache
+        self._query_cache = query_cache
 
+    @_invalidates
     def create(self, exercise: Exercise) -> Exercise:
         cursor = self._connection.execute(
             """
@@ -19,30 +88,36 @@ class SqliteExerciseRepository(ExerciseRepository):
             """,
             (exercise.name, exercise.category, exercise.calories_per_minute),
         )
-        return Exercise(
+        created = Exercise(
             id=cursor.lastrowid,
             name=exercise.name,
             category=exercise.category,
             calories_per_minute=exercise.calories_per_minute,
         )
+        if self._exercise_cache is not None:
+            self._exercise_cache.put(created)
+        return created
 
     def get(self, exercise_id: int) -> Optional[Exercise]:
+        if self._exercise_cache is not None:
+            cached = self._exercise_cache.get(exercise_id)
+            if cached is not None:
+                return cached
         row = self._connection.execute(
             "SELECT id, name, category, calories_per_minute FROM exercises WHERE id = ?",
             (exercise_id,),
         ).fetchone()
         if row is None:
             return None
-        return Exercise(id=row[0], name=row[1], category=row[2], calories_per_minute=row[3])
+        # The lookup above already counted the miss.
+        return _identity_map(self._exercise_cache).resolve(*row, count=False)
 
     def list(self) -> List[Exercise]:
         rows = self._connection.execute(
             "SELECT id, name, category, calories_per_minute FROM exercises ORDER BY name"
         ).fetchall()
-        return [
-            Exercise(id=row[0], name=row[1], category=row[2], calories_per_minute=row[3])
-            for row in rows
-        ]
+        exercises = _identity_map(self._exercise_cache)
+        return [exercises.resolve(*row) for row in rows]
 
     def list_by_category(self, category: str) -> List[Exercise]:
         rows = self._connection.execute(
@@ -54,11 +129,10 @@ class SqliteExerciseRepository(ExerciseRepository):
             """,
             (category,),
         ).fetchall()
-        return [
-            Exercise(id=row[0], name=row[1], category=row[2], calories_per_minute=row[3])
-            for row in rows
-        ]
+        exercises = _identity_map(self._exercise_cache)
+        return [exercises.resolve(*row) for row in rows]
 
+    @_invalidates
     def update(self, exercise: Exercise) -> Exercise:
         if exercise.id is None:
             raise ValueError("Exercise id is required for update")
@@ -70,78 +144,139 @@ class SqliteExerciseRepository(ExerciseRepository):
             """,
             (exercise.name, exercise.category, exercise.calories_per_minute, exercise.id),
         )
+        if self._exercise_cache is not None:
+            self._exercise_cache.invalidate(exercise.id)
         return exercise
 
+    @_invalidates
     def delete(self, exercise_id: int) -> None:
         self._connection.execute("DELETE FROM exercises WHERE id = ?", (exercise_id,))
+        if self._exercise_cache is not None:
+            self._exercise_cache.invalidate(exercise_id)
 
 
 class SqliteBlockRepository(BlockRepository):
-    def __init__(self, connection: sqlite3.Connection) -> None:
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        exercise_cache: Optional[ExerciseCache] = None,
+        query_cache: Optional[QueryCache] = None,
+    ) -> None:
         self._connection = connection
+        self._exercise_cache = exercise_cache
+        self._query_cache = query_cache
+        self._seen: Optional[Tuple[int, int]] = None
 
+    @_invalidates
     def create(self, block: Block, session_id: int) -> Block:
         cursor = self._connection.execute(
             """
-            INSERT INTO blocks (session_id, name, position)
-            VALUES (?, ?, ?)
+            INSERT INTO blocks (session_id, name, position, repetitions)
+            VALUES (?, ?, ?, ?)
             """,
-            (session_id, block.name, block.position),
+            (session_id, block.name, block.position, block.repetitions),
+        )
+        created = Block(
+            id=cursor.lastrowid,
+            name=block.name,
+            position=block.position,
+            repetitions=block.repetitions,
         )
-        created = Block(id=cursor.lastrowid, name=block.name, position=block.position)
-        created.intervals = []
         for interval in block.ordered_intervals():
             created_interval = self._create_interval(cursor.lastrowid, interval)
             created.intervals.append(created_interval)
         return created
 
+    @_read_through
     def get(self, block_id: int) -> Optional[Block]:
         row = self._connection.execute(
-            "SELECT id, name, position FROM blocks WHERE id = ?",
+            "SELECT id, name, position, repetitions FROM blocks WHERE id = ?",
             (block_id,),
         ).fetchone()
         if row is None:
             return None
-        return Block(id=row[0], name=row[1], position=row[2])
+        return Block(id=row[0], name=row[1], position=row[2], repetitions=row[3])
 
+    @_read_through
     def list_by_session(self, session_id: int) -> List[Block]:
         rows = self._connection.execute(
             """
-            SELECT id, name, position
+            SELECT id, name, position, repetitions
             FROM blocks
             WHERE session_id = ?
             ORDER BY position
             """,
             (session_id,),
         ).fetchall()
-        return [Block(id=row[0], name=row[1], position=row[2]) for row in rows]
+        return [Block(id=row[0], name=row[1], position=row[2], repetitions=row[3]) for row in rows]
 
+    @_read_through
     def get_with_intervals(self, block_id: int) -> Optional[Block]:
         row = self._connection.execute(
-            "SELECT id, name, position FROM blocks WHERE id = ?",
+            "SELECT id, name, position, repetitions FROM blocks WHERE id = ?",
             (block_id,),
         ).fetchone()
         if row is None:
             return None
-        block = Block(id=row[0], name=row[1], position=row[2])
-        block.intervals = self._list_intervals(block.id)
+        block = Block(id=row[0], name=row[1], position=row[2], repetitions=row[3])
+        block.intervals.extend(self._list_intervals(block.id))
         return block
 
+    @_read_through
     def list_with_intervals(self, session_id: int) -> List[Block]:
-        blocks = self.list_by_session(session_id)
-        for block in blocks:
-            block.intervals = self._list_intervals(block.id)
-        return blocks
+        return self.list_with_intervals_by_sessions([session_id]).get(session_id, [])
 
+    def list_with_intervals_by_sessions(self, session_ids: Iterable[int]) -> Dict[int, List[Block]]:
+        ids = json.dumps(list(session_ids))
+        rows = self._connection.execute(
+            """
+            SELECT id, session_id, name, position, repetitions
+            FROM blocks
+            WHERE session_id IN (SELECT value FROM json_each(?))
+            ORDER BY session_id, position
+            """,
+            (ids,),
+        ).fetchall()
+        blocks_by_session: Dict[int, List[Block]] = {}
+        blocks_by_id: Dict[int, Block] = {}
+        for row in rows:
+            block = Block(id=row[0], name=row[2], position=row[3], repetitions=row[4])
+            blocks_by_session.setdefault(row[1], []).append(block)
+            blocks_by_id[block.id] = block
+        if not blocks_by_id:
+            return blocks_by_session
+        rows = self._connection.execute(
+            """
+            SELECT intervals.block_id,
+                   intervals.id, intervals.position, intervals.duration_seconds,
+                   exercises.id, exercises.name, exercises.category, exercises.calories_per_minute
+            FROM blocks
+            JOIN intervals ON intervals.block_id = blocks.id
+            LEFT JOIN exercises ON intervals.exercise_id = exercises.id
+            WHERE blocks.session_id IN (SELECT value FROM json_each(?))
+            ORDER BY intervals.block_id, intervals.position
+            """,
+            (ids,),
+        ).fetchall()
+        exercises = _identity_map(self._exercise_cache)
+        intervals_by_block: Dict[int, List[Interval]] = {}
+        for row in rows:
+            intervals_by_block.setdefault(row[0], []).append(_interval_from_row(row[1:], exercises))
+        for block_id, intervals in intervals_by_block.items():
+            blocks_by_id[block_id].intervals.extend(intervals)
+        return blocks_by_session
+
+    @_invalidates
     def update(self, block: Block) -> Block:
         if block.id is None:
             raise ValueError("Block id is required for update")
         self._connection.execute(
-            "UPDATE blocks SET name = ?, position = ? WHERE id = ?",
-            (block.name, block.position, block.id),
+            "UPDATE blocks SET name = ?, position = ?, repetitions = ? WHERE id = ?",
+            (block.name, block.position, block.repetitions, block.id),
         )
         return block
 
+    @_invalidates
     def delete(self, block_id: int) -> None:
         self._connection.execute("DELETE FROM blocks WHERE id = ?", (block_id,))
 
@@ -157,20 +292,8 @@ class SqliteBlockRepository(BlockRepository):
             """,
             (block_id,),
         ).fetchall()
-        intervals: List[Interval] = []
-        for row in rows:
-            exercise = None
-            if row[3] is not None:
-                exercise = Exercise(
-                    id=row[3],
-                    name=row[4],
-                    category=row[5],
-                    calories_per_minute=row[6],
-                )
-            intervals.append(
-                Interval(id=row[0], position=row[1], duration_seconds=row[2], exercise=exercise)
-            )
-        return intervals
+        exercises = _identity_map(self._exercise_cache)
+        return [_interval_from_row(row, exercises) for row in rows]
 
     def _create_interval(self, block_id: int, interval: Interval) -> Interval:
         cursor = self._connection.execute(
@@ -194,10 +317,19 @@ class SqliteBlockRepository(BlockRepository):
 
 
 class SqliteSessionRepository(SessionRepository):
-    def __init__(self, connection: sqlite3.Connection) -> None:
+    def __init__(
+        self,
+        connection: sqlite3.Connection,
+        exercise_cache: Optional[ExerciseCache] = None,
+        query_cache: Optional[QueryCache] = None,
+    ) -> None:
         self._connection = connection
-        self._block_repo = SqliteBlockRepository(connection)
+        self._exercise_cache = exercise_cache
+        self._query_cache = query_cache
+        self._seen: Optional[Tuple[int, int]] = None
+        self._block_repo = SqliteBlockRepository(connection, self._exercise_cache, query_cache)
 
+    @_invalidates
     def create(self, session: Session) -> Session:
         cursor = self._connection.execute(
             """
@@ -214,14 +346,96 @@ class SqliteSessionRepository(SessionRepository):
             blocks=[],
         )
 
+    @_invalidates
     def create_with_blocks(self, session: Session) -> Session:
         with self._connection:
             created = self.create(session)
-            created.blocks = []
             for block in session.ordered_blocks():
                 created.blocks.append(self._block_repo.create(block, created.id))
             return created
 
+    @_invalidates
+    def create_many_with_blocks(self, sessions: Iterable[Session]) -> List[Session]:
+        pending = list(sessions)
+        if not pending:
+            return []
+        with self._connection:
+            _begin_immediate(self._connection)
+            session_id = _next_id(self._connection, "sessions")
+            block_id = _next_id(self._connection, "blocks")
+            interval_id = _next_id(self._connection, "intervals")
+            session_rows = []
+            block_rows = []
+            interval_rows = []
+            created_sessions: List[Session] = []
+            for session in pending:
+                created = Session(
+                    id=session_id,
+                    name=session.name,
+                    warmup_seconds=session.warmup_seconds,
+                    recovery_seconds=session.recovery_seconds,
+                    blocks=[],
+                )
+                session_rows.append(
+                    (created.id, created.name, created.warmup_seconds, created.recovery_seconds)
+                )
+                for block in session.ordered_blocks():
+                    created_block = Block(
+                        id=block_id,
+                        name=block.name,
+                        position=block.position,
+                        repetitions=block.repetitions,
+                    )
+                    block_rows.append(
+                        (created_block.id, created.id, block.name, block.position, block.repetitions)
+                    )
+                    for interval in block.ordered_intervals():
+                        created_block.intervals.append(
+                            Interval(
+                                id=interval_id,
+                                position=interval.position,
+                                duration_seconds=interval.duration_seconds,
+                                exercise=interval.exercise,
+                            )
+                        )
+                        interval_rows.append(
+                            (
+                                interval_id,
+                                created_block.id,
+                                interval.position,
+                                interval.duration_seconds,
+                                interval.exercise.id if interval.exercise else None,
+                            )
+                        )
+                        interval_id += 1
+                    created.blocks.append(created_block)
+                    block_id += 1
+                created_sessions.append(created)
+                session_id += 1
+            self._connection.executemany(
+                """
+                INSERT INTO sessions (id, name, warmup_seconds, recovery_seconds)
+                VALUES (?, ?, ?, ?)
+                """,
+                session_rows,
+            )
+            self._connection.executemany(
+                """
+                INSERT INTO blocks (id, session_id, name, position, repetitions)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                block_rows,
+            )
+            self._connection.executemany(
+                """
+                INSERT INTO intervals (id, block_id, position, duration_seconds, exercise_id)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                interval_rows,
+            )
+        return created_sessions
+
+    @_read_through
     def get(self, session_id: int) -> Optional[Session]:
         row = self._connection.execute(
             "SELECT id, name, warmup_seconds, recovery_seconds FROM sessions WHERE id = ?",
@@ -231,13 +445,36 @@ class SqliteSessionRepository(SessionRepository):
             return None
         return Session(id=row[0], name=row[1], warmup_seconds=row[2], recovery_seconds=row[3])
 
+    @_read_through
     def get_with_details(self, session_id: int) -> Optional[Session]:
         session = self.get(session_id)
         if session is None:
             return None
-        session.blocks = self._block_repo.list_with_intervals(session_id)
+        session.blocks.extend(self._block_repo.list_with_intervals(session_id))
         return session
 
+    def list_with_details(self, session_ids: Iterable[int]) -> List[Session]:
+        ids = list(dict.fromkeys(session_ids))
+        if not ids:
+            return []
+        rows = self._connection.execute(
+            """
+            SELECT id, name, warmup_seconds, recovery_seconds
+            FROM sessions
+            WHERE id IN (SELECT value FROM json_each(?))
+            """,
+            (json.dumps(ids),),
+        ).fetchall()
+        sessions = {
+            row[0]: Session(id=row[0], name=row[1], warmup_seconds=row[2], recovery_seconds=row[3])
+            for row in rows
+        }
+        blocks = self._block_repo.list_with_intervals_by_sessions(list(sessions))
+        for session_id, session in sessions.items():
+            session.blocks.extend(blocks.get(session_id, ()))
+        return [sessions[session_id] for session_id in ids if session_id in sessions]
+
+    @_read_through
     def list(self) -> List[Session]:
         rows = self._connection.execute(
             """
@@ -248,6 +485,7 @@ class SqliteSessionRepository(SessionRepository):
         ).fetchall()
         return [Session(id=row[0], name=row[1], warmup_seconds=row[2], recovery_seconds=row[3]) for row in rows]
 
+    @_invalidates
     def update(self, session: Session) -> Session:
         if session.id is None:
             raise ValueError("Session id is required for update")
@@ -261,74 +499,191 @@ class SqliteSessionRepository(SessionRepository):
         )
         return session
 
+    @_invalidates
     def update_with_blocks(self, session: Session) -> Session:
         if session.id is None:
             raise ValueError("Session id is required for update")
         with self._connection:
+            _begin_immediate(self._connection)
             self.update(session)
-            self._connection.execute(
-                "DELETE FROM blocks WHERE session_id = ?",
-                (session.id,),
-            )
-            session.blocks = [
-                self._block_repo.create(block, session.id) for block in session.ordered_blocks()
+            stored_blocks = {
+                row[0]: row[1:]
+                for row in self._connection.execute(
+                    "SELECT id, name, position, repetitions FROM blocks WHERE session_id = ?",
+                    (session.id,),
+                )
+            }
+            stored_intervals = {
+                row[0]: row[1:]
+                for row in self._connection.execute(
+                    """
+                    SELECT intervals.id, intervals.block_id, intervals.position,
+                        intervals.duration_seconds, intervals.exercise_id
+                    FROM blocks
+                    JOIN intervals ON intervals.block_id = blocks.id
+                    WHERE blocks.session_id = ?
+                    """,
+                    (session.id,),
+                )
+            }
+            next_block_id = _next_id(self._connection, "blocks")
+            next_interval_id = _next_id(self._connection, "intervals")
+            kept_blocks: set = set()
+            kept_intervals: set = set()
+            block_inserts = []
+            block_updates = []
+            interval_inserts = []
+            interval_updates = []
+            blocks: List[Block] = []
+            for block in session.ordered_blocks():
+                if block.id in stored_blocks and block.id not in kept_blocks:
+                    block_id = block.id
+                    kept_blocks.add(block_id)
+                    if stored_blocks[block_id] != (block.name, block.position, block.repetitions):
+                        block_updates.append((block.name, block.position, block.repetitions, block_id))
+                else:
+                    block_id = next_block_id
+                    next_block_id += 1
+                    block_inserts.append(
+                        (block_id, session.id, block.name, block.position, block.repetitions)
+                    )
+                updated = Block(
+                    id=block_id,
+                    name=block.name,
+                    position=block.position,
+                    repetitions=block.repetitions,
+                )
+                for interval in block.ordered_intervals():
+                    row = (
+                        block_id,
+                        interval.position,
+                        interval.duration_seconds,
+                        interval.exercise.id if interval.exercise else None,
+                    )
+                    if interval.id in stored_intervals and interval.id not in kept_intervals:
+                        interval_id = interval.id
+                        kept_intervals.add(interval_id)
+                        if stored_intervals[interval_id] != row:
+                            interval_updates.append((*row, interval_id))
+                    else:
+                        interval_id = next_interval_id
+                        next_interval_id += 1
+                        interval_inserts.append((interval_id, *row))
+                    updated.intervals.append(
+                        Interval(
+                            id=interval_id,
+                            position=interval.position,
+                            duration_seconds=interval.duration_seconds,
+                            exercise=interval.exercise,
+                        )
+                    )
+                blocks.append(updated)
+            # Intervals of removed blocks go with them through ON DELETE CASCADE, so only
+            # intervals dropped from surviving blocks are deleted explicitly. Moves into
+            # other blocks are applied before any block is deleted.
+            interval_deletes = [
+                (interval_id,)
+                for interval_id, stored in stored_intervals.items()
+                if interval_id not in kept_intervals and stored[0] in kept_blocks
             ]
+            block_deletes = [(block_id,) for block_id in stored_blocks if block_id not in kept_blocks]
+            self._connection.executemany(
+                "INSERT INTO blocks (id, session_id, name, position, repetitions) VALUES (?, ?, ?, ?, ?)",
+                block_inserts,
+            )
+            self._connection.executemany(
+                "UPDATE blocks SET name = ?, position = ?, repetitions = ? WHERE id = ?",
+                block_updates,
+            )
+            self._connection.executemany(
+                """
+                UPDATE intervals
+                SET block_id = ?, position = ?, duration_seconds = ?, exercise_id = ?
+                WHERE id = ?
+                """,
+                interval_updates,
+            )
+            self._connection.executemany(
+                """
+                INSERT INTO intervals (id, block_id, position, duration_seconds, exercise_id)
+                VALUES (?, ?, ?, ?, ?)
+                """,
+                interval_inserts,
+            )
+            self._connection.executemany("DELETE FROM intervals WHERE id = ?", interval_deletes)
+            self._connection.executemany("DELETE FROM blocks WHERE id = ?", block_deletes)
+        session.blocks[:] = blocks
         return session
 
+    @_invalidates
     def delete(self, session_id: int) -> None:
         self._connection.execute("DELETE FROM sessions WHERE id = ?", (session_id,))
 
+    @_read_through
     def total_duration_seconds(self, session_id: int) -> int:
         row = self._connection.execute(
-            """
-            SELECT
-                sessions.warmup_seconds,
-                sessions.recovery_seconds,
-                COALESCE(SUM(intervals.duration_seconds), 0)
-            FROM sessions
-            LEFT JOIN blocks ON blocks.session_id = sessions.id
-            LEFT JOIN intervals ON intervals.block_id = blocks.id
-            WHERE sessions.id = ?
-            GROUP BY sessions.id
-            """,
+            "SELECT total_duration_seconds FROM sessions WHERE id = ?",
             (session_id,),
         ).fetchone()
         if row is None:
             return 0
-        return int(row[0]) + int(row[1]) + int(row[2])
+        return int(row[0])
 
+    @_read_through
     def estimate_calories(self, session_id: int) -> float:
         row = self._connection.execute(
-            """
-            SELECT COALESCE(SUM(intervals.duration_seconds * exercises.calories_per_minute / 60.0), 0)
-            FROM sessions
-            LEFT JOIN blocks ON blocks.session_id = sessions.id
-            LEFT JOIN intervals ON intervals.block_id = blocks.id
-            LEFT JOIN exercises ON intervals.exercise_id = exercises.id
-            WHERE sessions.id = ?
-            """,
+            "SELECT estimated_calories FROM sessions WHERE id = ?",
             (session_id,),
         ).fetchone()
         if row is None:
             return 0.0
         return float(row[0])
 
-    def estimate_calories_for_history(self, session_ids: Iterable[int]) -> float:
-        ids = list(session_ids)
-        if not ids:
-            return 0.0
-        placeholders = ", ".join("?" for _ in ids)
-        row = self._connection.execute(
-            f"""
-            SELECT COALESCE(SUM(intervals.duration_seconds * exercises.calories_per_minute / 60.0), 0)
+    def estimate_calories_by_session(self, session_ids: Iterable[int]) -> Dict[int, float]:
+        # A session repeated in the history counts once per occurrence. Ids travel as a
+        # single JSON parameter, so the list size is not bound by SQLite's variable limit.
+        occurrences = Counter(session_ids)
+        if not occurrences:
+            return {}
+        rows = self._connection.execute(
+            """
+            SELECT id, estimated_calories
             FROM sessions
-            LEFT JOIN blocks ON blocks.session_id = sessions.id
-            LEFT JOIN intervals ON intervals.block_id = blocks.id
-            LEFT JOIN exercises ON intervals.exercise_id = exercises.id
-            WHERE sessions.id IN ({placeholders})
+            WHERE id IN (SELECT value FROM json_each(?))
             """,
-            ids,
-        ).fetchone()
-        if row is None:
-            return 0.0
-        return float(row[0])
+            (json.dumps(list(occurrences)),),
+        ).fetchall()
+        return {row[0]: float(row[1]) * occurrences[row[0]] for row in rows}
+
+    def estimate_calories_for_history(self, session_ids: Iterable[int]) -> float:
+        return float(sum(self.estimate_calories_by_session(session_ids).values()))
+
+
+def _identity_map(exercise_cache: Optional[ExerciseCache]) -> ExerciseCache:
+    # Without a shared cache, a map scoped to the call still builds one Exercise per id.
+    return exercise_cache if exercise_cache is not None else ExerciseCache()
+
+
+def _interval_from_row(row: tuple, exercise_cache: ExerciseCache) -> Interval:
+    exercise = None
+    if row[3] is not None:
+        exercise = exercise_cache.resolve(row[3], row[4], row[5], row[6])
+    return Interval(id=row[0], position=row[1], duration_seconds=row[2], exercise=exercise)
+
+
+def _begin_immediate(connection: sqlite3.Connection) -> None:
+    if not connection.in_transaction:
+        connection.execute("BEGIN IMMEDIATE")
+
+
+def _next_id(connection: sqlite3.Connection, table: str) -> int:
+    row = connection.execute(
+        f"""
+        SELECT MAX(
+            COALESCE((SELECT seq FROM sqlite_sequence WHERE name = ?), 0),
+            COALESCE((SELECT MAX(id) FROM {table}), 0)
+        )
+        """,
+        (table,),
+    ).fetchone()
+    return int(row[0]) + 1
@@ -0,0 +1,136 @@
+from __future__ import annotations
+
+import time
+from array import array
+from bisect import bisect_right
+from dataclasses import dataclass
+from typing import Callable, List, Optional, Tuple
+
+from .models import Block, Interval, Session
+
+WARMUP = "warmup"
+INTERVAL = "interval"
+RECOVERY = "recovery"
+END = "end"
+
+PHASES = (WARMUP, INTERVAL, RECOVERY, END)
+
+NANOSECONDS = 1_000_000_000
+
+
+@dataclass(frozen=True)
+class Transition:
+    index: int
+    phase: str
+    offset_ns: int
+    duration_ns: int
+    block: Optional[Block] = None
+    interval: Optional[Interval] = None
+    # Zero-based repetition of the block the interval belongs to.
+    repetition: int = 0
+
+
+class Timeline:
+    """A session flattened into phases that start at absolute offsets.
+
+    ``offsets_ns[i]`` is when phase ``i`` starts, relative to the start of
+    the session; the last entry is the ``end`` marker at the total duration.
+    """
+
+    __slots__ = ("offsets_ns", "phases", "repetitions", "steps")
+
+    def __init__(self) -> None:
+        self.offsets_ns = array("q")
+        self.phases = array("B")
+        self.repetitions = array("I")
+        self.steps: List[Tuple[Optional[Block], Optional[Interval]]] = []
+
+    def __len__(self) -> int:
+        return len(self.offsets_ns)
+
+    @property
+    def total_ns(self) -> int:
+        return self.offsets_ns[-1] if self.offsets_ns else 0
+
+    def transition(self, index: int) -> Transition:
+        offset = self.offsets_ns[index]
+        following = self.offsets_ns[index + 1] if index + 1 < len(self.offsets_ns) else offset
+        block, interval = self.steps[index]
+        return Transition(
+            index=index,
+            phase=PHASES[self.phases[index]],
+            offset_ns=offset,
+            duration_ns=following - offset,
+            block=block,
+            interval=interval,
+            repetition=self.repetitions[index],
+        )
+
+    def index_at(self, elapsed_ns: int) -> int:
+        return max(bisect_right(self.offsets_ns, elapsed_ns) - 1, 0)
+
+    def _append(self, phase: str, offset_ns: int, block=None, interval=None, repetition=0) -> None:
+        self.offsets_ns.append(offset_ns)
+        self.phases.append(PHASES.index(phase))
+        self.repetitions.append(repetition)
+        self.steps.append((block, interval))
+
+
+def compile_session(session: Session) -> Timeline:
+    timeline = Timeline()
+    offset = 0
+    if session.warmup_seconds > 0:
+        timeline._append(WARMUP, offset)
+        offset += session.warmup_seconds * NANOSECONDS
+    for block in session.ordered_blocks():
+        intervals = [interval for interval in block.ordered_intervals() if interval.duration_seconds > 0]
+        for repetition in range(block.repetitions):
+            for interval in intervals:
+                timeline._append(INTERVAL, offset, block, interval, repetition)
+                offset += interval.duration_seconds * NANOSECONDS
+    if session.recovery_seconds > 0:
+        timeline._append(RECOVERY, offset)
+        offset += session.recovery_seconds * NANOSECONDS
+    timeline._append(END, offset)
+    return timeline
+
+
+class TimelineScheduler:
+    """Fires a callback at each transition of a compiled timeline.
+
+    Every deadline is computed from the start time and the transition's
+    absolute offset, so sleep overshoot and callback time are never carried
+    into the next transition. The callback receives the transition and how
+    late it fired, in nanoseconds.
+    """
+
+    def __init__(
+        self,
+        timeline: Timeline,
+        callback: Callable[[Transition, int], None],
+        clock: Callable[[], int] = time.monotonic_ns,
+        sleep: Callable[[float], None] = time.sleep,
+    ) -> None:
+        self._timeline = timeline
+        self._callback = callback
+        self._clock = clock
+        self._sleep = sleep
+        self._stopped = False
+
+    def stop(self) -> None:
+        self._stopped = True
+
+    def run(self, start_ns: Optional[int] = None) -> array:
+        start = self._clock() if start_ns is None else start_ns
+        lateness = array("q")
+        for index, offset in enumerate(self._timeline.offsets_ns):
+            deadline = start + offset
+            now = self._clock()
+            while now < deadline and not self._stopped:
+                self._sleep((deadline - now) / NANOSECONDS)
+                now = self._clock()
+            if self._stopped:
+                break
+            lateness.append(now - deadline)
+            self._callback(self._timeline.transition(index), now - deadline)
+        return lateness
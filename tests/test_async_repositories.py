@@ -0,0 +1,135 @@
+import asyncio
+import sqlite3
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tabata import AsyncHistoryStore, SessionRecord
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import (
+    AsyncSqliteExerciseRepository,
+    AsyncSqliteSessionRepository,
+    ExerciseCache,
+    SqliteAsyncExecutor,
+    SqliteConnectionPool,
+)
+
+
+class AsyncSqliteRepositoryTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.pool = SqliteConnectionPool(Path(self._tmp_dir.name) / "app.db")
+        self.executor = SqliteAsyncExecutor(self.pool)
+        cache = ExerciseCache()
+        self.exercises = AsyncSqliteExerciseRepository(self.executor, cache)
+        self.sessions = AsyncSqliteSessionRepository(self.executor, cache)
+
+    async def asyncTearDown(self) -> None:
+        await self.executor.close()
+        self.pool.close()
+        self._tmp_dir.cleanup()
+
+    def _session(self, name: str, exercise: Exercise) -> Session:
+        return Session(
+            id=None,
+            name=name,
+            warmup_seconds=60,
+            recovery_seconds=30,
+            blocks=[
+                Block(
+                    id=None,
+                    name="Block",
+                    position=1,
+                    intervals=[Interval(id=None, position=1, duration_seconds=20, exercise=exercise)],
+                )
+            ],
+        )
+
+    async def test_concurrent_writes_share_transactions(self) -> None:
+        exercise = await self.exercises.create(Exercise(None, "Burpees", "cardio", 12.0))
+        created = await asyncio.gather(
+            *(self.sessions.create_with_blocks(self._session(f"S{index}", exercise)) for index in range(50))
+        )
+
+        self.assertEqual(len({session.id for session in created}), 50)
+        self.assertLess(self.executor.batches_committed, 51)
+        self.assertEqual(self.executor.writes_committed, 51)
+        loaded = await self.sessions.list_with_details([session.id for session in created])
+        self.assertEqual([session.name for session in loaded], [f"S{index}" for index in range(50)])
+        self.assertEqual(await self.sessions.total_duration_seconds(created[0].id), 110)
+        self.assertAlmostEqual(await self.sessions.estimate_calories(created[0].id), 4.0)
+
+    async def test_failed_write_only_rolls_back_its_own_changes(self) -> None:
+        exercise = await self.exercises.create(Exercise(None, "Burpees", "cardio", 12.0))
+
+        def failing(connection: sqlite3.Connection) -> None:
+            connection.execute(
+                "INSERT INTO sessions (name, warmup_seconds, recovery_seconds) VALUES ('lost', 0, 0)"
+            )
+            raise RuntimeError("boom")
+
+        results = await asyncio.gather(
+            self.sessions.create_with_blocks(self._session("before", exercise)),
+            self.executor.write(failing),
+            self.sessions.create_with_blocks(self._session("after", exercise)),
+            return_exceptions=True,
+        )
+
+        self.assertIsInstance(results[1], RuntimeError)
+        self.assertEqual(
+            sorted(session.name for session in await self.sessions.list()),
+            ["after", "before"],
+        )
+
+    async def test_writes_fail_instead_of_hanging(self) -> None:
+        await self.executor.close()
+        with self.assertRaises(RuntimeError):
+            await asyncio.wait_for(self.executor.write(lambda connection: None), 5)
+
+        pool = SqliteConnectionPool(Path(self._tmp_dir.name) / "closed.db")
+        pool.close()
+        executor = SqliteAsyncExecutor(pool)
+        for _ in range(2):
+            with self.assertRaises(RuntimeError):
+                await asyncio.wait_for(executor.write(lambda connection: None), 5)
+        await executor.close()
+
+    async def test_exercise_update_is_visible_to_readers(self) -> None:
+        exercise = await self.exercises.create(Exercise(None, "Squats", "strength", 6.0))
+        self.assertEqual((await self.exercises.get(exercise.id)).calories_per_minute, 6.0)
+
+        exercise.calories_per_minute = 9.0
+        await self.exercises.update(exercise)
+
+        self.assertEqual((await self.exercises.get(exercise.id)).calories_per_minute, 9.0)
+        await self.exercises.delete(exercise.id)
+        self.assertIsNone(await self.exercises.get(exercise.id))
+
+
+class AsyncHistoryStoreTest(unittest.IsolatedAsyncioTestCase):
+    async def asyncSetUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.store = AsyncHistoryStore(Path(self._tmp_dir.name) / "history.jsonl", chunk_size=3)
+
+    async def asyncTearDown(self) -> None:
+        await self.store.close()
+        self._tmp_dir.cleanup()
+
+    async def test_streams_sessions_in_chunks(self) -> None:
+        start = datetime(2024, 1, 1, 8, 0, 0)
+        for day in range(7):
+            await self.store.add_session(SessionRecord(20, 150, start + timedelta(days=day), "Tabata"))
+
+        streamed = [record async for record in self.store.iter_sessions()]
+        listed = await self.store.list_sessions()
+
+        self.assertEqual([record.completed_at.day for record in streamed], list(range(1, 8)))
+        self.assertEqual(listed, streamed[::-1])
+        weekly = await self.store.weekly_progress()
+        self.assertEqual([week.sessions_completed for week in weekly], [7])
+        self.assertEqual((await self.store.yearly_progress())[0].total_minutes, 140)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,96 @@
+import io
+import json
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tabata import progress
+from tabata.batch import aggregate_file, aggregate_histories, json_lines_sink
+from tabata.history import SessionRecord, encode_line
+from tabata.segments import write_segment
+
+
+def _history(seed: int, count: int) -> list[SessionRecord]:
+    generator = random.Random(seed)
+    start = datetime(2022, 6, 1, 7, 0, 0)
+    return [
+        SessionRecord(
+            duration_minutes=generator.randint(5, 60),
+            calories=generator.randint(40, 700),
+            completed_at=start + timedelta(minutes=generator.randint(0, 60 * 24 * 700)),
+            source_session=generator.choice(["tabata", "hiit", "emom"]),
+        )
+        for _ in range(count)
+    ]
+
+
+class BatchAggregationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp_dir.name)
+        self.histories = {}
+        for user in range(6):
+            records = _history(user, 50 + 40 * user)
+            path = self.directory / f"user-{user}.json"
+            if user % 3 == 2:
+                path = self.directory / f"user-{user}.seg"
+                write_segment(path, records)
+            else:
+                path.write_bytes(b"".join(encode_line(record) for record in records))
+            self.histories[path] = records
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_merged_buckets_match_a_single_pass(self) -> None:
+        results = []
+        report = aggregate_histories(sorted(self.histories), sink=results.append, workers=2)
+
+        everything = [record for records in self.histories.values() for record in records]
+        self.assertEqual(report.buckets.weekly(), progress.weekly_progress(everything))
+        self.assertEqual(report.buckets.yearly(), progress.yearly_progress(everything))
+        self.assertEqual((report.files, report.sessions, report.failed), (6, len(everything), []))
+        self.assertGreater(report.sessions_per_second, 0)
+
+        self.assertEqual([result.path for result in results], sorted(self.histories))
+        for result in results:
+            records = self.histories[result.path]
+            self.assertEqual(result.yearly(), progress.yearly_progress(records))
+            self.assertEqual(result.total_calories, progress.total_calories(records))
+            self.assertEqual(result.total_minutes, progress.total_minutes(records))
+
+    def test_failures_are_reported_without_stopping_the_batch(self) -> None:
+        missing = self.directory / "missing.json"
+        output = io.StringIO()
+        report = aggregate_histories([missing, *sorted(self.histories)], json_lines_sink(output), workers=2)
+
+        self.assertEqual(report.failed, [missing])
+        self.assertEqual(report.files, 7)
+        lines = [json.loads(line) for line in output.getvalue().splitlines()]
+        self.assertEqual(len(lines), 7)
+        self.assertIn("error", lines[0])
+        self.assertEqual(lines[1]["sessions_completed"], len(self.histories[sorted(self.histories)[0]]))
+
+    def test_histories_are_only_read(self) -> None:
+        legacy = self.directory / "legacy.json"
+        records = _history(99, 30)
+        legacy.write_text(json.dumps([record.to_dict() for record in records]), encoding="utf-8")
+        before = {path: path.read_bytes() for path in self.directory.iterdir()}
+
+        report = aggregate_histories([legacy, *sorted(self.histories)], workers=2)
+
+        self.assertEqual(report.failed, [])
+        self.assertEqual(report.sessions, sum(map(len, self.histories.values())) + len(records))
+        self.assertEqual({path: path.read_bytes() for path in self.directory.iterdir()}, before)
+
+    def test_single_file_matches_the_progress_functions(self) -> None:
+        path, records = next(iter(self.histories.items()))
+        result = aggregate_file(path)
+        self.assertTrue(result.ok)
+        self.assertEqual(result.weekly(), progress.weekly_progress(records))
+
+
+if __name__ == "__main__":
+    unittest.main()
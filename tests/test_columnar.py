@@ -0,0 +1,51 @@
+import random
+import unittest
+from datetime import datetime, timedelta
+from unittest import mock
+
+from tabata import columnar, progress
+from tabata.history import SessionRecord
+
+
+def _history(count: int) -> list[SessionRecord]:
+    generator = random.Random(7)
+    start = datetime(2022, 12, 20, 6, 0, 0)
+    return [
+        SessionRecord(
+            duration_minutes=generator.randint(5, 60),
+            calories=generator.randint(40, 700),
+            completed_at=start + timedelta(hours=generator.randint(0, 24 * 800)),
+            source_session=generator.choice(["tabata", "hiit", "emom"]),
+        )
+        for _ in range(count)
+    ]
+
+
+@unittest.skipIf(columnar.np is None, "NumPy is not installed")
+class ColumnarProgressTest(unittest.TestCase):
+    def test_vectorized_aggregations_match_pure_python(self) -> None:
+        records = _history(2000)
+        columns = columnar.HistoryColumns.from_records(records)
+
+        self.assertEqual(columnar.weekly_progress(columns), progress.weekly_progress(records))
+        self.assertEqual(columnar.yearly_progress(columns), progress.yearly_progress(records))
+        self.assertEqual(columnar.weekly_frequency(records), progress.weekly_frequency(records))
+        self.assertEqual(sum(columns.sessions_per_source().values()), len(records))
+
+    def test_empty_history(self) -> None:
+        self.assertEqual(columnar.weekly_progress([]), [])
+        self.assertEqual(columnar.yearly_progress([]), [])
+
+
+class ColumnarFallbackTest(unittest.TestCase):
+    def test_falls_back_to_pure_python_without_numpy(self) -> None:
+        records = _history(50)
+        with mock.patch.object(columnar, "np", None):
+            self.assertEqual(columnar.weekly_progress(records), progress.weekly_progress(records))
+            self.assertEqual(columnar.yearly_progress(records), progress.yearly_progress(records))
+            with self.assertRaises(RuntimeError):
+                columnar.HistoryColumns.from_records(records)
+
+
+if __name__ == "__main__":
+    unittest.main()
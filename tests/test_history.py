@@ -0,0 +1,163 @@
+import json
+import tempfile
+import unittest
+from datetime import datetime
+from pathlib import Path
+
+from tabata.history import HistoryStore, SessionRecord
+from tabata.progress import weekly_progress, yearly_progress
+
+
+def _record(day: int, hour: int = 8, minutes: int = 20) -> SessionRecord:
+    return SessionRecord(
+        duration_minutes=minutes,
+        calories=minutes * 10,
+        completed_at=datetime(2024, 3, day, hour, 0, 0),
+        source_session=f"session-{day}",
+    )
+
+
+class HistoryStoreTest(unittest.TestCase):
+    def test_appends_and_lists_in_reverse_chronological_order(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "history.json"
+            store = HistoryStore(path)
+            for day in (3, 1, 2):
+                store.add_session(_record(day))
+
+            listed = store.list_sessions()
+            self.assertEqual([item.completed_at.day for item in listed], [3, 2, 1])
+            self.assertEqual(len(path.read_text(encoding="utf-8").splitlines()), 3)
+
+            reopened = HistoryStore(path)
+            self.assertEqual(reopened.list_sessions(), listed)
+
+    def test_range_query_bounds_are_inclusive(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = HistoryStore(Path(tmp_dir) / "history.json")
+            for day in range(1, 11):
+                store.add_session(_record(day))
+
+            listed = store.list_sessions(
+                start=datetime(2024, 3, 3, 8, 0, 0),
+                end=datetime(2024, 3, 5, 8, 0, 0),
+            )
+            self.assertEqual([item.completed_at.day for item in listed], [5, 4, 3])
+            self.assertEqual(store.list_sessions(start=datetime(2024, 3, 10, 8, 0, 0, 1)), [])
+
+    def test_iter_sessions_streams_in_requested_order(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            store = HistoryStore(Path(tmp_dir) / "history.json")
+            for day in (5, 2, 9, 1):
+                store.add_session(_record(day))
+
+            streamed = store.iter_sessions(start=datetime(2024, 3, 2))
+            self.assertEqual([item.completed_at.day for item in streamed], [2, 5, 9])
+            descending = store.iter_sessions(order="desc")
+            self.assertEqual([item.completed_at.day for item in descending], [9, 5, 2, 1])
+            self.assertEqual(
+                weekly_progress(store.iter_sessions()),
+                weekly_progress(store.list_sessions()),
+            )
+            with self.assertRaises(ValueError):
+                store.iter_sessions(order="newest")
+
+    def test_rebuilds_missing_index_and_converts_legacy_file(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "history.json"
+            legacy = [_record(day).to_dict() for day in (2, 1)]
+            path.write_text(json.dumps(legacy, indent=2), encoding="utf-8")
+
+            store = HistoryStore(path)
+            self.assertEqual([item.completed_at.day for item in store.list_sessions()], [2, 1])
+
+            Path(tmp_dir, "history.json.idx").unlink()
+            store = HistoryStore(path)
+            store.add_session(_record(3))
+            self.assertEqual([item.completed_at.day for item in store.list_sessions()], [3, 2, 1])
+
+    def test_recovers_from_a_torn_last_line(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "history.json"
+            with HistoryStore(path) as store:
+                for day in (1, 2):
+                    store.add_session(_record(day))
+            complete = path.read_bytes()
+            with path.open("ab") as journal:
+                journal.write(json.dumps(_record(3).to_dict()).encode("utf-8")[:30])
+
+            with HistoryStore(path) as store:
+                self.assertEqual([item.completed_at.day for item in store.list_sessions()], [2, 1])
+                self.assertEqual(path.read_bytes(), complete)
+                store.add_session(_record(4))
+                self.assertEqual([item.completed_at.day for item in store.list_sessions()], [4, 2, 1])
+                self.assertEqual(store.weekly_progress(), weekly_progress(store.list_sessions()))
+
+            Path(tmp_dir, "history.json.idx").unlink()
+            with HistoryStore(path) as store:
+                self.assertEqual([item.completed_at.day for item in store.list_sessions()], [4, 2, 1])
+
+    def test_rollups_follow_appends_and_rebuild_when_stale(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "history.json"
+            store = HistoryStore(path)
+            for day in (1, 4, 5, 12, 28):
+                store.add_session(_record(day))
+            records = store.list_sessions()
+
+            self.assertEqual(store.weekly_progress(), weekly_progress(records))
+            self.assertEqual(store.yearly_progress(), yearly_progress(records))
+            self.assertEqual(
+                [item.week_start.day for item in store.weekly_progress(start=datetime(2024, 3, 4))],
+                [4, 11, 25],
+            )
+
+            store.close()
+            Path(tmp_dir, "history.json.rollup.sqlite").unlink()
+            with path.open("a", encoding="utf-8") as journal:
+                journal.write(json.dumps(_record(29).to_dict()) + "\n")
+            reopened = HistoryStore(path)
+            self.assertEqual(reopened.weekly_progress(), weekly_progress(reopened.list_sessions()))
+
+    def test_weekly_progress_ranges_cut_partial_weeks(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            with HistoryStore(Path(tmp_dir) / "history.json") as store:
+                for day in (1, 4, 5, 6, 10, 12, 17, 28):
+                    store.add_session(_record(day))
+
+                # 2024-03-04 and 2024-03-11 are Mondays.
+                for start, end in (
+                    (datetime(2024, 3, 6), None),
+                    (datetime(2024, 3, 5, 8, 0, 0, 1), datetime(2024, 3, 12, 7, 59)),
+                    (None, datetime(2024, 3, 10, 8)),
+                    (datetime(2024, 3, 4), datetime(2024, 3, 17, 23, 59, 59)),
+                    (datetime(2024, 3, 5), datetime(2024, 3, 6)),
+                ):
+                    with self.subTest(start=start, end=end):
+                        self.assertEqual(
+                            store.weekly_progress(start, end),
+                            weekly_progress(store.list_sessions(start, end)),
+                        )
+                # Days 4 and 5 fall before the start of their week's range.
+                midweek = store.weekly_progress(start=datetime(2024, 3, 6))
+                self.assertEqual((midweek[0].week_start.day, midweek[0].sessions_completed), (4, 2))
+
+    def test_rollups_reuse_one_connection_until_closed(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = Path(tmp_dir) / "history.json"
+            with HistoryStore(path) as store:
+                store.add_session(_record(1))
+                connection = store._rollups._connect()
+                statements: list = []
+                connection.set_trace_callback(statements.append)
+                store.add_session(_record(2))
+                connection.set_trace_callback(None)
+                self.assertFalse([statement for statement in statements if "CREATE" in statement])
+                self.assertIs(store._rollups._connect(), connection)
+
+            self.assertEqual(store.yearly_progress()[0].sessions_completed, 2)
+            store.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,108 @@
+import gc
+import sqlite3
+import unittest
+import weakref
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import (
+    InstrumentedConnection,
+    QueryMetrics,
+    SqliteBlockRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    initialize_sqlite,
+)
+
+
+def _session(blocks: int) -> Session:
+    return Session(
+        id=None,
+        name="Instrumented",
+        warmup_seconds=60,
+        recovery_seconds=30,
+        blocks=[
+            Block(
+                id=None,
+                name=f"Block {position}",
+                position=position,
+                intervals=[Interval(id=None, position=1, duration_seconds=20)],
+            )
+            for position in range(blocks)
+        ],
+    )
+
+
+class InstrumentationTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.raw = sqlite3.connect(":memory:")
+        initialize_sqlite(self.raw)
+        self.metrics = QueryMetrics(n_plus_one_threshold=5)
+        self.connection = InstrumentedConnection(self.raw, self.metrics)
+        self.sessions = SqliteSessionRepository(self.connection)
+
+    def tearDown(self) -> None:
+        self.raw.close()
+
+    def test_counts_queries_per_outermost_repository_method(self) -> None:
+        SqliteExerciseRepository(self.connection).create(
+            Exercise(id=None, name="Burpees", category="cardio", calories_per_minute=12.0)
+        )
+        (created,) = self.sessions.create_many_with_blocks([_session(3)])
+        self.sessions.get_with_details(created.id)
+        self.sessions.get_with_details(created.id)
+
+        snapshot = self.metrics.snapshot()
+
+        details = snapshot["methods"]["SqliteSessionRepository.get_with_details"]
+        self.assertEqual(details["invocations"], 2)
+        self.assertEqual(details["queries"], 6)
+        self.assertEqual(details["rows"], 2 * (1 + 3 + 3))
+        self.assertEqual(sum(details["histogram"].values()), details["queries"])
+        self.assertIn("SqliteExerciseRepository.create", snapshot["methods"])
+        self.assertNotIn("SqliteBlockRepository.list_with_intervals", snapshot["methods"])
+        self.assertEqual(snapshot["queries"], sum(stats["queries"] for stats in snapshot["methods"].values()))
+        self.assertEqual(snapshot["n_plus_one"], [])
+
+    def test_does_not_keep_returned_methods_alive(self) -> None:
+        (created,) = self.sessions.create_many_with_blocks([_session(1)])
+        loaded = weakref.ref(self.sessions.get_with_details(created.id))
+
+        # The method's frame, and the session local in it, are gone once it returns.
+        gc.collect()
+        self.assertIsNone(loaded())
+        self.sessions.get_with_details(created.id)
+        details = self.metrics.snapshot()["methods"]["SqliteSessionRepository.get_with_details"]
+        self.assertEqual(details["invocations"], 2)
+
+    def test_flags_n_plus_one_patterns(self) -> None:
+        with self.assertLogs("tabata.storage.instrumentation", "WARNING") as logs:
+            self.sessions.create_with_blocks(_session(6))
+
+        (flagged,) = [
+            entry
+            for entry in self.metrics.snapshot()["n_plus_one"]
+            if entry["statement"].startswith("INSERT INTO blocks")
+        ]
+        self.assertEqual(flagged["method"], "SqliteSessionRepository.create_with_blocks")
+        self.assertIn("N+1", logs.output[0])
+
+    def test_logs_slow_queries_with_plan(self) -> None:
+        self.metrics.slow_query_seconds = 0.0
+        blocks = SqliteBlockRepository(self.connection)
+
+        with self.assertLogs("tabata.storage.instrumentation", "WARNING") as logs:
+            blocks.list_by_session(1)
+
+        (slow,) = self.metrics.snapshot()["slow_queries"]
+        self.assertEqual(slow["method"], "SqliteBlockRepository.list_by_session")
+        self.assertTrue(any("idx_blocks_session_position" in step for step in slow["plan"]))
+        self.assertIn("idx_blocks_session_position", logs.output[0])
+
+    def test_reset_clears_metrics(self) -> None:
+        self.sessions.list()
+        self.metrics.reset()
+        self.assertEqual(self.metrics.snapshot()["queries"], 0)
+
+
+if __name__ == "__main__":
+    unittest.main()
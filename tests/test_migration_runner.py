@@ -3,7 +3,14 @@ import tempfile
 import unittest
 from pathlib import Path
 
-from db.migration_runner import apply_migrations, load_migrations
+from db.migration_runner import (
+    MigrationError,
+    _split_sql_statements,
+    apply_migrations,
+    expand_targets,
+    load_migrations,
+    migrate_fleet,
+)
 
 
 def _column_names(conn: sqlite3.Connection, table: str) -> set[str]:
@@ -35,6 +42,111 @@ class MigrationRunnerTest(unittest.TestCase):
                 versions = [row[0] for row in conn.execute("SELECT version FROM schema_version ORDER BY version;")]
                 self.assertEqual(versions, [1, 2])
 
+    def test_split_ignores_separators_inside_quotes(self) -> None:
+        sql = "INSERT INTO t VALUES ('a;b', \"c;d\");\n-- note\nSELECT 'it''s';;  SELECT 1"
+        self.assertEqual(
+            _split_sql_statements(sql),
+            ["INSERT INTO t VALUES ('a;b', \"c;d\")", "-- note\nSELECT 'it''s'", "SELECT 1"],
+        )
+
+    def test_up_to_date_database_costs_one_query(self) -> None:
+        migrations = load_migrations()
+        conn = sqlite3.connect(":memory:")
+        apply_migrations(conn, migrations)
+        conn.commit()
+        statements: list[str] = []
+        conn.set_trace_callback(statements.append)
+        apply_migrations(conn, migrations)
+        conn.close()
+        self.assertEqual(len(statements), 1)
+
+    def test_failed_migration_is_rolled_back(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            (directory / "001_init.sql").write_text("CREATE TABLE items (id INTEGER PRIMARY KEY);")
+            (directory / "002_broken.sql").write_text(
+                "CREATE TABLE extra (id INTEGER);\nALTER TABLE missing ADD COLUMN name TEXT;"
+            )
+            conn = sqlite3.connect(directory / "app.db")
+            with self.assertRaisesRegex(MigrationError, "Migration 2 \\(broken\\) failed"):
+                apply_migrations(conn, load_migrations(directory))
+            tables = {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+            versions = [row[0] for row in conn.execute("SELECT version FROM schema_version")]
+            conn.close()
+            self.assertIn("items", tables)
+            self.assertNotIn("extra", tables)
+            self.assertEqual(versions, [1])
+
+    def test_modified_migration_is_rejected(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            directory = Path(tmp_dir)
+            migration = directory / "001_init.sql"
+            migration.write_text("CREATE TABLE items (id INTEGER PRIMARY KEY);")
+            conn = sqlite3.connect(directory / "app.db")
+            apply_migrations(conn, load_migrations(directory))
+            migration.write_text("CREATE TABLE items (id INTEGER PRIMARY KEY, name TEXT);")
+            with self.assertRaisesRegex(MigrationError, "modified after it was applied"):
+                apply_migrations(conn, load_migrations(directory))
+            conn.close()
+
+    def test_records_checksums_on_databases_migrated_before_them(self) -> None:
+        migrations = load_migrations()
+        conn = sqlite3.connect(":memory:")
+        conn.executescript(
+            """
+            CREATE TABLE schema_version (
+                version INTEGER PRIMARY KEY,
+                applied_at TEXT NOT NULL DEFAULT CURRENT_TIMESTAMP
+            );
+            CREATE TABLE entries (id INTEGER PRIMARY KEY, title TEXT NOT NULL, created_at TEXT NOT NULL);
+            INSERT INTO schema_version (version) VALUES (1);
+            """
+        )
+        apply_migrations(conn, migrations)
+        conn.commit()
+        checksums = dict(conn.execute("SELECT version, checksum FROM schema_version"))
+        conn.close()
+        self.assertEqual(checksums, {migration.version: migration.checksum for migration in migrations})
+
+    def test_fleet_migration_reports_failures_and_resumes(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            root = Path(tmp_dir)
+            (root / "shard").mkdir()
+            for index in range(6):
+                sqlite3.connect(root / "shard" / f"user{index}.db").close()
+            (root / "shard" / "broken.db").write_bytes(b"not a database" * 16)
+            state = root / "state.jsonl"
+
+            paths = expand_targets([str(root / "shard")])
+            self.assertEqual(expand_targets([str(root / "shard" / "user*.db")]), paths[1:])
+            results = migrate_fleet(paths, workers=2, state_path=state)
+
+            self.assertEqual(len(results), 7)
+            failed = [result for result in results if not result.ok]
+            self.assertEqual([result.path.name for result in failed], ["broken.db"])
+            self.assertTrue(all(result.applied == (1, 2) for result in results if result.ok))
+            conn = sqlite3.connect(paths[1])
+            self.assertIn("notes", _column_names(conn, "entries"))
+            conn.close()
+
+            rerun = migrate_fleet(paths, workers=2, state_path=state)
+            self.assertEqual([result.path.name for result in rerun], ["broken.db"])
+
+    def test_fleet_migration_fails_missing_explicit_paths(self) -> None:
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            existing = Path(tmp_dir) / "user.db"
+            sqlite3.connect(existing).close()
+            mistyped = Path(tmp_dir) / "usr.db"
+
+            results = migrate_fleet(expand_targets([str(existing), str(mistyped)]), workers=1)
+
+            self.assertEqual(
+                [(result.path, result.ok) for result in results],
+                [(existing, True), (mistyped, False)],
+            )
+            self.assertIn("FileNotFoundError", results[1].error)
+            self.assertFalse(mistyped.exists())
+
 
 if __name__ == "__main__":
     unittest.main()
@@ -0,0 +1,138 @@
+import copy
+import pickle
+import sqlite3
+import unittest
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import SqliteExerciseRepository, SqliteSessionRepository, initialize_sqlite
+
+
+def _session(exercise: Exercise) -> Session:
+    return Session(
+        id=None,
+        name="Morning",
+        warmup_seconds=60,
+        recovery_seconds=30,
+        blocks=[
+            Block(
+                id=None,
+                name="second",
+                position=2,
+                intervals=[Interval(id=None, position=1, duration_seconds=40, exercise=exercise)],
+            ),
+            Block(
+                id=None,
+                name="first",
+                position=1,
+                intervals=[
+                    Interval(id=None, position=2, duration_seconds=10),
+                    Interval(id=None, position=1, duration_seconds=20, exercise=exercise),
+                ],
+            ),
+        ],
+    )
+
+
+class ModelCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.exercise = Exercise(id=1, name="Burpees", category="cardio", calories_per_minute=12.0)
+        self.session = _session(self.exercise)
+
+    def test_ordering_is_cached_until_a_mutation(self) -> None:
+        ordered = self.session.ordered_blocks()
+        self.assertEqual([block.name for block in ordered], ["first", "second"])
+        self.assertIs(self.session.ordered_blocks(), ordered)
+
+        self.session.blocks[0].position = 0
+        self.assertEqual([block.name for block in self.session.ordered_blocks()], ["second", "first"])
+
+        self.session.blocks.append(Block(id=None, name="zero", position=-1))
+        self.assertEqual(self.session.ordered_blocks()[0].name, "zero")
+
+        first = self.session.blocks[1]
+        self.assertEqual([interval.duration_seconds for interval in first.ordered_intervals()], [20, 10])
+        first.intervals = list(reversed(first.intervals))
+        first.intervals[0].position = 3
+        self.assertEqual([interval.duration_seconds for interval in first.ordered_intervals()], [10, 20])
+
+    def test_assigned_lists_are_kept_and_followed(self) -> None:
+        blocks: list = []
+        self.session.blocks = blocks
+        self.assertIs(self.session.blocks, blocks)
+        self.assertEqual(self.session.total_duration_seconds, 90)
+
+        blocks.append(Block(id=None, name="late", position=1, intervals=[Interval(None, 1, 30)]))
+        self.assertEqual([block.name for block in self.session.ordered_blocks()], ["late"])
+        self.assertEqual(self.session.total_duration_seconds, 120)
+        blocks[0].intervals.append(Interval(None, 2, 15))
+        self.assertEqual(self.session.total_duration_seconds, 135)
+
+    def test_changes_only_invalidate_dependent_models(self) -> None:
+        other = _session(self.exercise)
+        ordered = self.session.ordered_blocks()
+        total = self.session.total_duration_seconds
+
+        other.name = "Evening"
+        other.blocks[0].intervals[0].duration_seconds = 5
+        self.assertIs(self.session.ordered_blocks(), ordered)
+        self.assertIn("total_duration_seconds", self.session.__dict__["_cache"])
+        self.assertEqual(self.session.total_duration_seconds, total)
+
+        shared = Interval(id=None, position=3, duration_seconds=10)
+        for block in self.session.blocks:
+            block.intervals.append(shared)
+        self.assertEqual(self.session.total_duration_seconds, total + 20)
+        shared.duration_seconds = 30
+        self.assertEqual(self.session.total_duration_seconds, total + 60)
+
+    def test_totals_follow_nested_changes(self) -> None:
+        self.assertEqual(self.session.total_duration_seconds, 160)
+        self.assertAlmostEqual(self.session.estimated_calories, 12.0)
+
+        self.exercise.calories_per_minute = 6.0
+        self.assertAlmostEqual(self.session.estimated_calories, 6.0)
+
+        self.session.blocks[1].intervals[0].duration_seconds = 25
+        del self.session.blocks[0]
+        self.assertEqual(self.session.total_duration_seconds, 135)
+        self.assertAlmostEqual(self.session.estimated_calories, 2.0)
+
+    def test_totals_multiply_block_repetitions(self) -> None:
+        first = self.session.blocks[1]
+        self.assertEqual(first.total_duration_seconds, 30)
+        first.repetitions = 8
+        self.assertEqual(first.total_duration_seconds, 240)
+        self.assertEqual(self.session.total_duration_seconds, 90 + 240 + 40)
+        self.assertAlmostEqual(self.session.estimated_calories, 8 * 4.0 + 8.0)
+
+    def test_totals_match_sql(self) -> None:
+        connection = sqlite3.connect(":memory:")
+        initialize_sqlite(connection)
+        exercise = SqliteExerciseRepository(connection).create(self.exercise)
+        sessions = SqliteSessionRepository(connection)
+        session = _session(exercise)
+        session.blocks[0].repetitions = 3
+        created = sessions.create_with_blocks(session)
+
+        loaded = sessions.get_with_details(created.id)
+
+        self.assertEqual(loaded.total_duration_seconds, sessions.total_duration_seconds(created.id))
+        self.assertAlmostEqual(loaded.estimated_calories, sessions.estimate_calories(created.id))
+        connection.close()
+
+    def test_copies_do_not_share_cached_values(self) -> None:
+        self.session.ordered_blocks()
+        clone = copy.copy(self.session)
+        clone.warmup_seconds = 0
+        self.assertEqual(clone.total_duration_seconds, 100)
+        self.assertEqual(self.session.total_duration_seconds, 160)
+        restored = pickle.loads(pickle.dumps(self.session))
+        self.assertEqual(restored, self.session)
+        self.assertNotIn("_cache", restored.__dict__)
+        self.assertEqual(restored.total_duration_seconds, 160)
+        restored.blocks[0].intervals[0].duration_seconds = 10
+        self.assertEqual(restored.total_duration_seconds, 130)
+
+
+if __name__ == "__main__":
+    unittest.main()
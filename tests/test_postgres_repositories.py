@@ -0,0 +1,285 @@
+import os
+import sqlite3
+import threading
+import unittest
+import uuid
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import (
+    PostgresBlockRepository,
+    PostgresConnectionPool,
+    PostgresExerciseRepository,
+    PostgresSessionRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    initialize_postgres,
+    initialize_sqlite,
+)
+from tabata.storage import postgres_repositories
+
+# Point this at a throwaway server, e.g. postgresql://postgres@localhost/postgres.
+# Each test works in its own schema, dropped afterwards.
+DSN = os.environ.get("TABATA_TEST_POSTGRES_DSN")
+
+
+def _session(name: str, exercise: Exercise) -> Session:
+    return Session(
+        id=None,
+        name=name,
+        warmup_seconds=60,
+        recovery_seconds=30,
+        blocks=[
+            Block(
+                id=None,
+                name=f"{name} block {position}",
+                position=position,
+                intervals=[
+                    Interval(id=None, position=0, duration_seconds=20, exercise=exercise),
+                    Interval(id=None, position=1, duration_seconds=10),
+                ],
+                repetitions=position * 4,
+            )
+            for position in (2, 1)
+        ],
+    )
+
+
+@unittest.skipIf(postgres_repositories.psycopg is not None, "psycopg is installed")
+class PostgresWithoutDriverTest(unittest.TestCase):
+    def test_pool_requires_psycopg(self) -> None:
+        with self.assertRaises(RuntimeError):
+            PostgresConnectionPool("postgresql://localhost/tabata")
+
+
+@unittest.skipUnless(DSN and postgres_repositories.psycopg, "set TABATA_TEST_POSTGRES_DSN to run")
+class PostgresRepositoryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        psycopg = postgres_repositories.psycopg
+        self.schema = f"tabata_test_{uuid.uuid4().hex[:12]}"
+        self.admin = psycopg.connect(DSN, autocommit=True)
+        self.admin.execute(f"CREATE SCHEMA {self.schema}")
+        self.pool = PostgresConnectionPool(
+            DSN,
+            max_size=4,
+            configure=lambda connection: connection.execute(f"SET search_path TO {self.schema}"),
+        )
+        initialize_postgres(self.pool)
+        self.exercises = PostgresExerciseRepository(self.pool)
+        self.sessions = PostgresSessionRepository(self.pool, batch_size=3)
+        self.blocks = PostgresBlockRepository(self.pool)
+        self.exercise = self.exercises.create(
+            Exercise(id=None, name="Burpees", category="cardio", calories_per_minute=12.5)
+        )
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self.admin.execute(f"DROP SCHEMA {self.schema} CASCADE")
+        self.admin.close()
+
+    def _count(self, table: str) -> int:
+        with self.pool.connection() as connection:
+            return connection.execute(f"SELECT COUNT(*) FROM {table}").fetchone()[0]
+
+    def test_sessions_round_trip_with_positions_as_ranks(self) -> None:
+        created = self.sessions.create_with_blocks(_session("morning", self.exercise))
+
+        self.assertEqual([block.position for block in created.blocks], [1, 2])
+        self.assertEqual([interval.position for interval in created.blocks[0].intervals], [1, 2])
+        self.assertEqual(self.sessions.get_with_details(created.id), created)
+        self.assertEqual(self.sessions.get(created.id).warmup_seconds, 60)
+        self.assertEqual(PostgresExerciseRepository(self.pool).get(self.exercise.id), self.exercise)
+        self.assertEqual(self.blocks.get_with_intervals(created.blocks[1].id), created.blocks[1])
+        self.assertEqual(
+            [(block.id, block.position, block.repetitions) for block in self.blocks.list_by_session(created.id)],
+            [(block.id, block.position, block.repetitions) for block in created.blocks],
+        )
+
+    def test_views_match_the_models_and_sqlite(self) -> None:
+        created = self.sessions.create_with_blocks(_session("morning", self.exercise))
+
+        connection = sqlite3.connect(":memory:")
+        initialize_sqlite(connection)
+        exercise = SqliteExerciseRepository(connection).create(self.exercise)
+        sqlite_sessions = SqliteSessionRepository(connection)
+        reference = sqlite_sessions.create_with_blocks(_session("morning", exercise))
+
+        self.assertEqual(self.sessions.total_duration_seconds(created.id), created.total_duration_seconds)
+        self.assertEqual(
+            self.sessions.total_duration_seconds(created.id),
+            sqlite_sessions.total_duration_seconds(reference.id),
+        )
+        self.assertAlmostEqual(self.sessions.estimate_calories(created.id), created.estimated_calories)
+        self.assertAlmostEqual(
+            self.sessions.estimate_calories(created.id),
+            sqlite_sessions.estimate_calories(reference.id),
+        )
+        connection.close()
+
+        with self.pool.connection() as pg:
+            view = pg.execute(
+                "SELECT calories_estimees FROM seance_calories_estimees WHERE seance_id = %s",
+                (created.id,),
+            ).fetchone()[0]
+        self.assertAlmostEqual(self.sessions.estimate_calories(created.id), float(view))
+
+        empty = self.sessions.create(Session(id=None, name="empty", warmup_seconds=0, recovery_seconds=0))
+        history = [created.id] * 3 + [empty.id, 9999]
+        self.assertEqual(
+            self.sessions.estimate_calories_by_session(history),
+            {created.id: 3 * self.sessions.estimate_calories(created.id), empty.id: 0.0},
+        )
+
+    def test_bulk_load_in_batches(self) -> None:
+        created = self.sessions.create_many_with_blocks(
+            [_session(f"bulk {index}", self.exercise) for index in range(10)]
+        )
+
+        self.assertEqual(len({session.id for session in created}), 10)
+        self.assertEqual(self.sessions.list_with_details([session.id for session in created]), created)
+        self.assertEqual(self._count("bloc_intervalles"), 40)
+        self.assertEqual(self._count("intervalle"), 40 + 20)
+
+    def test_update_with_blocks_keeps_ids_and_leaves_no_orphans(self) -> None:
+        created = self.sessions.create_with_blocks(_session("edited", self.exercise))
+        first, second = created.blocks
+        moved = first.intervals.pop()
+        moved.position = 5
+        second.intervals.append(moved)
+        second.repetitions = 2
+        created.blocks.append(
+            Block(
+                id=None,
+                name="finisher",
+                position=3,
+                intervals=[Interval(id=None, position=1, duration_seconds=45, exercise=self.exercise)],
+            )
+        )
+        created.warmup_seconds = 0
+        created.recovery_seconds = 90
+
+        blocks = created.blocks
+        updated = self.sessions.update_with_blocks(created)
+
+        self.assertIs(updated.blocks, blocks)
+        loaded = self.sessions.get_with_details(created.id)
+        self.assertEqual(loaded, updated)
+        self.assertEqual([block.id for block in loaded.blocks[:2]], [first.id, second.id])
+        self.assertEqual(loaded.blocks[1].intervals[-1].id, moved.id)
+        self.assertEqual(self.sessions.total_duration_seconds(created.id), loaded.total_duration_seconds)
+        self.assertAlmostEqual(self.sessions.estimate_calories(created.id), loaded.estimated_calories)
+
+        del created.blocks[0]
+        self.sessions.update_with_blocks(created)
+        self.assertEqual(self._count("bloc"), 2)
+        # Three intervals in the remaining block, one in the finisher and the recovery phase.
+        self.assertEqual(self._count("intervalle"), 5)
+
+        self.sessions.delete(created.id)
+        self.assertEqual(
+            [self._count(table) for table in ("seance", "bloc", "intervalle", "bloc_intervalles")],
+            [0, 0, 0, 0],
+        )
+
+    def test_exercises_read_without_a_shared_cache_see_other_clients(self) -> None:
+        self.assertEqual(self.exercises.get(self.exercise.id), self.exercise)
+        other = PostgresConnectionPool(
+            DSN,
+            max_size=1,
+            configure=lambda connection: connection.execute(f"SET search_path TO {self.schema}"),
+        )
+        with other:
+            PostgresExerciseRepository(other).update(
+                Exercise(id=self.exercise.id, name="Burpees", category="cardio", calories_per_minute=14.0)
+            )
+        self.assertEqual(self.exercises.get(self.exercise.id).calories_per_minute, 14.0)
+
+        created = self.sessions.create_with_blocks(_session("shared", self.exercise))
+        loaded = self.sessions.get_with_details(created.id)
+        hydrated = {
+            id(interval.exercise)
+            for block in loaded.blocks
+            for interval in block.intervals
+            if interval.exercise is not None
+        }
+        self.assertEqual(len(hydrated), 1)
+
+    def test_blocks_written_alone_take_their_position_as_rank(self) -> None:
+        created = self.sessions.create_with_blocks(_session("ranked", self.exercise))
+        first, second = created.blocks
+
+        opener = Block(id=None, name="opener", position=1)
+        opener.intervals.append(Interval(id=None, position=0, duration_seconds=5))
+        inserted = self.blocks.create(opener, created.id)
+        appended = self.blocks.create(Block(id=None, name="closer", position=99), created.id)
+        self.assertEqual((inserted.position, appended.position), (1, 4))
+        self.assertEqual(
+            [block.id for block in self.blocks.list_by_session(created.id)],
+            [inserted.id, first.id, second.id, appended.id],
+        )
+
+        first.position = 3
+        self.assertEqual(self.blocks.update(first).position, 3)
+        appended.position = 1
+        self.blocks.update(appended)
+        self.assertEqual(
+            [(block.id, block.position) for block in self.blocks.list_by_session(created.id)],
+            [(appended.id, 1), (inserted.id, 2), (second.id, 3), (first.id, 4)],
+        )
+
+        first.position = 0
+        with self.assertRaises(ValueError):
+            self.blocks.update(first)
+        with self.assertRaises(ValueError):
+            self.blocks.create(Block(id=None, name="zero-based", position=0), created.id)
+        self.assertEqual(len(self.blocks.list_by_session(created.id)), 4)
+
+    def test_failed_writes_roll_back(self) -> None:
+        broken = _session("broken", self.exercise)
+        broken.blocks[0].intervals[0].duration_seconds = 0
+        with self.assertRaises(ValueError):
+            self.sessions.create_with_blocks(broken)
+        with self.assertRaises(ValueError):
+            self.sessions.create_many_with_blocks([_session("fine", self.exercise), broken])
+        self.assertEqual(self.sessions.list(), [])
+
+        stored = self.sessions.create_with_blocks(_session("stored", self.exercise))
+        stored.blocks[1].intervals[1].duration_seconds = 0
+        with self.assertRaises(ValueError):
+            self.sessions.update_with_blocks(stored)
+        self.assertEqual(
+            self.sessions.total_duration_seconds(stored.id),
+            self.sessions.create_with_blocks(_session("stored", self.exercise)).total_duration_seconds,
+        )
+        empty = Block(id=None, name="empty", position=1)
+        empty.intervals.append(Interval(id=None, position=1, duration_seconds=0))
+        with self.assertRaises(ValueError):
+            self.blocks.create(empty, stored.id)
+        self.assertEqual(len(self.blocks.list_by_session(stored.id)), 2)
+
+    def test_pool_is_bounded(self) -> None:
+        pool = PostgresConnectionPool(DSN, max_size=1, timeout=0.2)
+        held = threading.Event()
+        release = threading.Event()
+
+        def hold() -> None:
+            with pool.connection():
+                held.set()
+                release.wait(5)
+
+        worker = threading.Thread(target=hold)
+        worker.start()
+        try:
+            held.wait(5)
+            with self.assertRaises(TimeoutError):
+                with pool.connection():
+                    pass
+        finally:
+            release.set()
+            worker.join()
+        with pool.connection() as connection:
+            self.assertEqual(connection.execute("SELECT 1").fetchone()[0], 1)
+        pool.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,55 @@
+import unittest
+from datetime import datetime
+
+from tabata.history import SessionRecord
+from tabata.progress import (
+    ProgressBuckets,
+    WeeklyProgress,
+    weekly_frequency,
+    weekly_progress,
+    yearly_progress,
+)
+
+
+def _record(completed_at: datetime, minutes: int = 30, calories: int = 250) -> SessionRecord:
+    return SessionRecord(
+        duration_minutes=minutes,
+        calories=calories,
+        completed_at=completed_at,
+        source_session="tabata",
+    )
+
+
+class ProgressTest(unittest.TestCase):
+    def test_weeks_spanning_month_boundaries_start_on_monday(self) -> None:
+        records = [
+            _record(datetime(2024, 5, 1, 7, 30)),
+            _record(datetime(2024, 4, 29, 18, 0), minutes=20, calories=180),
+            _record(datetime(2025, 1, 2, 12, 0)),
+        ]
+
+        self.assertEqual(
+            weekly_progress(records),
+            [
+                WeeklyProgress(datetime(2024, 4, 29), 50, 430, 2),
+                WeeklyProgress(datetime(2024, 12, 30), 30, 250, 1),
+            ],
+        )
+        self.assertEqual(
+            weekly_frequency(records),
+            {datetime(2024, 4, 29): 2, datetime(2024, 12, 30): 1},
+        )
+        self.assertEqual([item.year for item in yearly_progress(records)], [2024, 2025])
+
+    def test_merged_buckets_match_single_pass(self) -> None:
+        records = [_record(datetime(2024, month, 3, 9, 0)) for month in range(1, 13)]
+        merged = ProgressBuckets.from_records(records[:5]).merge(
+            ProgressBuckets.from_records(records[5:])
+        )
+
+        self.assertEqual(merged.weekly(), weekly_progress(records))
+        self.assertEqual(merged.yearly(), yearly_progress(records))
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,164 @@
+import sqlite3
+import tempfile
+import unittest
+from pathlib import Path
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import (
+    QueryCache,
+    SqliteBlockRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    initialize_sqlite,
+)
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+class QueryCacheTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.path = Path(self._tmp_dir.name) / "app.db"
+        self.connection = sqlite3.connect(self.path)
+        initialize_sqlite(self.connection)
+        self.clock = _Clock()
+        self.cache = QueryCache(max_size=8, ttl_seconds=60, clock=self.clock)
+        self.exercises = SqliteExerciseRepository(self.connection, query_cache=self.cache)
+        self.sessions = SqliteSessionRepository(self.connection, query_cache=self.cache)
+        self.exercise = self.exercises.create(
+            Exercise(id=None, name="Burpees", category="cardio", calories_per_minute=12.0)
+        )
+        self.session = self.sessions.create_with_blocks(
+            Session(
+                id=None,
+                name="Morning",
+                warmup_seconds=60,
+                recovery_seconds=30,
+                blocks=[
+                    Block(
+                        id=None,
+                        name="Main",
+                        position=1,
+                        intervals=[Interval(id=None, position=1, duration_seconds=120, exercise=self.exercise)],
+                    )
+                ],
+            )
+        )
+        self.statements: list = []
+        self.connection.set_trace_callback(self.statements.append)
+
+    def tearDown(self) -> None:
+        self.connection.close()
+        self._tmp_dir.cleanup()
+
+    def _queries(self) -> list:
+        return [statement for statement in self.statements if "PRAGMA" not in statement]
+
+    def test_repeated_reads_are_served_from_the_cache(self) -> None:
+        for _ in range(5):
+            details = self.sessions.get_with_details(self.session.id)
+            self.assertEqual(self.sessions.estimate_calories(self.session.id), 24.0)
+            self.assertEqual(self.sessions.total_duration_seconds(self.session.id), 210)
+        self.assertEqual(details, self.session)
+        # One miss each for get_with_details (with its nested get and block lookup) and the totals.
+        self.assertEqual(len(self._queries()), 5)
+        snapshot = self.cache.snapshot()
+        self.assertEqual(snapshot["methods"]["SqliteSessionRepository.get_with_details"]["hits"], 4)
+        self.assertEqual(snapshot["methods"]["SqliteSessionRepository.estimate_calories"]["misses"], 1)
+        self.assertGreater(self.cache.hit_ratio, 0.6)
+
+    def test_only_the_outer_read_is_cached(self) -> None:
+        self.sessions.get_with_details(self.session.id)
+        self.assertEqual(len(self.cache), 1)
+        self.assertEqual(list(self.cache.snapshot()["methods"]), ["SqliteSessionRepository.get_with_details"])
+
+    def test_reads_inside_a_transaction_are_not_cached(self) -> None:
+        self.connection.execute("UPDATE sessions SET name = 'Pending' WHERE id = ?", (self.session.id,))
+        self.assertEqual(self.sessions.get(self.session.id).name, "Pending")
+        self.connection.rollback()
+
+        self.assertEqual(self.sessions.get(self.session.id).name, "Morning")
+        self.assertEqual(self.sessions.get(self.session.id).name, "Morning")
+        self.assertEqual(self.cache.hits, 1)
+
+    def test_results_are_copies(self) -> None:
+        first = self.sessions.get_with_details(self.session.id)
+        exercise = first.blocks[0].intervals[0].exercise
+        first.name = "Changed"
+        first.blocks[0].intervals.clear()
+        second = self.sessions.get_with_details(self.session.id)
+        self.assertEqual(second.name, "Morning")
+        self.assertEqual(len(second.blocks[0].intervals), 1)
+        self.assertIs(second.blocks[0].intervals[0].exercise, exercise)
+
+    def test_writes_through_any_repository_invalidate(self) -> None:
+        blocks = SqliteBlockRepository(self.connection, query_cache=self.cache)
+        invalidations = self.cache.invalidations
+        self.assertEqual(self.sessions.estimate_calories(self.session.id), 24.0)
+        self.assertEqual(len(blocks.list_by_session(self.session.id)), 1)
+
+        self.exercise.calories_per_minute = 6.0
+        self.exercises.update(self.exercise)
+        self.assertEqual(self.sessions.estimate_calories(self.session.id), 12.0)
+
+        blocks.create(Block(id=None, name="Finisher", position=2), self.session.id)
+        self.assertEqual(len(blocks.list_by_session(self.session.id)), 2)
+
+        self.session.name = "Evening"
+        self.sessions.update(self.session)
+        self.assertEqual(self.sessions.get(self.session.id).name, "Evening")
+        self.assertEqual(self.cache.invalidations - invalidations, 3)
+
+    def test_commits_from_other_connections_are_detected(self) -> None:
+        self.assertEqual(self.sessions.get(self.session.id).name, "Morning")
+        other = sqlite3.connect(self.path)
+        try:
+            with other:
+                other.execute("UPDATE sessions SET name = 'Renamed' WHERE id = ?", (self.session.id,))
+        finally:
+            other.close()
+        self.assertEqual(self.sessions.get(self.session.id).name, "Renamed")
+
+    def test_own_commits_drop_rows_cached_by_another_connection(self) -> None:
+        self.connection.commit()
+        self.assertEqual(self.sessions.get(self.session.id).name, "Morning")
+        other = sqlite3.connect(self.path)
+        try:
+            readers = SqliteSessionRepository(other, query_cache=self.cache)
+            self.session.name = "Evening"
+            self.sessions.update(self.session)
+            # The other connection still sees the committed row and caches it.
+            self.assertEqual(readers.get(self.session.id).name, "Morning")
+            self.connection.commit()
+
+            self.assertEqual(self.sessions.get(self.session.id).name, "Evening")
+            self.assertEqual(readers.get(self.session.id).name, "Evening")
+        finally:
+            other.close()
+
+    def test_entries_expire_and_are_evicted(self) -> None:
+        self.sessions.get(self.session.id)
+        self.clock.now = 61
+        self.sessions.get(self.session.id)
+        self.assertEqual(self.cache.expirations, 1)
+
+        for session_id in range(100, 120):
+            self.sessions.get(session_id)
+        self.assertEqual(len(self.cache), 8)
+        self.assertGreater(self.cache.evictions, 0)
+
+    def test_repositories_without_a_cache_are_unchanged(self) -> None:
+        sessions = SqliteSessionRepository(self.connection)
+        sessions.get(self.session.id)
+        sessions.get(self.session.id)
+        self.assertEqual(len(self.statements), 2)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,144 @@
+import sqlite3
+import unittest
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import (
+    SqliteBlockRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    initialize_sqlite,
+)
+from tabata.storage.sqlite_db import _RECOMPUTE_SESSION_TOTALS
+
+DML_KEYWORDS = ("SELECT", "INSERT", "UPDATE", "DELETE", "WITH")
+
+# Plan steps that never depend on table size.
+ALLOWED_SCANS = ("SCAN CONSTANT ROW", "SCAN sqlite_sequence", "SCAN json_each VIRTUAL TABLE")
+
+# Unfiltered listings necessarily read the whole table.
+FULL_LISTINGS = {
+    "SELECT id, name, category, calories_per_minute FROM exercises ORDER BY name": "exercises",
+    "SELECT id, name, warmup_seconds, recovery_seconds FROM sessions ORDER BY id": "sessions",
+}
+
+
+def _session(exercise: Exercise) -> Session:
+    return Session(
+        id=None,
+        name="plans",
+        warmup_seconds=60,
+        recovery_seconds=30,
+        blocks=[
+            Block(
+                id=None,
+                name="main",
+                position=1,
+                intervals=[
+                    Interval(id=None, position=1, duration_seconds=20, exercise=exercise),
+                    Interval(id=None, position=2, duration_seconds=10),
+                ],
+            )
+        ],
+    )
+
+
+def _normalize(statement: str) -> str:
+    return " ".join(statement.split())
+
+
+class QueryPlanTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.connection = sqlite3.connect(":memory:")
+        initialize_sqlite(self.connection)
+
+    def tearDown(self) -> None:
+        self.connection.close()
+
+    def _run_repository_workload(self) -> list[str]:
+        exercises = SqliteExerciseRepository(self.connection)
+        blocks = SqliteBlockRepository(self.connection)
+        sessions = SqliteSessionRepository(self.connection)
+        statements: list[str] = []
+        self.connection.set_trace_callback(statements.append)
+
+        exercise = exercises.create(
+            Exercise(id=None, name="Burpees", category="cardio", calories_per_minute=12.0)
+        )
+        exercises.get(exercise.id)
+        exercises.list()
+        exercises.list_by_category("cardio")
+        exercises.update(exercise)
+
+        session = sessions.create_with_blocks(_session(exercise))
+        (bulk,) = sessions.create_many_with_blocks([_session(exercise)])
+        sessions.get(session.id)
+        sessions.get_with_details(session.id)
+        sessions.list_with_details([session.id, bulk.id])
+        sessions.list()
+        sessions.update(session)
+        session.blocks[0].name = "renamed"
+        session.blocks[0].intervals[0].duration_seconds = 25
+        del session.blocks[0].intervals[1]
+        session.blocks.append(_session(exercise).blocks[0])
+        session = sessions.update_with_blocks(session)
+        session.blocks.pop()
+        sessions.update_with_blocks(session)
+        sessions.total_duration_seconds(session.id)
+        sessions.estimate_calories(session.id)
+        sessions.estimate_calories_by_session([session.id, bulk.id, session.id])
+        sessions.estimate_calories_for_history([session.id, bulk.id, session.id])
+
+        block = session.blocks[0]
+        blocks.get(block.id)
+        blocks.list_by_session(session.id)
+        blocks.get_with_intervals(block.id)
+        blocks.list_with_intervals(session.id)
+        blocks.update(block)
+        blocks.delete(block.id)
+        sessions.delete(session.id)
+        exercises.delete(exercises.create(exercise).id)
+
+        self.connection.set_trace_callback(None)
+        return statements
+
+    def _assert_no_scans(self, statement: str) -> None:
+        normalized = _normalize(statement)
+        plan = [row[3] for row in self.connection.execute(f"EXPLAIN QUERY PLAN {statement}")]
+        allowed = ALLOWED_SCANS
+        if normalized in FULL_LISTINGS:
+            allowed += (f"SCAN {FULL_LISTINGS[normalized]}",)
+        scans = [
+            step
+            for step in plan
+            if step.startswith("SCAN") and not step.startswith(allowed)
+        ]
+        self.assertEqual(scans, [], f"{normalized}\n{plan}")
+
+    def test_repository_queries_use_indexes(self) -> None:
+        statements = self._run_repository_workload()
+        checked = {
+            statement
+            for statement in statements
+            if statement.lstrip().split(None, 1)[0].upper() in DML_KEYWORDS
+        }
+        self.assertGreater(len(checked), 20)
+        for statement in sorted(checked):
+            with self.subTest(statement=_normalize(statement)[:80]):
+                self._assert_no_scans(statement)
+
+    def test_trigger_recomputations_use_indexes(self) -> None:
+        for condition in (
+            "id = 1",
+            """id IN (
+                SELECT blocks.session_id
+                FROM intervals
+                JOIN blocks ON intervals.block_id = blocks.id
+                WHERE intervals.exercise_id = 1
+            )""",
+        ):
+            with self.subTest(condition=_normalize(condition)):
+                self._assert_no_scans(_RECOMPUTE_SESSION_TOTALS.format(condition=condition))
+
+
+if __name__ == "__main__":
+    unittest.main()
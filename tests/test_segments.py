@@ -0,0 +1,79 @@
+import random
+import tempfile
+import unittest
+from datetime import datetime, timedelta
+from pathlib import Path
+
+from tabata import columnar, progress
+from tabata.history import HistoryStore, SessionRecord, encode_line
+from tabata.segments import HistorySegment, history_from_segment, segment_from_history, write_segment
+
+
+def _history(count: int) -> list[SessionRecord]:
+    generator = random.Random(11)
+    start = datetime(2023, 1, 1, 6, 0, 0)
+    return [
+        SessionRecord(
+            duration_minutes=generator.randint(5, 60),
+            calories=generator.randint(40, 700),
+            completed_at=start + timedelta(minutes=generator.randint(0, 60 * 24 * 400)),
+            source_session=generator.choice(["tabata", "hiit", "emom", "séance"]),
+        )
+        for _ in range(count)
+    ]
+
+
+class HistorySegmentTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.directory = Path(self._tmp_dir.name)
+        self.records = _history(500)
+        self.journal = self.directory / "history.json"
+        self.journal.write_bytes(b"".join(encode_line(record) for record in self.records))
+        self.segment_path = self.directory / "history.seg"
+        segment_from_history(self.journal, self.segment_path)
+
+    def tearDown(self) -> None:
+        self._tmp_dir.cleanup()
+
+    def test_round_trips_through_the_journal(self) -> None:
+        with HistorySegment(self.segment_path) as segment:
+            self.assertEqual(len(segment), 500)
+            self.assertEqual(list(segment.iter_sessions()), list(HistoryStore(self.journal).iter_sessions()))
+            self.assertEqual(sorted(segment.sources), ["emom", "hiit", "séance", "tabata"])
+
+        restored = self.directory / "restored.json"
+        self.assertEqual(history_from_segment(self.segment_path, restored), 500)
+        self.assertEqual(HistoryStore(restored).list_sessions(), HistoryStore(self.journal).list_sessions())
+
+    def test_range_queries_match_history_store(self) -> None:
+        store = HistoryStore(self.journal)
+        start = datetime(2023, 6, 1)
+        end = datetime(2023, 9, 30, 23, 59, 59)
+        with HistorySegment(self.segment_path) as segment:
+            self.assertEqual(list(segment.iter_sessions(start, end)), store.list_sessions(start, end)[::-1])
+            self.assertEqual(list(segment.iter_sessions(end=datetime(2000, 1, 1))), [])
+            exact = self.records[0].completed_at
+            self.assertIn(self.records[0], list(segment.iter_sessions(exact, exact)))
+
+    def test_rejects_files_that_are_not_segments(self) -> None:
+        bogus = self.directory / "bogus.seg"
+        bogus.write_bytes(b"[" + b" " * 64)
+        with self.assertRaises(ValueError):
+            HistorySegment(bogus)
+        empty = self.directory / "empty.seg"
+        write_segment(empty, [])
+        with HistorySegment(empty) as segment:
+            self.assertEqual(list(segment.iter_sessions()), [])
+
+    @unittest.skipIf(columnar.np is None, "NumPy is not installed")
+    def test_columns_feed_vectorized_aggregations(self) -> None:
+        with HistorySegment(self.segment_path) as segment:
+            columns = segment.columns()
+            self.assertEqual(columnar.weekly_progress(columns), progress.weekly_progress(self.records))
+            self.assertEqual(columnar.yearly_progress(columns), progress.yearly_progress(self.records))
+            del columns
+
+
+if __name__ == "__main__":
+    unittest.main()
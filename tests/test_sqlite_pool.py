@@ -0,0 +1,75 @@
+import tempfile
+import threading
+import unittest
+from pathlib import Path
+
+from tabata.models import Session
+from tabata.storage import SqliteConnectionPool, SqliteSessionRepository, SqliteSettings
+
+
+class SqliteConnectionPoolTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self._tmp_dir = tempfile.TemporaryDirectory()
+        self.pool = SqliteConnectionPool(
+            Path(self._tmp_dir.name) / "app.db",
+            SqliteSettings(busy_timeout_seconds=0.2),
+        )
+
+    def tearDown(self) -> None:
+        self.pool.close()
+        self._tmp_dir.cleanup()
+
+    def _in_thread(self, target):
+        result = {}
+
+        def run() -> None:
+            result["value"] = target()
+
+        thread = threading.Thread(target=run)
+        thread.start()
+        thread.join()
+        return result["value"]
+
+    def test_connections_are_per_thread_and_tuned(self) -> None:
+        connection = self.pool.connection()
+        self.assertIs(self.pool.connection(), connection)
+        self.assertIsNot(self._in_thread(self.pool.connection), connection)
+        self.assertEqual(connection.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+        self.assertEqual(connection.execute("PRAGMA busy_timeout").fetchone()[0], 200)
+        self.assertEqual(connection.execute("PRAGMA foreign_keys").fetchone()[0], 1)
+
+    def test_readers_are_not_blocked_by_an_open_write_transaction(self) -> None:
+        writer = SqliteSessionRepository(self.pool.connection())
+        committed = writer.create(
+            Session(id=None, name="committed", warmup_seconds=0, recovery_seconds=0)
+        )
+        self.pool.connection().commit()
+
+        writer.create(Session(id=None, name="pending", warmup_seconds=0, recovery_seconds=0))
+        self.assertTrue(self.pool.connection().in_transaction)
+
+        def list_names() -> list:
+            return [session.name for session in SqliteSessionRepository(self.pool.connection()).list()]
+
+        names = self._in_thread(list_names)
+        self.assertEqual(names, [committed.name])
+        self.pool.connection().rollback()
+
+    def test_closed_pool_refuses_new_connections(self) -> None:
+        self.pool.connection()
+        self.pool.close()
+        with self.assertRaises(RuntimeError):
+            self.pool.connection()
+
+    def test_connections_of_exited_threads_are_released_but_not_closed(self) -> None:
+        handed_on = self._in_thread(self.pool.connection)
+
+        self.pool.connection()
+        self.assertEqual([thread for thread, _ in self.pool._connections], [threading.current_thread()])
+        # Still usable by the thread it was passed to.
+        self.assertEqual(handed_on.execute("SELECT 1").fetchone()[0], 1)
+        handed_on.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
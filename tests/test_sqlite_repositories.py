@@ -0,0 +1,342 @@
+import sqlite3
+import unittest
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.storage import (
+    ExerciseCache,
+    SqliteBlockRepository,
+    SqliteExerciseRepository,
+    SqliteSessionRepository,
+    initialize_sqlite,
+)
+
+
+def _session(name: str, exercise: Exercise) -> Session:
+    return Session(
+        id=None,
+        name=name,
+        warmup_seconds=60,
+        recovery_seconds=30,
+        blocks=[
+            Block(
+                id=None,
+                name=f"{name} block {position}",
+                position=position,
+                intervals=[
+                    Interval(id=None, position=1, duration_seconds=20, exercise=exercise),
+                    Interval(id=None, position=2, duration_seconds=10),
+                ],
+            )
+            for position in (2, 1)
+        ],
+    )
+
+
+def _joined_totals(connection: sqlite3.Connection, session_id: int) -> tuple:
+    return connection.execute(
+        """
+        SELECT
+            sessions.warmup_seconds + sessions.recovery_seconds
+                + COALESCE(SUM(intervals.duration_seconds * blocks.repetitions), 0),
+            COALESCE(
+                SUM(intervals.duration_seconds * blocks.repetitions * exercises.calories_per_minute / 60.0), 0
+            )
+        FROM sessions
+        LEFT JOIN blocks ON blocks.session_id = sessions.id
+        LEFT JOIN intervals ON intervals.block_id = blocks.id
+        LEFT JOIN exercises ON intervals.exercise_id = exercises.id
+        WHERE sessions.id = ?
+        GROUP BY sessions.id
+        """,
+        (session_id,),
+    ).fetchone()
+
+
+class SqliteRepositoryTest(unittest.TestCase):
+    def setUp(self) -> None:
+        self.connection = sqlite3.connect(":memory:")
+        initialize_sqlite(self.connection)
+        self.exercise = SqliteExerciseRepository(self.connection).create(
+            Exercise(id=None, name="Burpees", category="cardio", calories_per_minute=12.0)
+        )
+        self.sessions = SqliteSessionRepository(self.connection)
+
+    def tearDown(self) -> None:
+        self.connection.close()
+
+    def test_create_many_with_blocks_matches_per_row_path(self) -> None:
+        single = self.sessions.create_with_blocks(_session("single", self.exercise))
+        created = self.sessions.create_many_with_blocks(
+            [_session("bulk 1", self.exercise), _session("bulk 2", self.exercise)]
+        )
+
+        self.assertEqual([session.id for session in created], [single.id + 1, single.id + 2])
+        for session in created:
+            loaded = self.sessions.get_with_details(session.id)
+            self.assertEqual(loaded, session)
+            self.assertEqual([block.position for block in loaded.blocks], [1, 2])
+            self.assertEqual(
+                self.sessions.total_duration_seconds(session.id),
+                self.sessions.total_duration_seconds(single.id),
+            )
+
+    def test_create_many_with_blocks_does_not_reuse_deleted_ids(self) -> None:
+        first = self.sessions.create_with_blocks(_session("first", self.exercise))
+        self.sessions.delete(first.id)
+        (created,) = self.sessions.create_many_with_blocks([_session("second", self.exercise)])
+        self.assertGreater(created.id, first.id)
+
+    def test_list_with_details_uses_constant_number_of_queries(self) -> None:
+        created = self.sessions.create_many_with_blocks(
+            [_session(f"session {index}", self.exercise) for index in range(20)]
+        )
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+
+        ids = [session.id for session in reversed(created)] + [9999]
+        loaded = self.sessions.list_with_details(ids)
+        detailed = self.sessions.get_with_details(created[0].id)
+
+        self.connection.set_trace_callback(None)
+        self.assertEqual(loaded, list(reversed(created)))
+        self.assertEqual(detailed, created[0])
+        self.assertEqual(len(statements), 6)
+
+    def test_shared_exercise_cache_returns_one_instance_per_id(self) -> None:
+        cache = ExerciseCache(max_size=8)
+        exercises = SqliteExerciseRepository(self.connection, cache)
+        sessions = SqliteSessionRepository(self.connection, cache)
+        created = sessions.create_with_blocks(_session("cached", self.exercise))
+
+        loaded = sessions.get_with_details(created.id)
+        hydrated = {
+            id(interval.exercise)
+            for block in loaded.blocks
+            for interval in block.intervals
+            if interval.exercise is not None
+        }
+        self.assertEqual(len(hydrated), 1)
+        self.assertEqual(cache.misses, 1)
+        self.assertEqual(cache.hits, 1)
+
+        statements = []
+        self.connection.set_trace_callback(statements.append)
+        fetched = exercises.get(self.exercise.id)
+        self.connection.set_trace_callback(None)
+        self.assertIs(fetched, loaded.blocks[0].intervals[0].exercise)
+        self.assertEqual(statements, [])
+
+        exercises.update(
+            Exercise(id=self.exercise.id, name="Burpees", category="cardio", calories_per_minute=14.0)
+        )
+        self.assertEqual(len(cache), 0)
+        self.assertEqual(exercises.get(self.exercise.id).calories_per_minute, 14.0)
+
+    def test_exercise_get_counts_one_lookup(self) -> None:
+        cache = ExerciseCache()
+        exercises = SqliteExerciseRepository(self.connection, cache)
+
+        exercises.get(self.exercise.id)
+        self.assertEqual((cache.hits, cache.misses), (0, 1))
+        exercises.get(self.exercise.id)
+        self.assertEqual((cache.hits, cache.misses), (1, 1))
+        self.assertIsNone(exercises.get(9999))
+        self.assertEqual((cache.hits, cache.misses), (1, 2))
+
+    def test_repositories_without_a_shared_cache_see_other_writers(self) -> None:
+        reader = SqliteExerciseRepository(self.connection)
+        self.assertEqual(reader.get(self.exercise.id).calories_per_minute, self.exercise.calories_per_minute)
+
+        SqliteExerciseRepository(self.connection).update(
+            Exercise(id=self.exercise.id, name="Burpees", category="cardio", calories_per_minute=14.0)
+        )
+        self.assertEqual(reader.get(self.exercise.id).calories_per_minute, 14.0)
+
+        created = self.sessions.create_with_blocks(_session("shared", self.exercise))
+        loaded = self.sessions.get_with_details(created.id)
+        hydrated = {
+            id(interval.exercise)
+            for block in loaded.blocks
+            for interval in block.intervals
+            if interval.exercise is not None
+        }
+        self.assertEqual(len(hydrated), 1)
+
+    def assertTotalsConsistent(self, session_id: int) -> None:
+        duration, calories = _joined_totals(self.connection, session_id)
+        self.assertEqual(self.sessions.total_duration_seconds(session_id), duration)
+        self.assertAlmostEqual(self.sessions.estimate_calories(session_id), calories)
+
+    def test_cached_totals_follow_every_write_path(self) -> None:
+        exercises = SqliteExerciseRepository(self.connection)
+        blocks = SqliteBlockRepository(self.connection)
+        created = self.sessions.create_with_blocks(_session("edited", self.exercise))
+        (bulk,) = self.sessions.create_many_with_blocks([_session("bulk", self.exercise)])
+        self.assertEqual(self.sessions.total_duration_seconds(created.id), 150)
+        self.assertAlmostEqual(self.sessions.estimate_calories(created.id), 8.0)
+        self.assertTotalsConsistent(bulk.id)
+
+        created.warmup_seconds = 90
+        created.blocks[0].intervals[0].duration_seconds = 40
+        self.sessions.update_with_blocks(created)
+        self.assertTotalsConsistent(created.id)
+
+        self.connection.execute(
+            "UPDATE intervals SET duration_seconds = 45, exercise_id = NULL WHERE id = ?",
+            (created.blocks[1].intervals[0].id,),
+        )
+        self.assertTotalsConsistent(created.id)
+
+        blocks.delete(created.blocks[0].id)
+        self.assertTotalsConsistent(created.id)
+
+        exercises.update(
+            Exercise(id=self.exercise.id, name="Burpees", category="cardio", calories_per_minute=9.5)
+        )
+        self.assertTotalsConsistent(bulk.id)
+
+    def test_block_repetitions_multiply_one_round_of_intervals(self) -> None:
+        blocks = SqliteBlockRepository(self.connection)
+        tabata = _session("tabata", self.exercise)
+        tabata.blocks[0].repetitions = 8
+        created = self.sessions.create_with_blocks(tabata)
+        (bulk,) = self.sessions.create_many_with_blocks([tabata])
+
+        for session in (created, bulk):
+            self.assertEqual(self.sessions.get_with_details(session.id), session)
+            self.assertEqual(self.sessions.total_duration_seconds(session.id), 90 + 9 * 30)
+            self.assertAlmostEqual(self.sessions.estimate_calories(session.id), 9 * 4.0)
+            self.assertTotalsConsistent(session.id)
+            self.assertEqual(session.total_duration_seconds, 90 + 9 * 30)
+        self.assertEqual(self.connection.execute("SELECT COUNT(*) FROM intervals").fetchone()[0], 8)
+
+        second = created.blocks[1]
+        second.repetitions = 3
+        blocks.update(second)
+        self.assertEqual(blocks.get(second.id).repetitions, 3)
+        self.assertTotalsConsistent(created.id)
+
+        created.blocks[0].repetitions = 2
+        created.blocks[0].intervals[0].duration_seconds = 30
+        blocks = created.blocks
+        self.assertIs(self.sessions.update_with_blocks(created).blocks, blocks)
+        self.assertEqual(self.sessions.get_with_details(created.id), created)
+        self.assertEqual(self.sessions.total_duration_seconds(created.id), created.total_duration_seconds)
+        # The session still owns its block list, so its totals stay cached.
+        self.assertIn("total_duration_seconds", created.__dict__["_cache"])
+        self.assertTotalsConsistent(created.id)
+
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.connection.execute("UPDATE blocks SET repetitions = 0 WHERE id = ?", (second.id,))
+
+    def test_update_with_blocks_only_writes_changed_rows(self) -> None:
+        created = self.sessions.create_with_blocks(_session("diffed", self.exercise))
+        first, second = created.blocks
+        kept = first.intervals[0]
+        moved = first.intervals[1]
+        second.name = "renamed"
+        kept.duration_seconds = 30
+        second.intervals = [second.intervals[0], moved]
+        moved.position = 3
+        first.intervals = [kept]
+        created.blocks.append(Block(id=None, name="extra", position=3, intervals=[Interval(None, 1, 15)]))
+        statements: list[str] = []
+        self.connection.set_trace_callback(statements.append)
+
+        updated = self.sessions.update_with_blocks(created)
+
+        self.connection.set_trace_callback(None)
+        # Trigger steps re-report their outer statement, hence the set.
+        writes = sorted(
+            " ".join(words[:3])
+            for words in (statement.split() for statement in set(statements))
+            if words[0] in ("INSERT", "UPDATE", "DELETE") and words[1:3] != ["sessions", "SET"]
+        )
+        self.assertEqual(
+            writes,
+            [
+                "DELETE FROM intervals",
+                "INSERT INTO blocks",
+                "INSERT INTO intervals",
+                "UPDATE blocks SET",
+                "UPDATE intervals SET",
+                "UPDATE intervals SET",
+            ],
+        )
+        self.assertEqual([block.id for block in updated.blocks[:2]], [first.id, second.id])
+        reloaded = self.sessions.get_with_details(created.id)
+        self.assertEqual(
+            [[interval.id for interval in block.intervals] for block in reloaded.blocks],
+            [[kept.id], [second.intervals[0].id, moved.id], [updated.blocks[2].intervals[0].id]],
+        )
+        self.assertEqual(reloaded.blocks[1].name, "renamed")
+        self.assertTotalsConsistent(created.id)
+
+        updated.blocks = updated.blocks[1:]
+        self.sessions.update_with_blocks(updated)
+        self.assertEqual(len(self.sessions.get_with_details(created.id).blocks), 2)
+        self.assertTotalsConsistent(created.id)
+
+    def test_history_calories_count_every_occurrence(self) -> None:
+        first, second = self.sessions.create_many_with_blocks(
+            [_session("first", self.exercise), _session("second", self.exercise)]
+        )
+        # More distinct ids than SQLite accepts as bound variables; unknown ids add nothing.
+        history = [first.id] * 50 + [second.id] * 3 + list(range(1000, 41000))
+
+        by_session = self.sessions.estimate_calories_by_session(history)
+
+        self.assertEqual(set(by_session), {first.id, second.id})
+        self.assertAlmostEqual(by_session[first.id], 50 * 8.0)
+        self.assertAlmostEqual(by_session[second.id], 3 * 8.0)
+        self.assertAlmostEqual(self.sessions.estimate_calories_for_history(history), 53 * 8.0)
+        self.assertEqual(self.sessions.estimate_calories_by_session([]), {})
+
+    def test_initialize_backfills_totals_on_existing_databases(self) -> None:
+        connection = sqlite3.connect(":memory:")
+        connection.executescript(
+            """
+            CREATE TABLE exercises (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                category TEXT NOT NULL, calories_per_minute REAL NOT NULL
+            );
+            CREATE TABLE sessions (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, name TEXT NOT NULL,
+                warmup_seconds INTEGER NOT NULL, recovery_seconds INTEGER NOT NULL
+            );
+            CREATE TABLE blocks (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, session_id INTEGER NOT NULL,
+                name TEXT NOT NULL, position INTEGER NOT NULL
+            );
+            CREATE TABLE intervals (
+                id INTEGER PRIMARY KEY AUTOINCREMENT, block_id INTEGER NOT NULL,
+                position INTEGER NOT NULL, duration_seconds INTEGER NOT NULL, exercise_id INTEGER
+            );
+            CREATE TRIGGER sessions_totals_after_block_delete AFTER DELETE ON blocks
+            BEGIN
+                UPDATE sessions SET total_duration_seconds = 0 WHERE id = OLD.session_id;
+            END;
+            INSERT INTO exercises VALUES (1, 'Squats', 'strength', 6.0);
+            INSERT INTO sessions VALUES (1, 'legacy', 60, 30);
+            INSERT INTO blocks VALUES (1, 1, 'main', 1);
+            INSERT INTO intervals VALUES (1, 1, 1, 20, 1), (2, 1, 2, 10, NULL);
+            """
+        )
+        initialize_sqlite(connection)
+        sessions = SqliteSessionRepository(connection)
+        self.assertEqual(sessions.total_duration_seconds(1), 120)
+        self.assertAlmostEqual(sessions.estimate_calories(1), 2.0)
+
+        connection.execute(
+            "INSERT INTO blocks (session_id, name, position, repetitions) VALUES (1, 'extra', 2, 4)"
+        )
+        connection.execute("INSERT INTO intervals (block_id, position, duration_seconds) VALUES (2, 1, 15)")
+        self.assertEqual(sessions.total_duration_seconds(1), 180)
+        # Triggers that predate the repetitions column are replaced.
+        connection.execute("DELETE FROM blocks WHERE id = 2")
+        self.assertEqual(sessions.total_duration_seconds(1), 120)
+        connection.close()
+
+
+if __name__ == "__main__":
+    unittest.main()
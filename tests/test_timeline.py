@@ -0,0 +1,147 @@
+import random
+import unittest
+
+from tabata.models import Block, Exercise, Interval, Session
+from tabata.timeline import NANOSECONDS, TimelineScheduler, compile_session
+
+MILLISECONDS = 1_000_000
+
+
+class SimulatedClock:
+    """Monotonic clock whose sleeps overshoot by a random delay, like a busy device."""
+
+    def __init__(self, seed: int, max_overshoot_ms: int = 15) -> None:
+        self.now_ns = 0
+        self._random = random.Random(seed)
+        self._max_overshoot_ns = max_overshoot_ms * MILLISECONDS
+
+    def monotonic_ns(self) -> int:
+        return self.now_ns
+
+    def sleep(self, seconds: float) -> None:
+        self.now_ns += int(seconds * NANOSECONDS) + self._random.randint(0, self._max_overshoot_ns)
+
+    def work(self, milliseconds: int) -> None:
+        self.now_ns += milliseconds * MILLISECONDS
+
+
+def _session(hours: int) -> Session:
+    exercise = Exercise(id=1, name="Burpees", category="cardio", calories_per_minute=12.0)
+    rounds = hours * 3600 // 30
+    return Session(
+        id=1,
+        name="marathon",
+        warmup_seconds=300,
+        recovery_seconds=120,
+        blocks=[
+            Block(
+                id=1,
+                name="main",
+                position=1,
+                intervals=[
+                    Interval(
+                        id=position,
+                        position=position,
+                        duration_seconds=20 if position % 2 else 10,
+                        exercise=exercise if position % 2 else None,
+                    )
+                    for position in range(2 * rounds, 0, -1)
+                ],
+            )
+        ],
+    )
+
+
+class TimelineTest(unittest.TestCase):
+    def test_compile_flattens_session_in_order(self) -> None:
+        session = Session(
+            id=1,
+            name="short",
+            warmup_seconds=60,
+            recovery_seconds=0,
+            blocks=[
+                Block(id=2, name="second", position=2, intervals=[Interval(id=3, position=1, duration_seconds=10)]),
+                Block(
+                    id=1,
+                    name="first",
+                    position=1,
+                    intervals=[
+                        Interval(id=2, position=2, duration_seconds=10),
+                        Interval(id=1, position=1, duration_seconds=20),
+                        Interval(id=4, position=3, duration_seconds=0),
+                    ],
+                ),
+            ],
+        )
+
+        timeline = compile_session(session)
+
+        self.assertEqual([offset // NANOSECONDS for offset in timeline.offsets_ns], [0, 60, 80, 90, 100])
+        transitions = [timeline.transition(index) for index in range(len(timeline))]
+        self.assertEqual([transition.phase for transition in transitions], ["warmup", "interval", "interval", "interval", "end"])
+        self.assertEqual([transition.interval.id for transition in transitions[1:4]], [1, 2, 3])
+        self.assertEqual(transitions[1].duration_ns, 20 * NANOSECONDS)
+        self.assertEqual(timeline.total_ns, 100 * NANOSECONDS)
+        self.assertEqual(timeline.index_at(85 * NANOSECONDS), 2)
+
+    def test_block_repetitions_repeat_the_round(self) -> None:
+        block = Block(
+            id=1,
+            name="tabata",
+            position=1,
+            intervals=[
+                Interval(id=2, position=2, duration_seconds=10),
+                Interval(id=1, position=1, duration_seconds=20),
+            ],
+            repetitions=8,
+        )
+        session = Session(id=1, name="tabata", warmup_seconds=0, recovery_seconds=0, blocks=[block])
+        timeline = compile_session(session)
+
+        self.assertEqual(len(timeline), 17)
+        self.assertEqual(timeline.total_ns, 240 * NANOSECONDS)
+        transition = timeline.transition(timeline.index_at(112 * NANOSECONDS))
+        self.assertEqual((transition.repetition, transition.interval.id), (3, 2))
+
+    def test_eight_hour_run_stays_within_drift_and_jitter_budget(self) -> None:
+        timeline = compile_session(_session(hours=8))
+        clock = SimulatedClock(seed=7)
+        fired = []
+
+        def on_transition(transition, lateness_ns) -> None:
+            fired.append(transition.phase)
+            clock.work(3)
+
+        lateness = TimelineScheduler(timeline, on_transition, clock.monotonic_ns, clock.sleep).run()
+
+        self.assertEqual(len(fired), len(timeline))
+        self.assertEqual(fired[-1], "end")
+        jitter_ms = max(lateness) / MILLISECONDS
+        drift_ratio = lateness[-1] / timeline.total_ns
+        self.assertLessEqual(jitter_ms, 50)
+        self.assertLessEqual(drift_ratio, 0.005)
+
+        # Chaining relative sleeps accumulates every overshoot instead.
+        chained = SimulatedClock(seed=7)
+        for index in range(len(timeline) - 1):
+            chained.sleep(timeline.transition(index).duration_ns / NANOSECONDS)
+            chained.work(3)
+        self.assertGreater(chained.now_ns - timeline.total_ns, 1000 * max(lateness))
+
+    def test_stop_ends_the_run(self) -> None:
+        timeline = compile_session(_session(hours=1))
+        clock = SimulatedClock(seed=1)
+        fired = []
+
+        def on_transition(transition, lateness_ns) -> None:
+            fired.append(transition.index)
+            if len(fired) == 5:
+                scheduler.stop()
+
+        scheduler = TimelineScheduler(timeline, on_transition, clock.monotonic_ns, clock.sleep)
+        self.assertEqual(len(scheduler.run()), 5)
+        self.assertEqual(fired, [0, 1, 2, 3, 4])
+
+
+if __name__ == "__main__":
+    unittest.main()